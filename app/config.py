@@ -1,6 +1,7 @@
 from pydantic_settings import BaseSettings
 from functools import lru_cache
-from typing import Optional
+from typing import Literal, Optional
+from sqlalchemy.engine import make_url
 
 class Settings(BaseSettings):
     # Database configuration (for local development)
@@ -13,6 +14,26 @@ class Settings(BaseSettings):
     # Database URL (for production - Neon, Render, etc.)
     DATABASE_URL: Optional[str] = None
 
+    # Connection pool, per engine and per worker process: size it so that
+    # workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW) stays under the server's connection limit
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30  # Seconds to wait for a free connection before failing
+    DB_POOL_RECYCLE: int = 3600
+    # Liveness check of pooled connections: "pre_ping" (a round trip on every checkout),
+    # "idle" (ping only connections idle longer than DB_POOL_IDLE_PING_SECONDS) or "none"
+    DB_POOL_LIVENESS: Literal["pre_ping", "idle", "none"] = "pre_ping"
+    DB_POOL_IDLE_PING_SECONDS: float = 30
+    DB_STATEMENT_TIMEOUT_MS: int = 0  # PostgreSQL statement_timeout / MySQL max_execution_time; 0 = server default
+
+    # Opt-in async stack (asyncpg / aiomysql / aiosqlite drivers) for the request path
+    ASYNC_DATABASE: bool = False
+
+    # Optional read replica for read-only routes. A client that wrote within REPLICA_MAX_LAG_SECONDS
+    # (per its last-write token) is still served by the primary, so it always sees its own writes
+    READ_REPLICA_URL: Optional[str] = None
+    REPLICA_MAX_LAG_SECONDS: float = 5.0
+
     APP_NAME: str = "Banking System Simulation"
     DEBUG: bool = False
     CORS_ORIGINS: str = "http://localhost:5173"
@@ -22,6 +43,58 @@ class Settings(BaseSettings):
     SECRET_KEY: str
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 1440
+    AUTH_CACHE_SIZE: int = 10000  # Verified tokens kept in memory (evicted at token expiry)
+
+    # Account numbers: PREFIX + zero-padded DIGITS-digit sequence value + 1 Luhn check digit
+    ACCOUNT_NUMBER_PREFIX: str = "ACC-"
+    ACCOUNT_NUMBER_DIGITS: int = 9
+    ACCOUNT_NUMBER_BLOCK_SIZE: int = 1000  # Sequence values reserved per DB round trip, per worker
+
+    # Per-process cache of immutable account metadata (id, account number, owner), see app.services.account_cache_service
+    ACCOUNT_CACHE_SIZE: int = 100000
+    ACCOUNT_CACHE_TTL_SECONDS: int = 3600
+
+    # How long a worker trusts its cached hot-account shard counts
+    HOT_ACCOUNT_CACHE_SECONDS: int = 30
+
+    # Answer dashboard stats from daily_account_stats (False = aggregate transactions directly)
+    USE_DAILY_STATS_ROLLUP: bool = True
+
+    # Postings aborted by a deadlock, serialization failure or lock timeout are retried:
+    # up to POSTING_RETRY_ATTEMPTS attempts in total, with jittered exponential backoff
+    POSTING_RETRY_ATTEMPTS: int = 3
+    POSTING_RETRY_BASE_DELAY_MS: float = 10
+    POSTING_RETRY_MAX_DELAY_MS: float = 200
+
+    # /transactions/batch limits
+    BATCH_CHUNK_SIZE: int = 1000
+    BATCH_MAX_OPERATIONS: int = 50000
+
+    # bcrypt worker pool for register/login (0 workers = run in the request threadpool)
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_QUEUE_SIZE: int = 64
+
+    # Idempotency-Key on posting endpoints: how long a key is remembered, and how many responses stay in memory
+    IDEMPOTENCY_KEY_TTL_SECONDS: int = 86400
+    IDEMPOTENCY_CACHE_SIZE: int = 10000
+
+    # Where postings and account reads live: "sql" (the database) or "memory" (in-process ledger
+    # with a write-ahead log at LEDGER_WAL_PATH, for simulation runs - see app.services.ledger_service).
+    # A posting waits up to LEDGER_GROUP_COMMIT_MS so concurrent postings share one log flush
+    LEDGER_BACKEND: Literal["sql", "memory"] = "sql"
+    LEDGER_WAL_PATH: str = "ledger.wal"
+    LEDGER_GROUP_COMMIT_MS: float = 2
+    LEDGER_FSYNC: bool = True  # False = flush to the OS only (survives a process crash, not a power loss)
+
+    # transactions on PostgreSQL can be partitioned by month of created_at (partition_transactions.py);
+    # partitions are kept created this many months ahead of the current one
+    TRANSACTION_PARTITION_MONTHS_AHEAD: int = 3
+
+    # Cold history: months older than TRANSACTION_ARCHIVE_AFTER_MONTHS (the current month counts as one)
+    # are moved into Parquet files in TRANSACTION_ARCHIVE_DIR by archive_transactions.py (needs pyarrow).
+    # Statements and balance-at still read them; history pages and counts only see the database
+    TRANSACTION_ARCHIVE_DIR: str = "archive"
+    TRANSACTION_ARCHIVE_AFTER_MONTHS: int = 12
 
     class Config:
         env_file = '.env'
@@ -38,6 +111,37 @@ class Settings(BaseSettings):
             return f"mysql+pymysql://{self.DB_USER}:{self.DB_PASSWORD}@{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME}"
         
         raise ValueError("Either DATABASE_URL or individual DB_* variables must be set")
+
+    @property
+    def async_database_url(self) -> str:
+        return self.to_async_url(self.database_url)
+
+    @property
+    def async_read_replica_url(self) -> str:
+        return self.to_async_url(self.READ_REPLICA_URL)
+
+    @staticmethod
+    def to_async_url(database_url: str) -> str:
+        # Same database, swapped onto the matching async driver
+        url = make_url(database_url)
+        backend = url.get_backend_name()
+
+        if backend == "postgresql":
+            # asyncpg does not understand libpq's sslmode/channel_binding (Neon URLs carry both)
+            query = dict(url.query)
+            sslmode = query.pop("sslmode", None)
+            query.pop("channel_binding", None)
+            if sslmode and sslmode != "disable":
+                query["ssl"] = sslmode
+            url = url.set(drivername="postgresql+asyncpg", query=query)
+        elif backend == "mysql":
+            url = url.set(drivername="mysql+aiomysql")
+        elif backend == "sqlite":
+            url = url.set(drivername="sqlite+aiosqlite")
+        else:
+            raise ValueError(f"No async driver configured for database backend '{backend}'")
+
+        return url.render_as_string(hide_password=False)
     
 
 @lru_cache
@@ -1,15 +1,19 @@
+from fastapi import Request
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
 from app.config import get_settings
+from app.utils.db_pool import engine_options, instrument_engine
+import time
 
 settings = get_settings()
 
-engine = create_engine(
-    settings.database_url,
-    echo = settings.DEBUG,
-    pool_pre_ping = True,
-    pool_recycle = 3600
+# Pool sizing, liveness and metrics come from Settings (see app.utils.db_pool)
+engine = instrument_engine(
+    create_engine(settings.database_url, **engine_options(settings.database_url)),
+    "primary"
 )
 
 SessionLocal = sessionmaker(
@@ -18,11 +22,114 @@ SessionLocal = sessionmaker(
     bind = engine
 )
 
+# Async engine is only built when enabled, so the async driver is only needed by deployments that use it
+async_engine = None
+AsyncSessionLocal = None
+
+if settings.ASYNC_DATABASE:
+    async_engine = create_async_engine(
+        settings.async_database_url,
+        **engine_options(settings.async_database_url, is_async=True)
+    )
+    instrument_engine(async_engine.sync_engine, "async")
+
+    AsyncSessionLocal = async_sessionmaker(
+        bind = async_engine,
+        autoflush = False,
+        expire_on_commit = False
+    )
+
+# Read replica: same setup as the primary; without READ_REPLICA_URL reads simply use the primary
+read_engine = engine
+ReadSessionLocal = SessionLocal
+async_read_engine = async_engine
+AsyncReadSessionLocal = AsyncSessionLocal
+
+if settings.READ_REPLICA_URL:
+    read_engine = instrument_engine(
+        create_engine(settings.READ_REPLICA_URL, **engine_options(settings.READ_REPLICA_URL)),
+        "replica"
+    )
+
+    ReadSessionLocal = sessionmaker(
+        autocommit = False,
+        autoflush = False,
+        bind = read_engine
+    )
+
+    if settings.ASYNC_DATABASE:
+        async_read_engine = create_async_engine(
+            settings.async_read_replica_url,
+            **engine_options(settings.async_read_replica_url, is_async=True)
+        )
+        instrument_engine(async_read_engine.sync_engine, "async_replica")
+
+        AsyncReadSessionLocal = async_sessionmaker(
+            bind = async_read_engine,
+            autoflush = False,
+            expire_on_commit = False
+        )
+
+# Read-your-writes token: successful writes hand the client its write time (see app.main),
+# which it sends back as this header or cookie on the reads that follow
+LAST_WRITE_HEADER = "X-Last-Write"
+LAST_WRITE_COOKIE = "last_write"
+
 Base = declarative_base()
 
+DbSession = Session | AsyncSession
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+# Dependency used by the routes - AsyncSession when the async stack is enabled, Session otherwise
+get_session = get_async_db if settings.ASYNC_DATABASE else get_db
+
+def wrote_recently(request: Request) -> bool:
+    """True if the client's last-write token is younger than the replica lag allowance"""
+    token = request.headers.get(LAST_WRITE_HEADER) or request.cookies.get(LAST_WRITE_COOKIE)
+    if not token:
+        return False
+    try:
+        return time.time() - float(token) < settings.REPLICA_MAX_LAG_SECONDS
+    except ValueError:
+        return False
+
+def use_replica(request: Request) -> bool:
+    return read_engine is not engine and not wrote_recently(request)
+
+async def get_read_db(request: Request):
+    """Session for read-only routes: the replica, or the primary for a client that just wrote"""
+    replica = use_replica(request)
+
+    if settings.ASYNC_DATABASE:
+        async with (AsyncReadSessionLocal if replica else AsyncSessionLocal)() as db:
+            yield db
+        return
+
+    db = (ReadSessionLocal if replica else SessionLocal)()
+    try:
+        yield db
+    finally:
+        await run_in_threadpool(db.close)
+
+async def dispose_async_engines():
+    """Close pooled async connections on shutdown (aiosqlite's connection threads would otherwise keep the process alive)"""
+    for pooled_engine in {async_engine, async_read_engine} - {None}:
+        await pooled_engine.dispose()
+
+async def run_db(db: DbSession, fn, *args, **kwargs):
+    """Run a sync service function against either session type without blocking the event loop"""
+    if isinstance(db, AsyncSession):
+        # Runs fn on the loop in a greenlet; every DB round trip awaits the async driver
+        return await db.run_sync(fn, *args, **kwargs)
+
+    return await run_in_threadpool(fn, db, *args, **kwargs)
@@ -1,30 +1,121 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from app.routes import router as account_router
 from app.routes.auth_routes import router as auth_router
 from app.config import get_settings
+from app.database import LAST_WRITE_HEADER, LAST_WRITE_COOKIE, dispose_async_engines
+from app.utils import shutdown_password_hasher
+from app.services.ledger_service import get_ledger, close_ledger
+from app.utils.responses import FastJSONResponse
+from app.utils.metrics import Histogram, render_metrics, request_db_seconds
+import time
 
 settings = get_settings()
 
+request_seconds = Histogram("http_request_duration_seconds", "Request latency by method, route template and status")
+request_db_time = Histogram("http_request_db_seconds", "Time a request spent in database calls, by route template")
+request_handler_time = Histogram("http_request_handler_seconds", "Time a request spent outside database calls, by route template")
+
+
+class RequestMetricsMiddleware:
+    """Per-route latency split into database and handler time (plain ASGI, so it adds no task or buffering per request)"""
+
+    def __init__(self, app):
+        self.app = app
+        self.route_paths = {}  # endpoint function -> route template, filled on first use
+
+    def route_label(self, scope) -> str:
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "unmatched"
+        path = self.route_paths.get(endpoint)
+        if path is None:
+            path = next((route.path for route in app.routes if getattr(route, "endpoint", None) is endpoint), "unmatched")
+            self.route_paths[endpoint] = path
+        return path
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = [500]
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status_code[0] = message["status"]
+            await send(message)
+
+        db_seconds = [0.0]
+        token = request_db_seconds.set(db_seconds)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            request_db_seconds.reset(token)
+
+            route = self.route_label(scope)
+            request_seconds.observe(elapsed, method=scope["method"], route=route, status=status_code[0])
+            request_db_time.observe(db_seconds[0], route=route)
+            request_handler_time.observe(max(elapsed - db_seconds[0], 0.0), route=route)
+
 app = FastAPI(
     title=settings.APP_NAME,
     description="A Banking System Simulation",
     version='1.0.0',
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    default_response_class=FastJSONResponse
 )
 
+app.add_middleware(RequestMetricsMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=settings.CORS_ORIGINS.split(","),
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[LAST_WRITE_HEADER],
 )
 
+if settings.READ_REPLICA_URL:
+    @app.middleware("http")
+    async def issue_last_write_token(request: Request, call_next):
+        # Reads carrying a fresh token skip the replica (see app.database.get_read_db)
+        response = await call_next(request)
+        if request.method not in ("GET", "HEAD", "OPTIONS") and response.status_code < 400:
+            token = f"{time.time():.3f}"
+            response.headers[LAST_WRITE_HEADER] = token
+            response.set_cookie(LAST_WRITE_COOKIE, token, max_age=int(settings.REPLICA_MAX_LAG_SECONDS) + 1, httponly=True, samesite="lax")
+        return response
+
 app.include_router(auth_router)
 app.include_router(account_router)
 
+@app.on_event("shutdown")
+def shutdown_workers():
+    shutdown_password_hasher()
+
+@app.on_event("startup")
+def open_ledger():
+    # The memory backend replays its write-ahead log here rather than on the first request
+    get_ledger()
+
+@app.on_event("shutdown")
+def flush_ledger():
+    close_ledger()
+
+@app.on_event("shutdown")
+async def close_database_connections():
+    await dispose_async_engines()
+
+@app.get("/metrics", tags=["health"], response_class=PlainTextResponse)
+def metrics():
+    return render_metrics()
+
 @app.get("/", tags=["health"])
 def health_check():
     return {
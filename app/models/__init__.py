@@ -1,5 +1,5 @@
-from sqlalchemy import Column, Integer, String, DECIMAL, TIMESTAMP, Enum, ForeignKey, CheckConstraint
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, BigInteger, String, Text, DECIMAL, TIMESTAMP, Date, Enum, ForeignKey, CheckConstraint, Index
+from sqlalchemy.orm import relationship, query_expression
 from sqlalchemy.sql import func
 from app.database import Base
 import enum
@@ -31,9 +31,13 @@ class Account(Base):
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, unique=True)
     account_number = Column(String(20), unique=True, nullable=False, index=True)
     balance = Column(DECIMAL(15, 2), nullable=False, default=0.00)
+    balance_shards = Column(Integer, nullable=False, default=0, server_default="0")  # > 0 = hot account
     created_at = Column(TIMESTAMP, server_default=func.now(), nullable=False)
     updated_at = Column(TIMESTAMP, server_default=func.now(), onupdate=func.now(), nullable=False)
 
+    # Sum of the hot-account shards; only populated by queries using balance_service.with_shard_balance()
+    shard_balance = query_expression()
+
     user = relationship("User", back_populates="account")
     transactions = relationship("Transaction", back_populates="account", cascade="all, delete-orphan")
 
@@ -41,6 +45,10 @@ class Account(Base):
         CheckConstraint('balance >= 0', name='check_balance_non_negative'),
     )
 
+    @property
+    def total_balance(self):
+        return self.balance + (self.shard_balance or 0)
+
 class Transaction(Base):
 
     __tablename__ = "transactions"
@@ -49,7 +57,7 @@ class Transaction(Base):
     account_id = Column(Integer, ForeignKey("accounts.id", ondelete="CASCADE"), nullable=False, index=True)
     transaction_type = Column(Enum(TransactionType), nullable=False)
     amount = Column(DECIMAL(15, 2), nullable=False)
-    balance_after = Column(DECIMAL(15, 2), nullable=False)
+    balance_after = Column(DECIMAL(15, 2), nullable=True)  # NULL for hot-account credits (see balance_service)
     related_transaction_id = Column(Integer, ForeignKey("transactions.id", ondelete="SET NULL"), nullable=True)
     description = Column(String(255), nullable=True)
     created_at = Column(TIMESTAMP, server_default=func.now(), nullable=False, index=True)
@@ -58,5 +66,82 @@ class Transaction(Base):
 
     __table_args__ = (
         CheckConstraint('amount > 0', name='check_amount_positive'),
+        # Serves history pages ordered by (created_at, id) for one account, including keyset seeks
+        Index('ix_transactions_account_created_id', 'account_id', 'created_at', 'id'),
     )
-    
\ No newline at end of file
+
+    # Fetch id/created_at with the INSERT (RETURNING where supported) instead of a refresh
+    __mapper_args__ = {"eager_defaults": True}
+
+class AccountBalanceShard(Base):
+    # Sub-balances of a hot account (see app.services.balance_service)
+
+    __tablename__ = "account_balance_shards"
+
+    account_id = Column(Integer, ForeignKey("accounts.id", ondelete="CASCADE"), primary_key=True)
+    shard = Column(Integer, primary_key=True)
+    balance = Column(DECIMAL(15, 2), nullable=False, default=0.00)
+
+    __table_args__ = (
+        CheckConstraint('balance >= 0', name='check_shard_balance_non_negative'),
+    )
+
+class DailyAccountStats(Base):
+    # Per-account, per-day rollup of postings, kept current by every posting path
+    # so dashboard stats read at most one row per day instead of every transaction
+
+    __tablename__ = "daily_account_stats"
+
+    account_id = Column(Integer, ForeignKey("accounts.id", ondelete="CASCADE"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    shard = Column(Integer, primary_key=True, default=0)  # Hot accounts spread their rollup like their balance
+    total_income = Column(DECIMAL(15, 2), nullable=False, default=0.00)
+    total_expenses = Column(DECIMAL(15, 2), nullable=False, default=0.00)
+    transaction_count = Column(Integer, nullable=False, default=0)
+
+class IdAllocator(Base):
+    # Named counters handed out in blocks (see app.services.generate_account_number)
+
+    __tablename__ = "id_allocators"
+
+    name = Column(String(50), primary_key=True)
+    next_value = Column(BigInteger, nullable=False)
+
+class IdempotencyKey(Base):
+    # Outcome of a posting request, replayed when a client retries with the same Idempotency-Key
+    # (see app.services.idempotency_service)
+
+    __tablename__ = "idempotency_keys"
+
+    key = Column(String(255), primary_key=True)
+    endpoint = Column(String(50), nullable=False)
+    request_hash = Column(String(64), nullable=False)  # sha256 of the request body, to refuse a reused key
+    response = Column(Text, nullable=True)  # JSON response body; NULL while the posting is in flight
+    created_at = Column(TIMESTAMP, server_default=func.now(), nullable=False)
+    expires_at = Column(TIMESTAMP, nullable=False, index=True)
+
+class AccountBalanceSnapshot(Base):
+    # Month-end balance checkpoints (see app.services.snapshot_balances): balance of the account
+    # counting every transaction created before as_of
+
+    __tablename__ = "account_balance_snapshots"
+
+    account_id = Column(Integer, ForeignKey("accounts.id", ondelete="CASCADE"), primary_key=True)
+    as_of = Column(TIMESTAMP, primary_key=True, index=True)
+    balance = Column(DECIMAL(15, 2), nullable=False)
+    last_transaction_id = Column(Integer, nullable=True)  # Latest transaction counted, NULL if none yet
+
+class TransactionArchive(Base):
+    # One month of transactions moved out of the database into a compressed Parquet file under
+    # TRANSACTION_ARCHIVE_DIR (see app.services.archive_service). A month archived again later
+    # (e.g. after a back-dated import) gets a second part
+
+    __tablename__ = "transaction_archives"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    month = Column(Date, nullable=False, index=True)  # First day of the archived month
+    file_name = Column(String(255), unique=True, nullable=False)  # Relative to TRANSACTION_ARCHIVE_DIR
+    row_count = Column(Integer, nullable=False)
+    first_transaction_id = Column(Integer, nullable=True)
+    last_transaction_id = Column(Integer, nullable=True)
+    archived_at = Column(TIMESTAMP, server_default=func.now(), nullable=False)
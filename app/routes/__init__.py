@@ -1,12 +1,30 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Header, Request, status
+from fastapi.responses import StreamingResponse
+from datetime import datetime
 from sqlalchemy.orm import Session
-from app.database import get_db
-from app.schemas import AccountCreate, AccountResponse, TransactionHistoryResponse, DepositRequest, TransactionSuccessResponse, WithdrawalRequest, TransferRequest, TransferSuccessResponse, TransferByAccountNumberRequest, DashboardStatsResponse
-from app.services import create_account, get_account_by_id, get_account_transactions, deposit_funds, withdraw_funds, transfer_funds, transfer_by_account_number, get_dashboard_stats, get_account_by_account_number
+from typing import Optional
+from app.database import get_session, get_read_db, use_replica, run_db, DbSession
+from app.schemas import AccountCreate, AccountResponse, TransactionHistoryResponse, DepositRequest, TransactionSuccessResponse, WithdrawalRequest, TransferRequest, TransferSuccessResponse, TransferByAccountNumberRequest, DashboardStatsResponse, BalanceAtResponse, BatchTransactionRequest, BatchTransactionResponse, BalanceShardsRequest
+from app.services import create_account, get_dashboard_stats, balance_at, decode_history_cursor, stream_account_statement
+from app.services.ledger_service import get_ledger
+from app.services.account_cache_service import account_metadata
+from app.services.balance_service import set_balance_shards
+from app.services.idempotency_service import run_idempotent, IdempotencyConflict
+from app.utils.responses import model_response
+from app.config import get_settings
 
 
 router = APIRouter(prefix="/api/v1", tags=["accounts"])
 
+settings = get_settings()
+
+# Sent by clients that retry postings; a repeated key returns the first response instead of posting again
+IdempotencyKeyHeader = Header(None, max_length=255, description="Unique key per logical posting; retries with the same key are not posted twice")
+
+def replayed_headers(replayed: bool) -> Optional[dict]:
+    # Tells a retrying client that nothing was posted this time
+    return {"Idempotent-Replayed": "true"} if replayed else None
+
 
 @router.post(
     "/accounts",
@@ -15,12 +33,12 @@ router = APIRouter(prefix="/api/v1", tags=["accounts"])
     summary="Create a new bank account",
     description="Creates a new bank account with an optional initial balance"
 )
-def create_account_endpoint(account_data: AccountCreate, db: Session = Depends(get_db)):
+async def create_account_endpoint(account_data: AccountCreate, db: DbSession = Depends(get_session)):
     try:
-        account = create_account(db, account_data)
+        account = await run_db(db, create_account, account_data)
         return account
     except Exception as e:
-        db.rollback()
+        await run_db(db, Session.rollback)
         import traceback
         print("=" * 60)
         print("ERROR CREATING ACCOUNT:")
@@ -41,9 +59,9 @@ def create_account_endpoint(account_data: AccountCreate, db: Session = Depends(g
     summary="Get account details",
     description="Retrieve account information by account ID"
 )
-def get_account_endpoint(account_id: int, db: Session = Depends(get_db)):
+async def get_account_endpoint(account_id: int, db: DbSession = Depends(get_read_db)):
  
-    account = get_account_by_id(db, account_id)
+    account = await run_db(db, get_ledger().get_account_by_id, account_id)
     
     if not account:
         raise HTTPException(
@@ -54,50 +72,118 @@ def get_account_endpoint(account_id: int, db: Session = Depends(get_db)):
     return account
 
 
+@router.put(
+    "/accounts/{account_id}/balance-shards",
+    response_model=AccountResponse,
+    summary="Configure hot-account balance shards",
+    description="Split a high-traffic account's balance across N sub-balances so concurrent credits don't contend on one row (0 turns it off)"
+)
+async def set_balance_shards_endpoint(account_id: int, shards_data: BalanceShardsRequest, db: DbSession = Depends(get_session)):
+    try:
+        return await run_db(db, set_balance_shards, account_id, shards_data.shards)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        await run_db(db, Session.rollback)
+        raise HTTPException(status_code=500, detail=f"Failed to configure balance shards: {str(e)}")
+
+
 @router.get(
     "/accounts/{account_id}/history",
     response_model=TransactionHistoryResponse,
     summary="Get Transaction History",
-    description="Retrieve transaction history for the given account in a paginated format"
+    description="Retrieve transaction history for the given account in a paginated format. Pass the returned next_cursor as cursor for constant-cost paging"
 )
-def get_transaction_history_endpoint(account_id: int, limit: int = 10, offset: int = 0, db: Session = Depends(get_db)):
+async def get_transaction_history_endpoint(account_id: int, limit: int = 10, offset: int = 0, cursor: Optional[str] = None, include_total: bool = True, db: DbSession = Depends(get_read_db)):
     if limit < 1 or limit > 100:
         raise HTTPException(status_code=400, detail="Limit must be between 1 and 100!")
     if offset < 0:
         raise HTTPException(status_code=400, detail="Offset cannot be negative!!")
+    if cursor and offset:
+        raise HTTPException(status_code=400, detail="Use either cursor or offset, not both!")
+
+    after = None
+    if cursor:
+        try:
+            after = decode_history_cursor(cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
     
     try:
-        history = get_account_transactions(db, account_id, limit, offset)
-        return history
+        history = await run_db(db, get_ledger().get_account_transactions, account_id, limit, offset, after=after, include_total=include_total)
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
-        db.rollback()
+        await run_db(db, Session.rollback)
         raise HTTPException(status_code=500, detail=f"failed to retrieve transaction history: {str(e)}")
+
+    # Validated once and written straight to JSON, instead of validate + dump to dicts + json.dumps
+    return model_response(TransactionHistoryResponse.model_validate(history))
     
 
+STATEMENT_MEDIA_TYPES = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson"
+}
+
+@router.get(
+    "/accounts/{account_id}/statement",
+    summary="Export account statement",
+    description="Stream the full transaction statement (oldest first) as CSV or NDJSON, optionally limited to [start, end)"
+)
+async def export_statement_endpoint(request: Request, account_id: int, format: str = "csv", start: Optional[datetime] = None, end: Optional[datetime] = None, db: DbSession = Depends(get_read_db)):
+    if format not in STATEMENT_MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail="Format must be csv or ndjson!")
+    if start and end and start >= end:
+        raise HTTPException(status_code=400, detail="start must be before end!")
+
+    account = await run_db(db, account_metadata, account_id)
+
+    if not account:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Account with id {account_id} not found"
+        )
+
+    filename = f"statement-{account.account_number}.{format}"
+
+    return StreamingResponse(
+        stream_account_statement(account_id, format, start, end, use_replica=use_replica(request)),
+        media_type=STATEMENT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
 @router.post(
     "/transactions/deposit",
     response_model=TransactionSuccessResponse,
     summary="Make a deposit",
     description="Add funds to an account given the deatils and amount"
 )
-def deposit_funds_endpoint(deposit_data: DepositRequest, db: Session = Depends(get_db)):
+async def deposit_funds_endpoint(deposit_data: DepositRequest, idempotency_key: Optional[str] = IdempotencyKeyHeader, db: DbSession = Depends(get_session)):
     try:
-        result = deposit_funds(
-            db=db,
+        result, replayed = await run_idempotent(
+            db,
+            idempotency_key,
+            "deposit",
+            deposit_data,
+            TransactionSuccessResponse,
+            get_ledger().deposit_funds,
             account_id=deposit_data.account_id,
             amount=deposit_data.amount,
             description=deposit_data.description            
         )
 
-        return result
+        return model_response(result, headers=replayed_headers(replayed))
     
+    except IdempotencyConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     
     except Exception as e:
-        db.rollback()
+        await run_db(db, Session.rollback)
         raise HTTPException(status_code=500, detail=f"Deposit failed: {str(e)}")
     
 @router.post(
@@ -106,20 +192,27 @@ def deposit_funds_endpoint(deposit_data: DepositRequest, db: Session = Depends(g
     summary="Make a withdrawal",
     description="Withdraw an amount from a user's account"
 )
-def withdraw_funds_endpoint(withdraw_data: WithdrawalRequest, db: Session = Depends(get_db)):
+async def withdraw_funds_endpoint(withdraw_data: WithdrawalRequest, idempotency_key: Optional[str] = IdempotencyKeyHeader, db: DbSession = Depends(get_session)):
     try:
-        result = withdraw_funds(
-            db=db,
+        result, replayed = await run_idempotent(
+            db,
+            idempotency_key,
+            "withdraw",
+            withdraw_data,
+            TransactionSuccessResponse,
+            get_ledger().withdraw_funds,
             account_id=withdraw_data.account_id,
             amount=withdraw_data.amount,
             description=withdraw_data.description
         )
 
-        return result
+        return model_response(result, headers=replayed_headers(replayed))
+    except IdempotencyConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        db.rollback()
+        await run_db(db, Session.rollback)
         raise HTTPException(status_code=500, detail=f"Withdrawal failed: {str(e)}")
     
 @router.post(
@@ -128,10 +221,15 @@ def withdraw_funds_endpoint(withdraw_data: WithdrawalRequest, db: Session = Depe
     summary="Make a transfer",
     description="Make a transfer from one account to another account given the IDs"
 )
-def transfer_funds_endpoint(transfer_data: TransferRequest, db: Session = Depends(get_db)):
+async def transfer_funds_endpoint(transfer_data: TransferRequest, idempotency_key: Optional[str] = IdempotencyKeyHeader, db: DbSession = Depends(get_session)):
     try:
-        result = transfer_funds(
-            db=db,
+        result, replayed = await run_idempotent(
+            db,
+            idempotency_key,
+            "transfer",
+            transfer_data,
+            TransferSuccessResponse,
+            get_ledger().transfer_funds,
             from_account_id=transfer_data.from_account_id,
             to_account_id=transfer_data.to_account_id,
             amount=transfer_data.amount,
@@ -141,7 +239,9 @@ def transfer_funds_endpoint(transfer_data: TransferRequest, db: Session = Depend
         # Add transaction ID to response
         result.transaction_id = f"#TXN-{result.from_account.transaction.id:06d}"
 
-        return result
+        return model_response(result, headers=replayed_headers(replayed))
+    except IdempotencyConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=400, detail=f"Transfer failed: {str(e)}")
     except Exception as e:
@@ -153,10 +253,15 @@ def transfer_funds_endpoint(transfer_data: TransferRequest, db: Session = Depend
     summary="Make a transfer by account number",
     description="Make a transfer from one account to another using recipient's account number"
 )
-def transfer_by_account_number_endpoint(transfer_data: TransferByAccountNumberRequest, db: Session = Depends(get_db)):
+async def transfer_by_account_number_endpoint(transfer_data: TransferByAccountNumberRequest, idempotency_key: Optional[str] = IdempotencyKeyHeader, db: DbSession = Depends(get_session)):
     try:
-        result = transfer_by_account_number(
-            db=db,
+        result, replayed = await run_idempotent(
+            db,
+            idempotency_key,
+            "transfer-by-account",
+            transfer_data,
+            TransferSuccessResponse,
+            get_ledger().transfer_by_account_number,
             from_account_id=transfer_data.from_account_id,
             to_account_number=transfer_data.to_account_number,
             amount=transfer_data.amount,
@@ -166,35 +271,90 @@ def transfer_by_account_number_endpoint(transfer_data: TransferByAccountNumberRe
         # Add transaction ID to response
         result.transaction_id = f"#TXN-{result.from_account.transaction.id:06d}"
 
-        return result
+        return model_response(result, headers=replayed_headers(replayed))
+    except IdempotencyConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Transfer failed: {str(e)}")
 
+@router.post(
+    "/transactions/batch",
+    response_model=BatchTransactionResponse,
+    summary="Post a batch of transactions",
+    description="Apply many deposits, withdrawals and transfers in one request, committed in chunks, with a result per operation"
+)
+async def post_transaction_batch_endpoint(batch_data: BatchTransactionRequest, idempotency_key: Optional[str] = IdempotencyKeyHeader, db: DbSession = Depends(get_session)):
+    if len(batch_data.operations) > settings.BATCH_MAX_OPERATIONS:
+        raise HTTPException(status_code=400, detail=f"A batch can hold at most {settings.BATCH_MAX_OPERATIONS} operations")
+
+    try:
+        if not idempotency_key:
+            # Not retried: chunks committed before a failure would be posted again
+            return await run_db(
+                db,
+                get_ledger().post_transaction_batch,
+                operations=batch_data.operations,
+                chunk_size=batch_data.chunk_size or settings.BATCH_CHUNK_SIZE
+            )
+
+        # With a key the chunks become savepoints of one transaction, committed with the claim
+        result, replayed = await run_idempotent(
+            db,
+            idempotency_key,
+            "batch",
+            batch_data,
+            BatchTransactionResponse,
+            get_ledger().post_transaction_batch,
+            operations=batch_data.operations,
+            chunk_size=batch_data.chunk_size or settings.BATCH_CHUNK_SIZE
+        )
+
+        return model_response(result, headers=replayed_headers(replayed))
+    except IdempotencyConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        await run_db(db, Session.rollback)
+        raise HTTPException(status_code=500, detail=f"Batch failed: {str(e)}")
+
 @router.get(
     "/accounts/{account_id}/stats",
     response_model=DashboardStatsResponse,
     summary="Get dashboard statistics",
     description="Get income, expenses, and transaction count for the last N days"
 )
-def get_dashboard_stats_endpoint(account_id: int, days: int = 30, db: Session = Depends(get_db)):
+async def get_dashboard_stats_endpoint(account_id: int, days: int = 30, db: DbSession = Depends(get_read_db)):
     try:
-        stats = get_dashboard_stats(db, account_id, days)
+        stats = await run_db(db, get_dashboard_stats, account_id, days)
         return stats
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to retrieve statistics: {str(e)}")
 
+@router.get(
+    "/accounts/{account_id}/balance-at",
+    response_model=BalanceAtResponse,
+    summary="Get historical balance",
+    description="Balance of the account at a past date and time, from the month-end checkpoint plus one index seek"
+)
+async def get_balance_at_endpoint(account_id: int, at: datetime, db: DbSession = Depends(get_read_db)):
+    try:
+        return await run_db(db, balance_at, account_id, at)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to retrieve balance: {str(e)}")
+
 @router.get(
     "/accounts/by-number/{account_number}",
     response_model=AccountResponse,
     summary="Get account by account number",
     description="Retrieve account information by account number"
 )
-def get_account_by_number_endpoint(account_number: str, db: Session = Depends(get_db)):
-    account = get_account_by_account_number(db, account_number)
+async def get_account_by_number_endpoint(account_number: str, db: DbSession = Depends(get_read_db)):
+    account = await run_db(db, get_ledger().get_account_by_account_number, account_number)
     
     if not account:
         raise HTTPException(
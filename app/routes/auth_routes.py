@@ -1,20 +1,44 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
-from app.schemas import UserCreate, UserLogin, AuthResponse, UserResponse, AccountInfoResponse
-from app.database import get_db
-from app.services.auth_service import resgister_user, login_user
+from app.schemas import UserCreate, UserLogin, AuthResponse, UserResponse, AccountInfoResponse, CurrentUser
+from app.database import get_session, DbSession
+from app.services.auth_service import resgister_user, login_user, authenticate_token
+from app.utils import PasswordHasherBusy
 
 router = APIRouter(prefix="/api/v1/auth", tags=["authentication"])
 
+bearer_scheme = HTTPBearer(auto_error=False)
+
+async def get_current_user(
+    credentials: HTTPAuthorizationCredentials | None = Depends(bearer_scheme),
+    db: DbSession = Depends(get_session)
+) -> CurrentUser:
+    """Dependency resolving the Bearer token to the authenticated user (cached per token)"""
+    if credentials is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated",
+            headers={"WWW-Authenticate": "Bearer"}
+        )
+    try:
+        return await authenticate_token(db, credentials.credentials)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail=str(e),
+            headers={"WWW-Authenticate": "Bearer"}
+        )
+
 @router.post(
     "/register",
     response_model=AuthResponse,
     summary="Register a new user",
     description="Create a new user account with an optional initial deposit."
 )
-def register(user_data: UserCreate, db: Session = Depends(get_db)) -> AuthResponse:
+async def register(user_data: UserCreate, db: DbSession = Depends(get_session)) -> AuthResponse:
     try:
-        result = resgister_user(db, user_data)
+        result = await resgister_user(db, user_data)
 
         return AuthResponse(
             message="User registered successfully",
@@ -22,6 +46,12 @@ def register(user_data: UserCreate, db: Session = Depends(get_db)) -> AuthRespon
             account=AccountInfoResponse.model_validate(result["account"]),
             token=result["token"]
         )
+    except PasswordHasherBusy as e:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=str(e),
+            headers={"Retry-After": "1"}
+        )
     except ValueError as ve:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -39,9 +69,9 @@ def register(user_data: UserCreate, db: Session = Depends(get_db)) -> AuthRespon
     summary="Login user",
     description="Authenticate user and return access token"
 )
-def login(credentials: UserLogin, db: Session = Depends(get_db)) -> AuthResponse:
+async def login(credentials: UserLogin, db: DbSession = Depends(get_session)) -> AuthResponse:
     try:
-        result = login_user(db, credentials.email, credentials.password)
+        result = await login_user(db, credentials.email, credentials.password)
 
         return AuthResponse(
             message="Login successful!",
@@ -50,6 +80,13 @@ def login(credentials: UserLogin, db: Session = Depends(get_db)) -> AuthResponse
             token=result["token"]
         )
     
+    except PasswordHasherBusy as e:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=str(e),
+            headers={"Retry-After": "1"}
+        )
+
     except ValueError as e:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -61,4 +98,13 @@ def login(credentials: UserLogin, db: Session = Depends(get_db)) -> AuthResponse
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Login failed: {str(e)}"
-        )
\ No newline at end of file
+        )
+
+@router.get(
+    "/me",
+    response_model=CurrentUser,
+    summary="Current user",
+    description="Return the user and account behind the Bearer token"
+)
+async def me(current_user: CurrentUser = Depends(get_current_user)) -> CurrentUser:
+    return current_user
@@ -1,9 +1,13 @@
-from pydantic import BaseModel, Field, ConfigDict, EmailStr
+from pydantic import BaseModel, Field, ConfigDict, EmailStr, model_validator, AliasChoices, PlainSerializer
 from decimal import Decimal
-from typing import Optional, List
+from typing import Annotated, Optional, List
 from datetime import datetime
 from enum import Enum
 
+# Money fields in JSON: a number, written by pydantic-core itself (no per-field Python encoder).
+# Amounts are DECIMAL(15, 2), at most 15 significant digits, so the float round-trips to the exact cents
+Money = Annotated[Decimal, PlainSerializer(float, return_type=float, when_used="json")]
+
 class UserCreate(BaseModel):
     name: str = Field(..., min_length=2, max_length=100, description="User's full name")
     email: EmailStr = Field(..., description="User's email address")
@@ -48,15 +52,10 @@ class UserResponse(BaseModel):
 class AccountInfoResponse(BaseModel):
     id: int
     account_number: str
-    balance: Decimal
+    balance: Money = Field(validation_alias=AliasChoices("total_balance", "balance"))  # Includes hot-account shards
     created_at: datetime
     
-    model_config = ConfigDict(
-        from_attributes=True,
-        json_encoders={
-            Decimal: lambda v: float(v)
-        }
-    )
+    model_config = ConfigDict(from_attributes=True)
 
 
 class AuthResponse(BaseModel):
@@ -67,6 +66,15 @@ class AuthResponse(BaseModel):
     token_type: str = "bearer"
 
 
+class CurrentUser(BaseModel):
+    """Authenticated principal, built from verified JWT claims"""
+    user_id: int
+    email: str
+    name: str
+    account_id: int
+    account_number: str
+
+
 class TransactionTypeEnum(str, Enum):
     CREDIT = "CREDIT"
     DEBIT = "DEBIT"
@@ -84,19 +92,29 @@ class AccountCreate(BaseModel):
 class AccountResponse(BaseModel):
     id: int
     account_number: str
-    balance: Decimal
+    balance: Money = Field(validation_alias=AliasChoices("total_balance", "balance"))  # Includes hot-account shards
+    balance_shards: int = 0
     created_at: datetime
 
-    model_config = ConfigDict(from_attributes=True, json_encoders={
-        Decimal: lambda v: float(v)
-    })
+    model_config = ConfigDict(from_attributes=True)
+
+class BalanceShardsRequest(BaseModel):
+    shards: int = Field(..., ge=0, le=64, description="Number of sub-balances for a hot account (0 = normal account)")
+
+    model_config = ConfigDict(
+        json_schema_extra={
+            "example": {
+                "shards": 8
+            }
+        }
+    )
 
 class TransactionResponse(BaseModel):
     id: int
     account_id: int
     transaction_type: TransactionTypeEnum
     amount: Decimal
-    balance_after: Decimal
+    balance_after: Optional[Decimal] = None  # Not known when a hot-account credit is posted; history pages fill it in
     related_trasaction_id: Optional[int] = None
     description: Optional[str] = None
     created_at: datetime
@@ -109,13 +127,12 @@ class TransactionResponse(BaseModel):
 class TransactionHistoryResponse(BaseModel):
     account_id: int
     account_number: str
-    current_balance: Decimal
+    current_balance: Money
     transactions: List[TransactionResponse]
-    total_transactions: int
+    total_transactions: Optional[int] = None  # None when the count was skipped (include_total=false)
+    next_cursor: Optional[str] = None  # Pass back as ?cursor= to fetch the next page
 
-    model_config = ConfigDict(from_attributes=True, json_encoders= {
-        Decimal: lambda v: float(v)
-    })
+    model_config = ConfigDict(from_attributes=True)
 
 class DepositRequest(BaseModel):
     account_id: int = Field(..., gt=0, description="Acount ID to deposit into")
@@ -135,11 +152,9 @@ class DepositRequest(BaseModel):
 class TransactionSuccessResponse(BaseModel):
     message: str
     transaction: TransactionResponse
-    new_balance: Decimal
+    new_balance: Money
 
-    model_config = ConfigDict(from_attributes=True, json_encoders={
-        Decimal: lambda v: float(v)
-        })
+    model_config = ConfigDict(from_attributes=True)
 
 class WithdrawalRequest(BaseModel):
     account_id: int = Field(..., gt=0, description="Account to withdraw from")
@@ -193,12 +208,9 @@ class TransferByAccountNumberRequest(BaseModel):
 class AccountTransactionDetail(BaseModel):
     account_id: int
     transaction: TransactionResponse
-    new_balance: Decimal
+    new_balance: Money
     
-    model_config = ConfigDict(from_attributes=True, json_encoders={
-            Decimal: lambda v: float(v)
-        }
-    )
+    model_config = ConfigDict(from_attributes=True)
 
 class TransferSuccessResponse(BaseModel):
     message: str
@@ -208,13 +220,62 @@ class TransferSuccessResponse(BaseModel):
     
     model_config = ConfigDict(from_attributes=True)
 
+class BalanceAtResponse(BaseModel):
+    account_id: int
+    account_number: str
+    at: datetime
+    balance: Money
+
 class DashboardStatsResponse(BaseModel):
-    total_income: Decimal
-    total_expenses: Decimal
+    total_income: Money
+    total_expenses: Money
     total_transactions: int
-    
+
+class BatchOperationType(str, Enum):
+    DEPOSIT = "DEPOSIT"
+    WITHDRAW = "WITHDRAW"
+    TRANSFER = "TRANSFER"
+
+class BatchOperation(BaseModel):
+    operation: BatchOperationType
+    account_id: Optional[int] = Field(None, gt=0, description="Account for DEPOSIT / WITHDRAW")
+    from_account_id: Optional[int] = Field(None, gt=0, description="Source account for TRANSFER")
+    to_account_id: Optional[int] = Field(None, gt=0, description="Destination account for TRANSFER")
+    amount: Decimal = Field(..., gt=0, description="Amount to move")
+    description: Optional[str] = Field(None, max_length=255, description="Optional description")
+
+    @model_validator(mode="after")
+    def check_accounts(self):
+        if self.operation == BatchOperationType.TRANSFER:
+            if self.from_account_id is None or self.to_account_id is None:
+                raise ValueError("TRANSFER needs from_account_id and to_account_id")
+        elif self.account_id is None:
+            raise ValueError(f"{self.operation.value} needs account_id")
+        return self
+
+class BatchTransactionRequest(BaseModel):
+    operations: List[BatchOperation] = Field(..., min_length=1, description="Operations, applied in order")
+    chunk_size: Optional[int] = Field(None, gt=0, description="Operations per commit (defaults to BATCH_CHUNK_SIZE)")
+
     model_config = ConfigDict(
-        json_encoders={
-            Decimal: lambda v: float(v)
+        json_schema_extra={
+            "example": {
+                "operations": [
+                    {"operation": "DEPOSIT", "account_id": 1, "amount": 1500.00, "description": "Payroll"},
+                    {"operation": "TRANSFER", "from_account_id": 1, "to_account_id": 2, "amount": 200.00}
+                ]
+            }
         }
-    )
\ No newline at end of file
+    )
+
+class BatchItemResult(BaseModel):
+    index: int
+    status: str  # "ok" or "failed"
+    error: Optional[str] = None
+    transaction_ids: List[int] = []
+
+class BatchTransactionResponse(BaseModel):
+    message: str
+    succeeded: int
+    failed: int
+    results: List[BatchItemResult]
@@ -1,17 +1,97 @@
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, aliased
+from sqlalchemy.orm.attributes import set_committed_value
 from sqlalchemy.sql import func
-from app.models import Account, TransactionType, Transaction, User
-from app.schemas import AccountCreate, TransactionSuccessResponse, TransferSuccessResponse, AccountTransactionDetail
+from sqlalchemy import select, tuple_, case, insert, update, literal, and_, or_, TIMESTAMP
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from app.models import Account, TransactionType, Transaction, User, DailyAccountStats, IdAllocator, AccountBalanceSnapshot
+from app.schemas import AccountCreate, TransactionSuccessResponse, TransferSuccessResponse, AccountTransactionDetail, BatchOperation, BatchOperationType
+from app.database import SessionLocal, ReadSessionLocal, engine
+from app.config import get_settings
+from app.services.balance_service import LockedBalance, lock_balances, current_balance, running_balance, with_shard_balance, shard_balance_expression, insufficient_funds
+from app.services.account_cache_service import AccountMetadata, account_metadata, account_metadata_by_number, account_metadata_many, forget_account
+from app.services.archive_service import archived_until, iter_archived_statement_rows, archived_balance
 from decimal import Decimal as d
-import random
+from datetime import datetime, timedelta
+import base64
+import csv
+import io
+import json
+import threading
 
-def generate_account_number() -> str:
-    number = random.randint(100000, 999999)
-    return f"ACC-{number:06d}"
-    #Account number looks like ACC-XXXXXX
+settings = get_settings()
+
+# Money columns are DECIMAL(15, 2); amounts are normalised to this before posting
+CENTS = d("0.01")
+
+# Per-process block of reserved account sequence values: [next, end)
+_account_number_block = {"next": 0, "end": 0}
+_account_number_lock = threading.Lock()
+
+def _reserve_account_number_block(bind, size: int) -> int:
+    # Own short transaction, so the counter row lock is never held for the length of a registration
+    for _ in range(2):
+        try:
+            with bind.begin() as conn:
+                start = conn.execute(
+                    select(IdAllocator.next_value).where(IdAllocator.name == "account_number").with_for_update()
+                ).scalar()
+
+                if start is None:
+                    start = 1
+                    conn.execute(insert(IdAllocator).values(name="account_number", next_value=start + size))
+                else:
+                    conn.execute(
+                        update(IdAllocator).where(IdAllocator.name == "account_number").values(next_value=start + size)
+                    )
+                return start
+        except IntegrityError:
+            # Another worker created the counter row first - retry against it
+            continue
+
+    raise RuntimeError("Could not reserve account numbers")
+
+def luhn_check_digit(digits: str) -> str:
+    total = 0
+    for position, digit in enumerate(reversed(digits)):
+        value = int(digit)
+        if position % 2 == 0:
+            value *= 2
+            if value > 9:
+                value -= 9
+        total += value
+    return str((10 - total % 10) % 10)
+
+def generate_account_number(db: Session | None = None) -> str:
+    """
+    Next unique account number, e.g. ACC-0000000017 (sequence value + check digit).
+    A block refill goes through db's engine, so under run_db with the async stack it awaits
+    the async driver instead of blocking the event loop on the sync engine.
+    """
+    while True:
+        with _account_number_lock:
+            if _account_number_block["next"] < _account_number_block["end"]:
+                value = _account_number_block["next"]
+                _account_number_block["next"] += 1
+                break
+
+        # Refilled outside the lock: on the event loop, a thread lock held across the round trip
+        # would block every other request wanting a number
+        size = settings.ACCOUNT_NUMBER_BLOCK_SIZE
+        start = _reserve_account_number_block(db.get_bind() if db is not None else engine, size)
+        with _account_number_lock:
+            # If another caller refilled first, this block is dropped - numbers only need to be unique
+            if _account_number_block["next"] >= _account_number_block["end"]:
+                _account_number_block.update(next=start, end=start + size)
+
+    body = f"{value:0{settings.ACCOUNT_NUMBER_DIGITS}d}"
+    if len(body) > settings.ACCOUNT_NUMBER_DIGITS:
+        raise RuntimeError("Account number space exhausted - increase ACCOUNT_NUMBER_DIGITS")
+
+    return f"{settings.ACCOUNT_NUMBER_PREFIX}{body}{luhn_check_digit(body)}"
 
 def create_account(db: Session, account_data: AccountCreate) -> Account:
-    account_number = generate_account_number()
+    account_number = generate_account_number(db)
 
     new_account = Account(
         account_number = account_number,
@@ -30,8 +110,10 @@ def create_account(db: Session, account_data: AccountCreate) -> Account:
             description="Initial deposit"
         )
         db.add(initial_transaction)
+        record_daily_stats(db, [initial_transaction])
     
     db.commit()
+    forget_account(new_account.id, account_number)
 
     db.refresh(new_account)
 
@@ -39,89 +121,370 @@ def create_account(db: Session, account_data: AccountCreate) -> Account:
 
 def get_account_by_id(db: Session, account_id: int) -> Account | None:
     #returns account object if found or None
-    return db.query(Account).filter(Account.id == account_id).first()
+    return db.query(Account).options(with_shard_balance()).filter(Account.id == account_id).first()
 
 def get_account_by_account_number(db: Session, account_number: str) -> Account | None:
     """Get account by account number"""
-    return db.query(Account).filter(Account.account_number == account_number).first()
+    return db.query(Account).options(with_shard_balance()).filter(Account.account_number == account_number).first()
+
+
+def _upsert_statement(db: Session):
+    # INSERT ... ON CONFLICT / ON DUPLICATE KEY that adds onto an existing day row
+    table = DailyAccountStats.__table__
+    dialect = db.get_bind().dialect.name
+
+    if dialect == "mysql":
+        stmt = mysql.insert(table).values(day=func.current_date())
+        return stmt.on_duplicate_key_update(
+            total_income=table.c.total_income + stmt.inserted.total_income,
+            total_expenses=table.c.total_expenses + stmt.inserted.total_expenses,
+            transaction_count=table.c.transaction_count + stmt.inserted.transaction_count
+        )
+
+    if dialect not in ("postgresql", "sqlite"):
+        raise ValueError(f"Daily stats rollup is not supported on {dialect}")
+
+    insert_fn = postgresql.insert if dialect == "postgresql" else sqlite.insert
+    stmt = insert_fn(table).values(day=func.current_date())
+    return stmt.on_conflict_do_update(
+        index_elements=[table.c.account_id, table.c.day, table.c.shard],
+        set_={
+            "total_income": table.c.total_income + stmt.excluded.total_income,
+            "total_expenses": table.c.total_expenses + stmt.excluded.total_expenses,
+            "transaction_count": table.c.transaction_count + stmt.excluded.transaction_count
+        }
+    )
+
+def record_daily_stats(db: Session, transactions: list[Transaction], shards: dict[int, int] | None = None):
+    """Add new postings to today's daily_account_stats rows (same DB transaction as the postings)"""
+    # Hot accounts write to the rollup shard matching the balance shard they credited
+    shards = shards or {}
+    totals = {}
+    for txn in transactions:
+        income, expenses, count = totals.get(txn.account_id, (d("0.00"), d("0.00"), 0))
+        if txn.transaction_type == TransactionType.CREDIT:
+            income += txn.amount
+        else:
+            expenses += txn.amount
+        totals[txn.account_id] = (income, expenses, count + 1)
+
+    if not totals:
+        return
+
+    # Day comes from the database clock, the same one that stamps Transaction.created_at
+    db.execute(_upsert_statement(db), [
+        {"account_id": account_id, "shard": shards.get(account_id, 0), "total_income": income, "total_expenses": expenses, "transaction_count": count}
+        for account_id, (income, expenses, count) in totals.items()
+    ])
+
+def rebuild_daily_stats(db: Session):
+    """Recompute daily_account_stats from the transactions table in one set-based pass"""
+    day = func.date(Transaction.created_at)
+    rows = select(
+        Transaction.account_id,
+        day,
+        func.sum(case((Transaction.transaction_type == TransactionType.CREDIT, Transaction.amount), else_=0)),
+        func.sum(case((Transaction.transaction_type == TransactionType.DEBIT, Transaction.amount), else_=0)),
+        func.count(Transaction.id)
+    ).group_by(Transaction.account_id, day)
+    stats = db.query(DailyAccountStats)
+
+    # Days of archived months keep the rollup they had; their transactions are no longer here to recount
+    since = archived_until(db)
+    if since:
+        rows = rows.where(Transaction.created_at >= since)
+        stats = stats.filter(DailyAccountStats.day >= since.date())
+
+    stats.delete(synchronize_session=False)
+    db.execute(
+        insert(DailyAccountStats).from_select(
+            ["account_id", "day", "total_income", "total_expenses", "transaction_count"],
+            rows
+        )
+    )
+    db.commit()
+
+def _enriched_transactions_query(db: Session):
+    """Transactions joined with their counterparty's account number and user name (for streamed statements)"""
+    # Self-join through the related leg of a transfer to reach the other account/user,
+    # so counterparty info comes back with the rows instead of 3 lookups per row
+    related_txn = aliased(Transaction)
+    counterparty_account = aliased(Account)
+    counterparty_user = aliased(User)
+
+    return (
+        db.query(
+            Transaction,
+            counterparty_user.name.label("counterparty_name"),
+            counterparty_account.account_number.label("counterparty_account")
+        )
+        .outerjoin(related_txn, related_txn.id == Transaction.related_transaction_id)
+        .outerjoin(counterparty_account, counterparty_account.id == related_txn.account_id)
+        .outerjoin(counterparty_user, counterparty_user.id == counterparty_account.user_id)
+    )
+
+def _history_query(db: Session):
+    """Transactions with the account on the other side of a transfer; its number and owner come from the account cache"""
+    related_txn = aliased(Transaction)
+    return (
+        db.query(Transaction, related_txn.account_id.label("counterparty_account_id"))
+        .outerjoin(related_txn, related_txn.id == Transaction.related_transaction_id)
+    )
+
+def _enriched_transaction_dict(txn: Transaction, counterparty: AccountMetadata | None) -> dict:
+    return {
+        "id": txn.id,
+        "account_id": txn.account_id,
+        "transaction_type": txn.transaction_type,
+        "amount": txn.amount,
+        "balance_after": txn.balance_after,
+        "related_trasaction_id": txn.related_transaction_id,
+        "description": txn.description,
+        "created_at": txn.created_at,
+        "counterparty_name": counterparty.owner_name if counterparty else None,
+        "counterparty_account": counterparty.account_number if counterparty else None
+    }
+
+def signed_amount():
+    """A transaction's effect on its account's balance: credits add, debits subtract"""
+    return case((Transaction.transaction_type == TransactionType.CREDIT, Transaction.amount), else_=-Transaction.amount)
 
+def _signed(transaction_type, amount) -> d:
+    return amount if transaction_type == TransactionType.CREDIT else -amount
+
+def _balance_after_transaction(db: Session, account_id: int, transaction_id: int) -> d:
+    # Current balance minus everything posted after the transaction, in one statement (one snapshot)
+    anchor = aliased(Transaction)
+    anchor_key = tuple_(select(anchor.created_at).where(anchor.id == transaction_id).scalar_subquery(), transaction_id)
+    newer = select(func.coalesce(func.sum(signed_amount()), 0)).where(
+        Transaction.account_id == account_id,
+        tuple_(Transaction.created_at, Transaction.id) > anchor_key
+    ).scalar_subquery()
+    return d(db.query(Account.balance + shard_balance_expression() - newer).filter(Account.id == account_id).scalar()).quantize(CENTS)
 
-def get_account_transactions(db: Session, account_id: int, limit: int = 10, offset: int = 0) -> dict:
-    account = db.query(Account).filter(Account.id == account_id).first()
+def _fill_page_balances(db: Session, account_id: int, transactions: list[dict]):
+    """Derive the balance_after of hot-account credits on a newest-first page from the row above them"""
+    newer = None
+    for txn in transactions:
+        if txn["balance_after"] is None:
+            if newer is None:
+                txn["balance_after"] = _balance_after_transaction(db, account_id, txn["id"])
+            else:
+                txn["balance_after"] = newer["balance_after"] - _signed(newer["transaction_type"], newer["amount"])
+        newer = txn
+
+def encode_history_cursor(transaction_id: int) -> str:
+    """Opaque keyset cursor pointing at the last transaction of a history page"""
+    return base64.urlsafe_b64encode(f"txn:{transaction_id}".encode()).decode()
+
+def decode_history_cursor(cursor: str) -> int:
+    try:
+        prefix, transaction_id = base64.urlsafe_b64decode(cursor.encode()).decode().split(":")
+        if prefix != "txn":
+            raise ValueError
+        return int(transaction_id)
+    except Exception:
+        raise ValueError("Invalid history cursor")
+
+def get_account_transactions(db: Session, account_id: int, limit: int = 10, offset: int = 0, after: int | None = None, include_total: bool = True) -> dict:
+    account = get_account_by_id(db, account_id)
 
     if not account:
         raise ValueError(f"Account with account id: {account_id} not found!!")
     
-    total_count = db.query(Transaction).filter(Transaction.account_id == account_id).count()
-
-    transactions = db.query(Transaction).filter(Transaction.account_id == account_id).order_by(Transaction.created_at.desc()).limit(limit).offset(offset).all()
+    # Counting every row of a busy account is the expensive part of a page, so callers can skip it
+    total_count = None
+    if include_total:
+        total_count = db.query(Transaction).filter(Transaction.account_id == account_id).count()
+
+    query = (
+        _history_query(db)
+        .filter(Transaction.account_id == account_id)
+        .order_by(Transaction.created_at.desc(), Transaction.id.desc())
+    )
 
-    # Enrich transactions with counterparty information
-    enriched_transactions = []
-    for txn in transactions:
-        txn_dict = {
-            "id": txn.id,
-            "account_id": txn.account_id,
-            "transaction_type": txn.transaction_type,
-            "amount": txn.amount,
-            "balance_after": txn.balance_after,
-            "related_trasaction_id": txn.related_transaction_id,
-            "description": txn.description,
-            "created_at": txn.created_at,
-            "counterparty_name": None,
-            "counterparty_account": None
-        }
-        
-        # If this is a transfer (has related_transaction_id), find the counterparty
-        if txn.related_transaction_id:
-            related_txn = db.query(Transaction).filter(Transaction.id == txn.related_transaction_id).first()
-            if related_txn:
-                # Get the counterparty account
-                counterparty_account = db.query(Account).filter(Account.id == related_txn.account_id).first()
-                if counterparty_account:
-                    # Get the counterparty user
-                    counterparty_user = db.query(User).filter(User.id == counterparty_account.user_id).first()
-                    if counterparty_user:
-                        txn_dict["counterparty_name"] = counterparty_user.name
-                        txn_dict["counterparty_account"] = counterparty_account.account_number
-        
-        enriched_transactions.append(txn_dict)
+    if after is not None:
+        # Keyset pagination: seek past the cursor row on (account_id, created_at, id) instead of skipping rows.
+        # The anchor's created_at is read back by primary key so the comparison uses the stored value as-is
+        anchor = aliased(Transaction)
+        anchor_created_at = select(anchor.created_at).where(anchor.id == after).scalar_subquery()
+        query = query.filter(tuple_(Transaction.created_at, Transaction.id) < tuple_(anchor_created_at, after))
+    else:
+        query = query.offset(offset)
+
+    # Fetch one extra row to know whether there is a next page
+    rows = query.limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    # Counterparties of the whole page in one cache lookup - no per-row queries, none at all when warm
+    counterparties = account_metadata_many(db, [counterparty_id for _, counterparty_id in rows if counterparty_id is not None])
+    enriched_transactions = [
+        _enriched_transaction_dict(txn, counterparties.get(counterparty_id))
+        for txn, counterparty_id in rows
+    ]
+    _fill_page_balances(db, account_id, enriched_transactions)
+
+    next_cursor = None
+    if has_more:
+        next_cursor = encode_history_cursor(rows[-1][0].id)
 
     return {
         "account_id": account.id,
         "account_number": account.account_number,
-        "current_balance": account.balance,
+        "current_balance": account.total_balance,
         "transactions": enriched_transactions,
-        "total_transactions": total_count
+        "total_transactions": total_count,
+        "next_cursor": next_cursor
     }
 
+STATEMENT_COLUMNS = [
+    "id", "created_at", "transaction_type", "amount", "balance_after",
+    "description", "related_transaction_id", "counterparty_name", "counterparty_account"
+]
+
+def iter_statement_rows(db: Session, account_id: int, start: datetime | None = None, end: datetime | None = None, batch_size: int = 1000):
+    """Yield an account's enriched transactions oldest first, with every balance_after filled in"""
+    # Hot-account credits are stored without balance_after: carry the running balance forward
+    # from the row before them (from zero for a statement of the whole history)
+    running = d("0.00") if start is None else None
+
+    def opening() -> d:
+        # Balance before the statement period
+        return _balance_at(db, account_id, start - timedelta(microseconds=1))
+
+    def filled(row: dict) -> dict:
+        nonlocal running
+        if row["balance_after"] is None:
+            running = (opening() if running is None else running) + _signed(row["transaction_type"], row["amount"])
+            row["balance_after"] = running
+        else:
+            running = row["balance_after"]
+        return row
+
+    # Archived months all predate the rows still in the database
+    for row in iter_archived_statement_rows(db, account_id, start, end):
+        yield filled(row)
+
+    if running is None:
+        # No queries while the database rows stream (MySQL), so the opening balance is read now
+        running = opening()
+
+    query = _enriched_transactions_query(db).filter(Transaction.account_id == account_id)
+    if start:
+        query = query.filter(Transaction.created_at >= start)
+    if end:
+        query = query.filter(Transaction.created_at < end)
+
+    # yield_per streams batch_size rows at a time instead of buffering the whole result set
+    # (Counterparty details stay in the join here: MySQL can't run cache-miss queries while the stream is open)
+    query = query.order_by(Transaction.created_at, Transaction.id).yield_per(batch_size)
+
+    for txn, counterparty_name, counterparty_account in query:
+        yield filled({
+            "id": txn.id,
+            "created_at": txn.created_at,
+            "transaction_type": txn.transaction_type.value,
+            "amount": txn.amount,
+            "balance_after": txn.balance_after,
+            "description": txn.description,
+            "related_transaction_id": txn.related_transaction_id,
+            "counterparty_name": counterparty_name,
+            "counterparty_account": counterparty_account
+        })
+        # Identity map would otherwise keep every streamed row alive
+        db.expunge(txn)
+
+def _statement_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, d):
+        return str(value)
+    return value
+
+def render_statement(rows, fmt: str = "csv", rows_per_chunk: int = 500):
+    """Turn statement rows into CSV or NDJSON text chunks"""
+    buffer = io.StringIO()
+    writer = None
+    if fmt == "csv":
+        writer = csv.writer(buffer)
+        writer.writerow(STATEMENT_COLUMNS)
+
+    pending = 0
+    for row in rows:
+        if writer:
+            writer.writerow(["" if row[col] is None else _statement_value(row[col]) for col in STATEMENT_COLUMNS])
+        else:
+            buffer.write(json.dumps({col: _statement_value(row[col]) for col in STATEMENT_COLUMNS}))
+            buffer.write("\n")
+
+        pending += 1
+        if pending >= rows_per_chunk:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+
+    if buffer.tell():
+        yield buffer.getvalue()
+
+def stream_account_statement(account_id: int, fmt: str = "csv", start: datetime | None = None, end: datetime | None = None, use_replica: bool = False):
+    # Owns its session: the export outlives the request handler that starts it
+    db = (ReadSessionLocal if use_replica else SessionLocal)()
+    try:
+        yield from render_statement(iter_statement_rows(db, account_id, start, end), fmt)
+    finally:
+        db.close()
+
+def _link_transfer_legs(db: Session, legs: list):
+    """Point each (debit, credit) pair at each other with a single UPDATE ... CASE statement"""
+    if not legs:
+        return
+
+    related = {}
+    for from_txn, to_txn in legs:
+        related[from_txn.id] = to_txn.id
+        related[to_txn.id] = from_txn.id
+
+    db.execute(
+        update(Transaction)
+        .where(Transaction.id.in_(related))
+        .values(related_transaction_id=case(related, value=Transaction.id))
+        .execution_options(synchronize_session=False)
+    )
+
+    # Record the new value on the objects as already persisted, so the ORM doesn't UPDATE again
+    for from_txn, to_txn in legs:
+        set_committed_value(from_txn, "related_transaction_id", to_txn.id)
+        set_committed_value(to_txn, "related_transaction_id", from_txn.id)
+
 def deposit_funds(db: Session, account_id: int, amount: d, description: str = None) -> TransactionSuccessResponse:
 
+    amount = d(amount).quantize(CENTS)
     if amount <= 0:
         raise ValueError("Deposit amount must be positive")
     
     try:
-        account = db.query(Account).filter(Account.id == account_id).with_for_update().first()
+        # Locks the account row, or a single balance shard for hot accounts
+        locked = lock_balances(db, debit_ids=set(), credit_ids={account_id}, operation="deposit").get(account_id)
         
-        if not account:
+        if not locked:
             raise ValueError(f"Account with id {account_id} not found")
         
-        old_balance = account.balance
-        new_balance = old_balance + amount
-        
-        account.balance = new_balance
+        locked.credit(amount)
+        new_balance = current_balance(db, locked)
         
         transaction = Transaction(
             account_id=account_id,
             transaction_type=TransactionType.CREDIT,
             amount=amount,
-            balance_after=new_balance,
+            balance_after=running_balance(locked),
             description=description or "Deposit"
         )
         
+        # id and created_at come back on the INSERT itself (RETURNING), no refresh needed
         db.add(transaction)
         db.flush()
-        db.refresh(transaction)
         
         # Validate response BEFORE committing
         try:
@@ -136,6 +499,8 @@ def deposit_funds(db: Session, account_id: int, amount: d, description: str = No
                 f"Response validation failed - this is a code bug: {validation_error}"
             )
         
+        record_daily_stats(db, [transaction], shards={account_id: locked.credit_shard})
+
         # Only commit if response is valid
         db.commit()
         
@@ -150,23 +515,25 @@ def deposit_funds(db: Session, account_id: int, amount: d, description: str = No
 
 def withdraw_funds(db: Session, account_id: int, amount: d, description: str = None) -> TransactionSuccessResponse:
 
+    amount = d(amount).quantize(CENTS)
     if amount <= 0:
         raise ValueError("Withdrawal amount must be positive!")
     
     try:
-        account = db.query(Account).filter(Account.id == account_id).with_for_update().first()
+        locked = lock_balances(db, debit_ids={account_id}, credit_ids=set(), operation="withdraw").get(account_id)
 
-        if not account:
+        if not locked:
             raise ValueError(f"Account with account_id {account_id} not found")
         
-        old_balance = account.balance
+        old_balance = locked.available()
         
         if old_balance < amount:
+            insufficient_funds.inc(operation="withdraw")
             raise ValueError(f"Insuficient funds! Current balance: {old_balance}")
         
         new_balance = old_balance - amount
 
-        account.balance = new_balance
+        locked.debit(amount)
 
         transaction = Transaction(
             account_id=account_id,
@@ -176,9 +543,9 @@ def withdraw_funds(db: Session, account_id: int, amount: d, description: str = N
             description=description or "Withdrawal"
         )
 
+        # id and created_at come back on the INSERT itself (RETURNING), no refresh needed
         db.add(transaction)
         db.flush()
-        db.refresh(transaction)
 
         try:
             response = TransactionSuccessResponse(
@@ -190,6 +557,8 @@ def withdraw_funds(db: Session, account_id: int, amount: d, description: str = N
             db.rollback()
             print(f"Error: {error}")
 
+        record_daily_stats(db, [transaction])
+
         db.commit()
 
         return response
@@ -203,48 +572,42 @@ def withdraw_funds(db: Session, account_id: int, amount: d, description: str = N
 
 def transfer_funds(db: Session, from_account_id: int, to_account_id: int, amount: d, description: str = None) -> TransferSuccessResponse:
     try:
+        amount = d(amount).quantize(CENTS)
         if amount <= 0:
             raise ValueError("Amount has to be greater than zero")
         if from_account_id == to_account_id:
             raise ValueError("Cannot transfer to same account!")
         
-        #Row-level locking with deadlock prevention:
-        if from_account_id < to_account_id:
-            first_id, second_id = from_account_id, to_account_id
-        else:
-            first_id, second_id = to_account_id, from_account_id
-
-        first_account = db.query(Account).filter(Account.id == first_id).with_for_update().first()
-        second_account = db.query(Account).filter(Account.id == second_id).with_for_update().first()
+        #Row-level locking with deadlock prevention: account rows in ascending id order, then shards
+        balances = lock_balances(db, debit_ids={from_account_id}, credit_ids={to_account_id}, operation="transfer")
+        from_locked = balances.get(from_account_id)
+        to_locked = balances.get(to_account_id)
 
-        if from_account_id < to_account_id:
-            from_account, to_account = first_account, second_account
-        else:
-            from_account, to_account = second_account, first_account
-
-        if not from_account:
+        if not from_locked:
             raise ValueError(f"Source account with ID: {from_account_id} not found")
         
-        if not to_account:
+        if not to_locked:
             raise ValueError(f"Destination account with ID: {to_account_id} not found")
         
-        if from_account.balance < amount:
+        if from_locked.available() < amount:
+            insufficient_funds.inc(operation="transfer")
             raise ValueError("Insufficeient funds")
         
-        from_old_balance = from_account.balance
-        from_new_balance = from_old_balance - amount
-        from_account.balance = from_new_balance
+        from_locked.debit(amount)
+        from_new_balance = from_locked.available()
+
+        to_locked.credit(amount)
+        to_new_balance = current_balance(db, to_locked)
 
-        to_old_balance = to_account.balance
-        to_new_balance = to_old_balance + amount
-        to_account.balance = to_new_balance
+        from_account = from_locked.account
+        to_account_number = _account_number(db, to_locked)
 
         from_transaction = Transaction(
             account_id=from_account_id,
             transaction_type=TransactionType.DEBIT,
             amount=amount,
             balance_after=from_new_balance,
-            description=description or f"Transfer to account {to_account.account_number}"
+            description=description or f"Transfer to account {to_account_number}"
         )
 
         db.add(from_transaction)
@@ -253,21 +616,16 @@ def transfer_funds(db: Session, from_account_id: int, to_account_id: int, amount
             account_id=to_account_id,
             transaction_type=TransactionType.CREDIT,
             amount=amount,
-            balance_after=to_new_balance,
+            balance_after=running_balance(to_locked),
             description=description or f"Transfer from account {from_account.account_number}"
         )
 
         db.add(to_transaction)
 
+        # Both legs go out in one multi-row INSERT ... RETURNING, then get cross-linked in one UPDATE
         db.flush()
 
-        from_transaction.related_transaction_id = to_transaction.id
-        to_transaction.related_transaction_id = from_transaction.id
-
-        db.flush()
-
-        db.refresh(from_transaction)
-        db.refresh(to_transaction)
+        _link_transfer_legs(db, [(from_transaction, to_transaction)])
 
         try:
             response = TransferSuccessResponse(
@@ -289,6 +647,8 @@ def transfer_funds(db: Session, from_account_id: int, to_account_id: int, amount
                 f"Response validation failed: {validation_error}"
             )
 
+        record_daily_stats(db, [from_transaction, to_transaction], shards={to_account_id: to_locked.credit_shard})
+
     # Only commit if validation succeeded
         db.commit()
 
@@ -304,8 +664,8 @@ def transfer_funds(db: Session, from_account_id: int, to_account_id: int, amount
 def transfer_by_account_number(db: Session, from_account_id: int, to_account_number: str, amount: d, description: str = None) -> TransferSuccessResponse:
     """Transfer funds using recipient's account number"""
     try:
-        # Find recipient account by account number
-        to_account = get_account_by_account_number(db, to_account_number)
+        # Find recipient account by account number (cached, so no round trip for known recipients)
+        to_account = account_metadata_by_number(db, to_account_number)
         
         if not to_account:
             raise ValueError(f"Account with account number {to_account_number} not found")
@@ -320,35 +680,304 @@ def transfer_by_account_number(db: Session, from_account_id: int, to_account_num
         db.rollback()
         raise
 
+def _account_number(db: Session, locked: LockedBalance) -> str:
+    # Hot-account credits don't lock the accounts row, so take the number from the account cache
+    return locked.account.account_number if locked.account else account_metadata(db, locked.account_id).account_number
+
+def _batch_account(balances: dict, account_id: int) -> LockedBalance:
+    locked = balances.get(account_id)
+    if not locked:
+        raise ValueError(f"Account with id {account_id} not found")
+    return locked
+
+def _post_batch_chunk(db: Session, operations: list[BatchOperation], first_index: int) -> list[dict]:
+    # Lock every account the chunk touches once, in ascending id order (same deadlock rule as transfer_funds)
+    debit_ids = set()
+    credit_ids = set()
+    for op in operations:
+        if op.operation == BatchOperationType.DEPOSIT:
+            credit_ids.add(op.account_id)
+        elif op.operation == BatchOperationType.WITHDRAW:
+            debit_ids.add(op.account_id)
+        else:
+            debit_ids.add(op.from_account_id)
+            credit_ids.add(op.to_account_id)
+
+    balances = lock_balances(db, debit_ids, credit_ids, operation="batch")
+
+    results = []
+    new_transactions = []
+    transfer_legs = []
+
+    # Apply in request order against the locked balances; a rejected item doesn't stop the rest
+    for position, op in enumerate(operations):
+        result = {"index": first_index + position, "status": "ok", "error": None, "transaction_ids": []}
+        try:
+            # Same rounding as the single postings: balances, rollup and stored rows all see the cent amount
+            amount = d(op.amount).quantize(CENTS)
+            if amount <= 0:
+                raise ValueError("Amount has to be greater than zero")
+
+            if op.operation == BatchOperationType.DEPOSIT:
+                locked = _batch_account(balances, op.account_id)
+                locked.credit(amount)
+                txns = [Transaction(
+                    account_id=locked.account_id,
+                    transaction_type=TransactionType.CREDIT,
+                    amount=amount,
+                    balance_after=running_balance(locked),
+                    description=op.description or "Deposit"
+                )]
+
+            elif op.operation == BatchOperationType.WITHDRAW:
+                locked = _batch_account(balances, op.account_id)
+                locked.debit(amount)
+                txns = [Transaction(
+                    account_id=locked.account_id,
+                    transaction_type=TransactionType.DEBIT,
+                    amount=amount,
+                    balance_after=locked.available(),
+                    description=op.description or "Withdrawal"
+                )]
+
+            else:
+                if op.from_account_id == op.to_account_id:
+                    raise ValueError("Cannot transfer to same account!")
+                from_locked = _batch_account(balances, op.from_account_id)
+                to_locked = _batch_account(balances, op.to_account_id)
+                if from_locked.available() < amount:
+                    # Counted under the same label as the batch's withdrawals (LockedBalance.debit)
+                    insufficient_funds.inc(operation=from_locked.operation)
+                    raise ValueError("Insufficeient funds")
+                from_locked.debit(amount)
+                to_locked.credit(amount)
+                txns = [
+                    Transaction(
+                        account_id=from_locked.account_id,
+                        transaction_type=TransactionType.DEBIT,
+                        amount=amount,
+                        balance_after=from_locked.available(),
+                        description=op.description or f"Transfer to account {_account_number(db, to_locked)}"
+                    ),
+                    Transaction(
+                        account_id=to_locked.account_id,
+                        transaction_type=TransactionType.CREDIT,
+                        amount=amount,
+                        balance_after=running_balance(to_locked),
+                        description=op.description or f"Transfer from account {from_locked.account.account_number}"
+                    )
+                ]
+                transfer_legs.append(txns)
+
+        except ValueError as e:
+            result["status"] = "failed"
+            result["error"] = str(e)
+            txns = []
+
+        new_transactions.extend(txns)
+        results.append((result, txns))
+
+    # One multi-row INSERT for the whole chunk, then link the transfer legs to each other
+    db.add_all(new_transactions)
+    db.flush()
+
+    _link_transfer_legs(db, transfer_legs)
+
+    for result, txns in results:
+        result["transaction_ids"] = [txn.id for txn in txns]
+
+    record_daily_stats(db, new_transactions, shards={i: locked.credit_shard for i, locked in balances.items()})
+
+    return [result for result, _ in results]
+
+def post_transaction_batch(db: Session, operations: list[BatchOperation], chunk_size: int = 1000) -> dict:
+    """Apply many deposits/withdrawals/transfers, committing every chunk_size operations"""
+    results = []
+
+    for start in range(0, len(operations), chunk_size):
+        chunk = operations[start:start + chunk_size]
+        try:
+            chunk_results = _post_batch_chunk(db, chunk, start)
+            db.commit()
+            results.extend(chunk_results)
+        except Exception as e:
+            # Only this chunk is lost; earlier chunks are already committed (or, under an
+            # Idempotency-Key, released savepoints that commit with the claim)
+            db.rollback()
+            results.extend(
+                {"index": start + position, "status": "failed", "error": f"Chunk failed: {str(e)}", "transaction_ids": []}
+                for position in range(len(chunk))
+            )
+
+    succeeded = sum(1 for result in results if result["status"] == "ok")
+
+    return {
+        "message": "Batch processed",
+        "succeeded": succeeded,
+        "failed": len(results) - succeeded,
+        "results": results
+    }
+
+def _aggregate_transactions(db: Session, account_id: int, start: datetime, end: datetime | None = None) -> tuple[d, d, int]:
+    # One GROUP BY transaction_type pass in SQL instead of loading the rows
+    query = db.query(
+        Transaction.transaction_type,
+        func.sum(Transaction.amount),
+        func.count(Transaction.id)
+    ).filter(
+        Transaction.account_id == account_id,
+        Transaction.created_at >= start
+    )
+    if end:
+        query = query.filter(Transaction.created_at < end)
+
+    totals = {txn_type: (amount, count) for txn_type, amount, count in query.group_by(Transaction.transaction_type)}
+    income, credit_count = totals.get(TransactionType.CREDIT, (d("0.00"), 0))
+    expenses, debit_count = totals.get(TransactionType.DEBIT, (d("0.00"), 0))
+
+    return d(income), d(expenses), credit_count + debit_count
+
 def get_dashboard_stats(db: Session, account_id: int, days: int = 30) -> dict:
     """Get dashboard statistics for the last N days"""
-    account = get_account_by_id(db, account_id)
+    account = account_metadata(db, account_id)
     
     if not account:
         raise ValueError(f"Account with id {account_id} not found")
     
     # Calculate date threshold
-    from datetime import datetime, timedelta
     threshold_date = datetime.now() - timedelta(days=days)
-    
-    # Get all transactions in the period
-    transactions = db.query(Transaction).filter(
-        Transaction.account_id == account_id,
-        Transaction.created_at >= threshold_date
-    ).all()
-    
-    total_income = sum(
-        t.amount for t in transactions 
-        if t.transaction_type == TransactionType.CREDIT
-    )
-    
-    total_expenses = sum(
-        t.amount for t in transactions 
-        if t.transaction_type == TransactionType.DEBIT
-    )
+
+    if not settings.USE_DAILY_STATS_ROLLUP:
+        total_income, total_expenses, total_transactions = _aggregate_transactions(db, account_id, threshold_date)
+    else:
+        # The first day of the window is partial - aggregate it from transactions,
+        # and take every following whole day from the rollup (at most `days` rows)
+        first_full_day = threshold_date.date() + timedelta(days=1)
+        total_income, total_expenses, total_transactions = _aggregate_transactions(
+            db, account_id, threshold_date, datetime.combine(first_full_day, datetime.min.time())
+        )
+
+        rollup_income, rollup_expenses, rollup_count = db.query(
+            func.sum(DailyAccountStats.total_income),
+            func.sum(DailyAccountStats.total_expenses),
+            func.sum(DailyAccountStats.transaction_count)
+        ).filter(
+            DailyAccountStats.account_id == account_id,
+            DailyAccountStats.day >= first_full_day
+        ).one()
+
+        total_income += d(rollup_income or 0)
+        total_expenses += d(rollup_expenses or 0)
+        total_transactions += int(rollup_count or 0)
     
     return {
         "total_income": total_income,
         "total_expenses": total_expenses,
-        "total_transactions": len(transactions)
+        "total_transactions": total_transactions
     }
+
+def balance_at(db: Session, account_id: int, at: datetime) -> dict:
+    """Balance of an account at a past instant (counting transactions created up to and including `at`)"""
+    account = account_metadata(db, account_id)
+
+    if not account:
+        raise ValueError(f"Account with id {account_id} not found")
+
+    return {
+        "account_id": account.id,
+        "account_number": account.account_number,
+        "at": at,
+        "balance": _balance_at(db, account_id, at)
+    }
+
+def _balance_at(db: Session, account_id: int, at: datetime) -> d:
+    # Latest month-end checkpoint at or before `at` (primary key seek)
+    snapshot = db.query(AccountBalanceSnapshot).filter(
+        AccountBalanceSnapshot.account_id == account_id,
+        AccountBalanceSnapshot.as_of <= at
+    ).order_by(AccountBalanceSnapshot.as_of.desc()).first()
+    since = snapshot.as_of if snapshot else None
+    # Opening balances are recorded as transactions, so no checkpoint means zero
+    balance = snapshot.balance if snapshot else d("0.00")
+
+    # Then the running balance of the latest transaction since it - one seek on (account_id, created_at, id)
+    latest = db.query(Transaction.balance_after).filter(
+        Transaction.account_id == account_id,
+        Transaction.created_at <= at
+    )
+    if since:
+        latest = latest.filter(Transaction.created_at >= since)
+    latest = latest.order_by(Transaction.created_at.desc(), Transaction.id.desc()).first()
+
+    if latest and latest.balance_after is not None:
+        return latest.balance_after
+
+    # Without a checkpoint past the archived months, part of the period is in the archive
+    archived = archived_until(db)
+    if archived and (not snapshot or snapshot.as_of < archived):
+        balance = archived_balance(db, account_id, since, at, balance)
+
+    if latest:
+        # A hot-account credit has no running balance: add up the signed amounts since the checkpoint
+        change = db.query(func.coalesce(func.sum(signed_amount()), 0)).filter(
+            Transaction.account_id == account_id,
+            Transaction.created_at <= at
+        )
+        if since:
+            change = change.filter(Transaction.created_at >= since)
+        balance += d(change.scalar())
+
+    return d(balance).quantize(CENTS)
+
+def snapshot_balances(db: Session, as_of: datetime) -> int:
+    """
+    Checkpoint every account's balance as of `as_of` (normally the first instant of a month)
+    in one set-based INSERT ... SELECT. Only transactions since the previous checkpoint are
+    read; accounts without any carry the previous balance forward, and accounts whose latest
+    one is a hot-account credit (no balance_after) add the signed amounts since it. Re-running
+    replaces the checkpoint. Returns the number of accounts snapshotted.
+    """
+    previous_as_of = db.query(func.max(AccountBalanceSnapshot.as_of)).filter(AccountBalanceSnapshot.as_of < as_of).scalar()
+
+    archived = archived_until(db)
+    if archived and (previous_as_of is None or previous_as_of < archived):
+        raise ValueError(f"Transactions before {archived:%Y-%m-%d} are archived; checkpoints from then can't be recomputed")
+
+    ranked = select(
+        Transaction.account_id,
+        Transaction.id,
+        Transaction.balance_after,
+        func.sum(signed_amount()).over(partition_by=Transaction.account_id).label("change"),
+        func.row_number().over(
+            partition_by=Transaction.account_id,
+            order_by=(Transaction.created_at.desc(), Transaction.id.desc())
+        ).label("position")
+    ).where(Transaction.created_at < as_of)
+    if previous_as_of:
+        ranked = ranked.where(Transaction.created_at >= previous_as_of)
+    ranked = ranked.subquery()
+
+    latest = select(ranked.c.account_id, ranked.c.id, ranked.c.balance_after, ranked.c.change).where(ranked.c.position == 1).subquery()
+    previous = aliased(AccountBalanceSnapshot)
+
+    rows = select(
+        Account.id,
+        literal(as_of, TIMESTAMP),
+        func.coalesce(latest.c.balance_after, func.coalesce(previous.balance, 0) + func.coalesce(latest.c.change, 0)),
+        func.coalesce(latest.c.id, previous.last_transaction_id)
+    ).outerjoin(
+        latest, latest.c.account_id == Account.id
+    ).outerjoin(
+        previous, and_(previous.account_id == Account.id, previous.as_of == previous_as_of)
+    ).where(
+        # Imported accounts can be newer than the history loaded into them
+        or_(Account.created_at < as_of, latest.c.id.is_not(None), previous.account_id.is_not(None))
+    )
+
+    db.query(AccountBalanceSnapshot).filter(AccountBalanceSnapshot.as_of == as_of).delete(synchronize_session=False)
+    result = db.execute(
+        insert(AccountBalanceSnapshot).from_select(["account_id", "as_of", "balance", "last_transaction_id"], rows)
+    )
+    db.commit()
+
+    return result.rowcount
@@ -0,0 +1,100 @@
+from sqlalchemy.orm import Session
+from app.models import Account, User
+from app.utils.cache import TTLCache
+from app.utils.metrics import Counter, Gauge, register_collector
+from app.config import get_settings
+
+# Immutable account metadata (id <-> account number <-> owner) cached per process, so recipient
+# resolution, existence checks and counterparty names cost no round trip on warm keys. Balances
+# are never cached here. Only found accounts are cached, so a new account is visible at once;
+# creating an account still drops any entry for its id/number (ids are reused after a reset).
+
+settings = get_settings()
+
+_by_id = TTLCache(maxsize=settings.ACCOUNT_CACHE_SIZE, ttl=settings.ACCOUNT_CACHE_TTL_SECONDS)
+_id_by_number = TTLCache(maxsize=settings.ACCOUNT_CACHE_SIZE, ttl=settings.ACCOUNT_CACHE_TTL_SECONDS)
+
+account_cache_requests = Counter("account_cache_requests_total", "Account metadata lookups, by outcome (hit / miss)")
+account_cache_entries = Gauge("account_cache_entries", "Accounts currently in the metadata cache")
+
+
+@register_collector
+def sample_cache():
+    account_cache_entries.set(len(_by_id))
+
+
+class AccountMetadata:
+    __slots__ = ("id", "account_number", "user_id", "owner_name")
+
+    def __init__(self, account_id: int, account_number: str, user_id: int | None, owner_name: str | None):
+        self.id = account_id
+        self.account_number = account_number
+        self.user_id = user_id
+        self.owner_name = owner_name
+
+
+def _remember(meta: AccountMetadata) -> AccountMetadata:
+    _by_id.set(meta.id, meta)
+    _id_by_number.set(meta.account_number, meta.id)
+    return meta
+
+def _load(db: Session, *criteria) -> list[AccountMetadata]:
+    rows = (
+        db.query(Account.id, Account.account_number, Account.user_id, User.name)
+        .outerjoin(User, User.id == Account.user_id)
+        .filter(*criteria)
+        .all()
+    )
+    return [_remember(AccountMetadata(*row)) for row in rows]
+
+def account_metadata(db: Session, account_id: int) -> AccountMetadata | None:
+    meta = _by_id.get(account_id)
+    if meta:
+        account_cache_requests.inc(outcome="hit")
+        return meta
+
+    account_cache_requests.inc(outcome="miss")
+    found = _load(db, Account.id == account_id)
+    return found[0] if found else None
+
+def account_metadata_by_number(db: Session, account_number: str) -> AccountMetadata | None:
+    account_id = _id_by_number.get(account_number)
+    meta = _by_id.get(account_id) if account_id is not None else None
+    if meta:
+        account_cache_requests.inc(outcome="hit")
+        return meta
+
+    account_cache_requests.inc(outcome="miss")
+    found = _load(db, Account.account_number == account_number)
+    return found[0] if found else None
+
+def account_metadata_many(db: Session, account_ids) -> dict[int, AccountMetadata]:
+    """Metadata for several accounts; all the misses are loaded with one query"""
+    found = {}
+    missing = set()
+    for account_id in set(account_ids):
+        meta = _by_id.get(account_id)
+        if meta:
+            found[account_id] = meta
+        else:
+            missing.add(account_id)
+
+    if found:
+        account_cache_requests.inc(len(found), outcome="hit")
+    if missing:
+        account_cache_requests.inc(len(missing), outcome="miss")
+        found.update((meta.id, meta) for meta in _load(db, Account.id.in_(missing)))
+    return found
+
+def forget_account(account_id: int | None = None, account_number: str | None = None):
+    """Write-through invalidation for account creation / deletion"""
+    if account_id is not None:
+        meta = _by_id.pop(account_id)
+        if meta:
+            _id_by_number.pop(meta.account_number)
+    if account_number is not None:
+        _id_by_number.pop(account_number)
+
+def clear_account_cache():
+    _by_id.clear()
+    _id_by_number.clear()
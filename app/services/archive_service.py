@@ -0,0 +1,263 @@
+from sqlalchemy import select, text
+from sqlalchemy.orm import Session, aliased
+from sqlalchemy.sql import func
+from app.models import Transaction, TransactionType, TransactionArchive, AccountBalanceSnapshot
+from app.config import get_settings
+from app.services.account_cache_service import account_metadata_many
+from app.services.partition_service import month_start, add_months, is_partitioned, partition_months, ensure_partitions
+from datetime import date, datetime, timedelta, time as day_time
+from decimal import Decimal
+from itertools import groupby
+import os
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Only archiving and reading archived months need it: pip install pyarrow
+    pa = pq = None
+
+# Cold history archival: every month older than the horizon is written to a zstd-compressed
+# Parquet file and removed from the database (a DETACH + DROP of its partition on partitioned
+# PostgreSQL, a DELETE elsewhere), leaving hot queries only the recent months.
+#
+# Files are sorted by (account_id, created_at, id) and cut into row groups, so reading one
+# account's rows back skips every row group whose account_id range doesn't contain it.
+# Statements and balance-at read the archive; the daily stats rollup keeps its archived days,
+# and a balance checkpoint is taken at the horizon before the first month leaves, so later
+# checkpoints and balance-at never need the archived rows.
+
+settings = get_settings()
+
+ROW_GROUP_SIZE = 64 * 1024
+READ_BATCH_SIZE = 50000
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise RuntimeError("Archived transactions need pyarrow - pip install pyarrow")
+
+def _archive_schema():
+    return pa.schema([
+        ("id", pa.int64()),
+        ("account_id", pa.int64()),
+        ("transaction_type", pa.string()),
+        ("amount", pa.decimal128(15, 2)),
+        ("balance_after", pa.decimal128(15, 2)),
+        ("related_transaction_id", pa.int64()),
+        ("description", pa.string()),
+        ("created_at", pa.timestamp("us")),
+        ("counterparty_account_id", pa.int64())  # Account of the other transfer leg, resolved while both are in the database
+    ])
+
+def archive_path(file_name: str) -> str:
+    return os.path.join(settings.TRANSACTION_ARCHIVE_DIR, file_name)
+
+def _month_bounds(month: date) -> tuple[datetime, datetime]:
+    return datetime.combine(month, day_time()), datetime.combine(add_months(month, 1), day_time())
+
+def archive_cutoff(now: datetime | None = None, keep_months: int | None = None) -> datetime:
+    """First instant kept in the database: the start of the oldest of the keep_months most recent months"""
+    keep_months = settings.TRANSACTION_ARCHIVE_AFTER_MONTHS if keep_months is None else keep_months
+    if keep_months < 1:
+        raise ValueError("At least the current month stays in the database")
+    return datetime.combine(add_months(month_start(now or datetime.now()), 1 - keep_months), day_time())
+
+def archived_until(db: Session) -> datetime | None:
+    """End of the newest archived month; transactions created before it are read from the archive"""
+    month = db.query(func.max(TransactionArchive.month)).scalar()
+    return _month_bounds(month)[1] if month else None
+
+
+def _month_rows(month: date):
+    # The other leg is joined while it still exists, so archived rows keep their counterparty
+    start, end = _month_bounds(month)
+    related_txn = aliased(Transaction)
+    return select(
+        Transaction.id,
+        Transaction.account_id,
+        Transaction.transaction_type,
+        Transaction.amount,
+        Transaction.balance_after,
+        Transaction.related_transaction_id,
+        Transaction.description,
+        Transaction.created_at,
+        related_txn.account_id
+    ).outerjoin(
+        related_txn, related_txn.id == Transaction.related_transaction_id
+    ).where(
+        Transaction.created_at >= start,
+        Transaction.created_at < end
+    ).order_by(Transaction.account_id, Transaction.created_at, Transaction.id)
+
+def _write_archive(db: Session, month: date, path: str) -> tuple[int, int | None, int | None]:
+    """Stream the month into a Parquet file (written aside, synced, then renamed); returns (rows, min id, max id)"""
+    schema = _archive_schema()
+    count, first_id, last_id = 0, None, None
+    partial = path + ".partial"
+
+    with open(partial, "wb") as sink:
+        with pq.ParquetWriter(sink, schema, compression="zstd") as writer:
+            result = db.execute(_month_rows(month).execution_options(stream_results=True, max_row_buffer=READ_BATCH_SIZE))
+            for rows in result.partitions(READ_BATCH_SIZE):
+                columns = [list(column) for column in zip(*rows)]
+                columns[2] = [txn_type.value for txn_type in columns[2]]
+                writer.write_table(
+                    pa.Table.from_arrays([pa.array(column, type=field.type) for column, field in zip(columns, schema)], schema=schema),
+                    row_group_size=ROW_GROUP_SIZE
+                )
+                count += len(rows)
+                first_id = min(columns[0]) if first_id is None else min(first_id, *columns[0])
+                last_id = max(columns[0]) if last_id is None else max(last_id, *columns[0])
+        sink.flush()
+        os.fsync(sink.fileno())
+
+    os.replace(partial, path)
+    directory = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    try:
+        os.fsync(directory)
+    finally:
+        os.close(directory)
+
+    if pq.ParquetFile(path).metadata.num_rows != count:
+        raise RuntimeError(f"Archive {path} does not hold the {count} rows written to it")
+    return count, first_id, last_id
+
+def _remove_month(db: Session, month: date, partition: str | None, count: int):
+    if partition:
+        db.execute(text(f"ALTER TABLE transactions DETACH PARTITION {partition}"))
+        db.execute(text(f"DROP TABLE {partition}"))
+        return
+
+    start, end = _month_bounds(month)
+    deleted = db.query(Transaction).filter(Transaction.created_at >= start, Transaction.created_at < end).delete(synchronize_session=False)
+    if deleted != count:
+        # A back-dated row arrived while the file was written; keep everything and let the next run retry
+        raise RuntimeError(f"{month:%Y-%m} changed while it was archived ({count} rows written, {deleted} to delete)")
+
+def _archive_month(db: Session, month: date, partition: str | None) -> int:
+    if partition:
+        # Writers to this month wait until it is gone, so the file and the dropped table hold the same rows
+        db.execute(text(f"LOCK TABLE {partition} IN SHARE MODE"))
+
+    start, end = _month_bounds(month)
+    if not db.query(Transaction.id).filter(Transaction.created_at >= start, Transaction.created_at < end).first():
+        # Nothing to write; an empty partition just goes
+        if partition:
+            _remove_month(db, month, partition, 0)
+        db.commit()
+        return 0
+
+    part = db.query(func.count(TransactionArchive.id)).filter(TransactionArchive.month == month).scalar() + 1
+    file_name = f"transactions-{month:%Y-%m}.parquet" if part == 1 else f"transactions-{month:%Y-%m}.{part}.parquet"
+    path = archive_path(file_name)
+
+    try:
+        count, first_id, last_id = _write_archive(db, month, path)
+        db.add(TransactionArchive(month=month, file_name=file_name, row_count=count, first_transaction_id=first_id, last_transaction_id=last_id))
+        _remove_month(db, month, partition, count)
+        db.commit()
+    except Exception:
+        db.rollback()
+        if os.path.exists(path):
+            os.remove(path)
+        raise
+
+    return count
+
+def archive_transactions(db: Session, cutoff: datetime | None = None) -> dict[date, int]:
+    """
+    Move every month before cutoff (default: the TRANSACTION_ARCHIVE_AFTER_MONTHS horizon) out of
+    the database, oldest first, one month per DB transaction. Returns rows archived per month.
+    """
+    from app.services import snapshot_balances
+
+    _require_pyarrow()
+    cutoff = cutoff or archive_cutoff()
+    if cutoff != datetime.combine(month_start(cutoff), day_time()):
+        raise ValueError("Archiving cuts at the start of a month")
+    os.makedirs(settings.TRANSACTION_ARCHIVE_DIR, exist_ok=True)
+
+    partitioned = is_partitioned(db.connection())
+    if partitioned:
+        # Rows the default partition caught get their month's table first, so they leave with it
+        ensure_partitions(db.get_bind())
+        months = {month: name for month, name in partition_months(db.connection()).items() if month < cutoff.date()}
+    else:
+        months = {}
+        first = db.query(func.min(Transaction.created_at)).filter(Transaction.created_at < cutoff).scalar()
+        month = month_start(first) if first else cutoff.date()
+        while month < cutoff.date():
+            months[month] = None
+            month = add_months(month, 1)
+
+    if not months:
+        return {}
+
+    # Checkpoint balances at the cutoff while every row before it is still here
+    if not db.query(AccountBalanceSnapshot.account_id).filter(AccountBalanceSnapshot.as_of == cutoff).first():
+        snapshot_balances(db, cutoff)
+
+    return {month: _archive_month(db, month, months[month]) for month in sorted(months)}
+
+
+def _archives(db: Session, start: datetime | None, end: datetime | None) -> list[TransactionArchive]:
+    query = db.query(TransactionArchive)
+    if start:
+        query = query.filter(TransactionArchive.month >= month_start(start))
+    if end:
+        query = query.filter(TransactionArchive.month <= month_start(end - timedelta(microseconds=1)))
+    return query.order_by(TransactionArchive.month, TransactionArchive.id).all()
+
+def _read_month(parts: list[TransactionArchive], account_id: int, start: datetime | None, end: datetime | None):
+    filters = [("account_id", "=", account_id)]
+    if start:
+        filters.append(("created_at", ">=", start))
+    if end:
+        filters.append(("created_at", "<", end))
+
+    # Row-group statistics skip the rest of the file; parts of one month are merged back into time order
+    tables = [pq.read_table(archive_path(part.file_name), filters=filters) for part in parts]
+    return pa.concat_tables(tables).sort_by([("created_at", "ascending"), ("id", "ascending")]).to_pylist()
+
+def iter_archived_months(db: Session, account_id: int, start: datetime | None = None, end: datetime | None = None, newest_first: bool = False):
+    """Yield (month, rows) of an account's archived transactions in [start, end), rows in time order"""
+    archives = _archives(db, start, end)
+    if not archives:
+        return
+    _require_pyarrow()
+
+    months = [(month, list(parts)) for month, parts in groupby(archives, key=lambda archive: archive.month)]
+    for month, parts in (reversed(months) if newest_first else months):
+        rows = _read_month(parts, account_id, start, end)
+        if rows:
+            yield month, rows
+
+def iter_archived_statement_rows(db: Session, account_id: int, start: datetime | None = None, end: datetime | None = None):
+    """An account's archived transactions as statement rows, oldest first"""
+    for _, rows in iter_archived_months(db, account_id, start, end):
+        counterparties = account_metadata_many(db, [row["counterparty_account_id"] for row in rows if row["counterparty_account_id"] is not None])
+        for row in rows:
+            counterparty = counterparties.get(row["counterparty_account_id"])
+            yield {
+                "id": row["id"],
+                "created_at": row["created_at"],
+                "transaction_type": row["transaction_type"],
+                "amount": row["amount"],
+                "balance_after": row["balance_after"],
+                "description": row["description"],
+                "related_transaction_id": row["related_transaction_id"],
+                "counterparty_name": counterparty.owner_name if counterparty else None,
+                "counterparty_account": counterparty.account_number if counterparty else None
+            }
+
+def archived_balance(db: Session, account_id: int, since: datetime | None, at: datetime, opening: Decimal) -> Decimal:
+    """The account's balance after its archived transactions created in [since, at], given `opening` at `since`"""
+    # Newest first, up to the last row with a running balance; hot-account credits after it
+    # (stored without one) add their signed amounts. `at` is inclusive, the archive reader's end is not
+    trailing = Decimal("0.00")
+    for _, rows in iter_archived_months(db, account_id, since, at + timedelta(microseconds=1), newest_first=True):
+        for row in reversed(rows):
+            if row["balance_after"] is not None:
+                return row["balance_after"] + trailing
+            trailing += row["amount"] if row["transaction_type"] == TransactionType.CREDIT.value else -row["amount"]
+    return opening + trailing
@@ -1,51 +1,89 @@
 from sqlalchemy.orm import Session
+from app.database import DbSession, run_db
 from app.models import User, Account, Transaction, TransactionType
-from app.schemas import UserCreate, AuthResponse, UserResponse, AccountInfoResponse
-from app.utils import hash_password, verify_password, create_access_token
-from app.services import generate_account_number
+from app.schemas import UserCreate, AuthResponse, UserResponse, AccountInfoResponse, CurrentUser
+from app.utils import hash_password_async, verify_password_async, create_access_token, decode_access_token, PasswordHasherBusy
+from app.utils.cache import TTLCache
+from app.services import generate_account_number, record_daily_stats
+from app.services.balance_service import with_shard_balance
+from app.services.account_cache_service import forget_account
+from app.config import get_settings
 from decimal import Decimal
+import hashlib
+import time
 
-def resgister_user(db: Session, user_data: UserCreate) -> dict:
+settings = get_settings()
 
-    existing_user = db.query(User).filter(User.email == user_data.email).first()
+# Verified principals keyed by token hash, so each token is decoded and checked once per process
+_principal_cache = TTLCache(maxsize=settings.AUTH_CACHE_SIZE, ttl=settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60)
+
+def create_user_token(user: User, account: Account) -> str:
+    # Carry everything the principal needs so authenticated requests never have to load the user
+    return create_access_token(data={
+        "user_id": user.id,
+        "email": user.email,
+        "name": user.name,
+        "account_id": account.id,
+        "account_number": account.account_number
+    })
+
+def get_user_by_email(db: Session, email: str) -> User | None:
+    return db.query(User).filter(User.email == email).first()
+
+def get_account_by_user_id(db: Session, user_id: int) -> Account | None:
+    return db.query(Account).options(with_shard_balance()).filter(Account.user_id == user_id).first()
+
+def create_user_with_account(db: Session, user_data: UserCreate, hashed_pwd: str) -> tuple[User, Account]:
+    # Drawn before this transaction writes anything - a block refill uses its own connection
+    account_number = generate_account_number(db)
+
+    new_user = User(
+        name=user_data.name,
+        email=user_data.email,
+        hashed_password=hashed_pwd
+    )
+    db.add(new_user)
+    db.flush()
+
+    new_account = Account(
+        user_id=new_user.id,
+        account_number=account_number,
+        balance=user_data.initial_deposit
+    )
+    db.add(new_account)
+    db.flush()
+
+    if user_data.initial_deposit > 0:
+        initial_transaction = Transaction(
+            account_id=new_account.id,
+            transaction_type=TransactionType.CREDIT,
+            amount=user_data.initial_deposit,
+            balance_after=user_data.initial_deposit,
+            description="Initial deposit"
+        )
+        db.add(initial_transaction)
+        record_daily_stats(db, [initial_transaction])
+
+    db.commit()
+    forget_account(new_account.id, account_number)
+    db.refresh(new_user)
+    db.refresh(new_account)
+
+    return new_user, new_account
+
+async def resgister_user(db: DbSession, user_data: UserCreate) -> dict:
+
+    existing_user = await run_db(db, get_user_by_email, user_data.email)
 
     if existing_user:
         raise ValueError("Email already registered with system")
     
     try:
-        hashed_pwd = hash_password(user_data.password)
-        new_user = User(
-            name=user_data.name,
-            email=user_data.email,
-            hashed_password=hashed_pwd
-        )
-        db.add(new_user)
-        db.flush()
-
-        account_number = generate_account_number()
-        new_account = Account(
-            user_id=new_user.id,
-            account_number=account_number,
-            balance=user_data.initial_deposit
-        )
-        db.add(new_account)
-        db.flush()
-
-        if user_data.initial_deposit > 0:
-            initial_transaction = Transaction(
-                account_id=new_account.id,
-                transaction_type=TransactionType.CREDIT,
-                amount=user_data.initial_deposit,
-                balance_after=user_data.initial_deposit,
-                description="Initial deposit"
-            )
-            db.add(initial_transaction)
+        # bcrypt runs in the dedicated hashing pool, outside the DB session
+        hashed_pwd = await hash_password_async(user_data.password)
+        new_user, new_account = await run_db(db, create_user_with_account, user_data, hashed_pwd)
 
-        db.commit()
-        db.refresh(new_user)
-        db.refresh(new_account)
-
-        token = create_access_token(data={"user_id": new_user.id, "email": new_user.email})
+        token = create_user_token(new_user, new_account)
 
         return {
             "user":new_user,
@@ -53,29 +91,70 @@ def resgister_user(db: Session, user_data: UserCreate) -> dict:
             "token": token
         }
     
+    except PasswordHasherBusy:
+        raise
     except Exception as e:
-        db.rollback()
+        await run_db(db, Session.rollback)
         raise Exception(f"Registration failed: {str(e)}")
     
-def login_user(db: Session, email: str, password: str) -> dict:
+async def login_user(db: DbSession, email: str, password: str) -> dict:
 
-    user = db.query(User).filter(User.email == email).first()
+    user = await run_db(db, get_user_by_email, email)
 
     if not user:
         raise ValueError("Invalid email or password")
     
-    if not verify_password(password, user.hashed_password):
+    if not await verify_password_async(password, user.hashed_password):
         raise ValueError("Invalid email or password")
     
-    account = db.query(Account).filter(Account.user_id == user.id).first()
+    account = await run_db(db, get_account_by_user_id, user.id)
 
     if not account:
         raise ValueError("Account not found for user")
 
-    token = create_access_token(data={"user_id": user.id, "email": user.email})
+    token = create_user_token(user, account)
 
     return {
         "user": user,
         "account": account,
         "token": token
-    }
\ No newline at end of file
+    }
+
+async def authenticate_token(db: DbSession, token: str) -> CurrentUser:
+    cache_key = hashlib.sha256(token.encode()).digest()
+
+    principal = _principal_cache.get(cache_key)
+    if principal is not None:
+        return principal
+
+    payload = decode_access_token(token)
+    if not payload or "user_id" not in payload:
+        raise ValueError("Invalid or expired token")
+
+    if "account_id" in payload:
+        principal = CurrentUser(
+            user_id=payload["user_id"],
+            email=payload["email"],
+            name=payload["name"],
+            account_id=payload["account_id"],
+            account_number=payload["account_number"]
+        )
+    else:
+        # Tokens issued before the account claims were added - hydrate once, then serve from cache
+        user = await run_db(db, Session.get, User, payload["user_id"])
+        account = await run_db(db, get_account_by_user_id, payload["user_id"]) if user else None
+        if not account:
+            raise ValueError("Invalid or expired token")
+        principal = CurrentUser(
+            user_id=user.id,
+            email=user.email,
+            name=user.name,
+            account_id=account.id,
+            account_number=account.account_number
+        )
+
+    # Evict no later than the token itself expires
+    expires_at = time.monotonic() + (payload["exp"] - time.time())
+    _principal_cache.set(cache_key, principal, expires_at=expires_at)
+
+    return principal
@@ -0,0 +1,206 @@
+from sqlalchemy.orm import Session, with_expression
+from sqlalchemy.sql import func
+from sqlalchemy import select
+from app.models import Account, AccountBalanceShard
+from app.utils.cache import TTLCache
+from app.utils.metrics import Counter, Histogram
+from app.config import get_settings
+from decimal import Decimal as d
+import random
+import time
+
+# Hot accounts: an account with balance_shards = N > 0 keeps part of its funds in N
+# account_balance_shards rows. Credits lock one random shard instead of the account row,
+# so concurrent credits to a busy merchant account no longer queue on a single row lock.
+# Debits lock the account row plus every shard and sweep funds out of them, so the
+# total never goes negative. The balance is always accounts.balance + sum(shards).
+#
+# A credit that locks a single shard can't know the exact total, so its transaction is
+# stored with balance_after = NULL; readers derive those from signed sums of the history.
+
+settings = get_settings()
+
+# account id -> shard count (0 = normal account); other workers see a change within the TTL
+_shard_counts = TTLCache(maxsize=100000, ttl=settings.HOT_ACCOUNT_CACHE_SECONDS)
+
+lock_wait_seconds = Histogram(
+    "db_lock_wait_seconds", "Time to acquire the row locks of a posting, by operation",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+)
+insufficient_funds = Counter("insufficient_funds_total", "Debits refused for insufficient funds, by operation")
+
+
+class BalanceLayoutChanged(RuntimeError):
+    """A hot account's shard count changed between reading and locking it; safe to retry"""
+
+
+class LockedBalance:
+    """Funds of one account locked for a posting"""
+
+    def __init__(self, account_id: int, account: Account | None, shards: list[AccountBalanceShard], credit_only: bool, operation: str = "posting"):
+        self.account_id = account_id
+        self.account = account  # Locked accounts row (None when only one shard of a hot account is locked)
+        self.shards = shards
+        self.credit_only = credit_only
+        self.operation = operation  # Metrics label
+
+    @property
+    def credit_shard(self) -> int:
+        return self.shards[0].shard if self.credit_only else 0
+
+    def available(self) -> d:
+        # Exact only when the account row and all shards are locked (every debit path)
+        return self.account.balance + sum((shard.balance for shard in self.shards), d("0.00"))
+
+    def credit(self, amount: d):
+        if self.credit_only:
+            self.shards[0].balance += amount
+        else:
+            self.account.balance += amount
+
+    def debit(self, amount: d):
+        if self.available() < amount:
+            insufficient_funds.inc(operation=self.operation)
+            raise ValueError(f"Insuficient funds! Current balance: {self.available()}")
+
+        # Sweep the base balance first, then shards in order
+        take = min(self.account.balance, amount)
+        self.account.balance -= take
+        remaining = amount - take
+        for shard in self.shards:
+            if remaining <= 0:
+                break
+            take = min(shard.balance, remaining)
+            shard.balance -= take
+            remaining -= take
+
+
+def shard_balance_expression():
+    return (
+        select(func.coalesce(func.sum(AccountBalanceShard.balance), 0))
+        .where(AccountBalanceShard.account_id == Account.id)
+        .correlate(Account)
+        .scalar_subquery()
+    )
+
+def with_shard_balance():
+    """Query option loading Account.shard_balance, so Account.total_balance is the full balance"""
+    return with_expression(Account.shard_balance, shard_balance_expression())
+
+def get_shard_counts(db: Session, account_ids: set[int]) -> dict[int, int]:
+    counts = {}
+    missing = []
+    for account_id in account_ids:
+        count = _shard_counts.get(account_id)
+        if count is None:
+            missing.append(account_id)
+        else:
+            counts[account_id] = count
+
+    if missing:
+        for account_id, count in db.query(Account.id, Account.balance_shards).filter(Account.id.in_(missing)):
+            _shard_counts.set(account_id, count)
+            counts[account_id] = count
+
+    return counts
+
+def lock_balances(db: Session, debit_ids: set[int], credit_ids: set[int], operation: str = "posting") -> dict[int, LockedBalance]:
+    """
+    Lock the funds a posting touches. Lock order is always: accounts rows by id,
+    then shard rows by (account_id, shard) - the deadlock rule of transfer_funds, extended.
+    Missing accounts are simply absent from the result.
+    """
+    started = time.perf_counter()
+    try:
+        return _lock_balances(db, debit_ids, credit_ids, operation)
+    finally:
+        lock_wait_seconds.observe(time.perf_counter() - started, operation=operation)
+
+def _lock_balances(db: Session, debit_ids: set[int], credit_ids: set[int], operation: str) -> dict[int, LockedBalance]:
+    shard_counts = get_shard_counts(db, debit_ids | credit_ids)
+    hot_credit_ids = {i for i in credit_ids - debit_ids if shard_counts.get(i, 0) > 0}
+    row_ids = sorted((debit_ids | credit_ids) - hot_credit_ids)
+
+    accounts = {}
+    if row_ids:
+        accounts = {
+            account.id: account
+            for account in db.query(Account).filter(Account.id.in_(row_ids)).order_by(Account.id).with_for_update().populate_existing()
+        }
+
+    for account_id, account in accounts.items():
+        if account.balance_shards != shard_counts.get(account_id, 0):
+            # Hot mode was switched on or off by another worker after we cached the count:
+            # locking by the stale layout would miss shards, or look for ones that are gone
+            _shard_counts.set(account_id, account.balance_shards)
+            raise BalanceLayoutChanged(f"Balance layout of account {account_id} changed, please retry")
+
+    balances = {}
+    for account_id in sorted(set(accounts) | hot_credit_ids):
+        shard_count = shard_counts.get(account_id, 0)
+
+        if account_id in hot_credit_ids:
+            shard_no = random.randrange(shard_count)
+            shard = db.query(AccountBalanceShard).filter(
+                AccountBalanceShard.account_id == account_id,
+                AccountBalanceShard.shard == shard_no
+            ).with_for_update().first()
+            if not shard:
+                # Hot mode was switched off by another worker after we cached the count
+                _shard_counts.pop(account_id)
+                raise BalanceLayoutChanged(f"Balance layout of account {account_id} changed, please retry")
+            balances[account_id] = LockedBalance(account_id, None, [shard], credit_only=True, operation=operation)
+
+        else:
+            shards = []
+            if shard_count > 0 and account_id in debit_ids:
+                shards = db.query(AccountBalanceShard).filter(
+                    AccountBalanceShard.account_id == account_id
+                ).order_by(AccountBalanceShard.shard).with_for_update().all()
+            balances[account_id] = LockedBalance(account_id, accounts[account_id], shards, credit_only=False, operation=operation)
+
+    return balances
+
+def running_balance(locked: LockedBalance) -> d | None:
+    """balance_after to store for a posting: exact when the whole balance is locked, else None"""
+    return None if locked.credit_only else locked.available()
+
+def current_balance(db: Session, locked: LockedBalance) -> d:
+    """Balance including this posting's pending changes, as reported back to the client"""
+    if not locked.credit_only:
+        return locked.available()
+
+    # Only one shard is locked: read the rest without locking (a point-in-time view, never stored)
+    shard = locked.shards[0]
+    other_shards = db.query(func.coalesce(func.sum(AccountBalanceShard.balance), 0)).filter(
+        AccountBalanceShard.account_id == locked.account_id,
+        AccountBalanceShard.shard != shard.shard
+    ).scalar()
+    base = db.query(Account.balance).filter(Account.id == locked.account_id).scalar()
+
+    return d(base) + d(other_shards) + shard.balance
+
+def set_balance_shards(db: Session, account_id: int, shards: int) -> Account:
+    """Switch an account into hot mode with `shards` sub-balances, or back to a single row with 0"""
+    account = db.query(Account).filter(Account.id == account_id).with_for_update().first()
+
+    if not account:
+        raise ValueError(f"Account with id {account_id} not found")
+
+    existing = db.query(AccountBalanceShard).filter(
+        AccountBalanceShard.account_id == account_id
+    ).order_by(AccountBalanceShard.shard).with_for_update().all()
+
+    # Fold every shard back into the base balance, then lay out fresh empty shards
+    for shard in existing:
+        account.balance += shard.balance
+        db.delete(shard)
+    db.flush()
+
+    db.add_all(AccountBalanceShard(account_id=account_id, shard=n, balance=d("0.00")) for n in range(shards))
+    account.balance_shards = shards
+    db.commit()
+
+    _shard_counts.set(account_id, shards)
+
+    return db.query(Account).options(with_shard_balance()).filter(Account.id == account_id).populate_existing().first()
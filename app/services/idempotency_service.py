@@ -0,0 +1,138 @@
+from sqlalchemy.orm import Session
+from sqlalchemy.exc import IntegrityError
+from pydantic import BaseModel
+from app.database import DbSession
+from app.models import IdempotencyKey
+from app.services.retry_service import run_with_retry
+from app.utils.cache import TTLCache
+from app.utils.metrics import Counter
+from app.config import get_settings
+from datetime import datetime, timedelta
+import asyncio
+import hashlib
+
+# Retried postings (client timeouts) must not move money twice. A request carrying an
+# Idempotency-Key claims the key, runs the posting inside a SAVEPOINT of the same
+# transaction and stores the response, so claim, posting and response commit together;
+# the response is replayed for every later request with that key. Recent responses are also kept in memory so a
+# retry never reaches the database, and concurrent duplicates inside one worker wait
+# for the first request instead of queueing on the account row locks.
+
+settings = get_settings()
+
+# key -> (endpoint, request hash, JSON response)
+_recent_responses = TTLCache(maxsize=settings.IDEMPOTENCY_CACHE_SIZE, ttl=settings.IDEMPOTENCY_KEY_TTL_SECONDS)
+
+# key -> future of the request currently posting it in this worker
+_in_flight: dict[str, asyncio.Future] = {}
+
+idempotency_requests = Counter("idempotency_requests_total", "Posting requests carrying an Idempotency-Key, by outcome")
+
+
+class IdempotencyConflict(Exception):
+    """The key is being posted by another worker, or was used for a different request"""
+
+
+def request_fingerprint(endpoint: str, payload: BaseModel) -> str:
+    return hashlib.sha256(f"{endpoint}:{payload.model_dump_json()}".encode()).hexdigest()
+
+def _stored_response(key: str, endpoint: str, request_hash: str, stored_endpoint: str, stored_hash: str, response: str | None) -> str:
+    if stored_endpoint != endpoint or stored_hash != request_hash:
+        raise IdempotencyConflict(f"Idempotency-Key {key} was already used for a different request")
+    if response is None:
+        raise IdempotencyConflict(f"A request with Idempotency-Key {key} is still being processed, retry later")
+    return response
+
+def post_once(db: Session, key: str, endpoint: str, request_hash: str, response_model: type[BaseModel], fn, kwargs: dict) -> tuple[str, bool]:
+    """Run the posting fn under the key, or load the stored response. Returns (JSON response, replayed)"""
+    record = db.get(IdempotencyKey, key)
+
+    if record and record.expires_at <= datetime.now():
+        db.delete(record)
+        db.flush()
+        record = None
+
+    if not record:
+        db.add(IdempotencyKey(
+            key=key,
+            endpoint=endpoint,
+            request_hash=request_hash,
+            expires_at=datetime.now() + timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL_SECONDS)
+        ))
+        try:
+            db.flush()
+        except IntegrityError:
+            # Another worker claimed the key first (its INSERT blocked ours until it committed)
+            db.rollback()
+            record = db.get(IdempotencyKey, key)
+
+    if record:
+        response = _stored_response(key, endpoint, request_hash, record.endpoint, record.request_hash, record.response)
+        db.rollback()
+        return response, True
+
+    # The posting gets its own session joined to this transaction: its commits only release
+    # savepoints, so it is durable exactly when the claim and its response are
+    posting_db = Session(bind=db.connection(), join_transaction_mode="create_savepoint", autoflush=False)
+    try:
+        response = response_model.model_validate(fn(posting_db, **kwargs)).model_dump_json()
+    except Exception:
+        posting_db.close()
+        db.rollback()
+        raise
+    posting_db.close()
+
+    db.query(IdempotencyKey).filter(IdempotencyKey.key == key).update(
+        {IdempotencyKey.response: response}, synchronize_session=False
+    )
+    db.commit()
+
+    return response, False
+
+async def run_idempotent(db: DbSession, key: str | None, endpoint: str, payload: BaseModel, response_model: type[BaseModel], fn, **kwargs) -> tuple[BaseModel, bool]:
+    """
+    Run a posting service function at most once per Idempotency-Key.
+    Returns (response, replayed); without a key this is just run_with_retry.
+    """
+    if not key:
+        return await run_with_retry(db, fn, **kwargs), False
+
+    request_hash = request_fingerprint(endpoint, payload)
+
+    cached = _recent_responses.get(key)
+    if cached:
+        idempotency_requests.inc(outcome="replayed_memory")
+        return response_model.model_validate_json(_stored_response(key, endpoint, request_hash, *cached)), True
+
+    pending = _in_flight.get(key)
+    if pending:
+        # Same key already posting in this worker - share its outcome
+        idempotency_requests.inc(outcome="coalesced")
+        stored_endpoint, stored_hash, response = await asyncio.shield(pending)
+        return response_model.model_validate_json(_stored_response(key, endpoint, request_hash, stored_endpoint, stored_hash, response)), True
+
+    future = asyncio.get_running_loop().create_future()
+    _in_flight[key] = future
+    try:
+        # The claim rolls back with an aborted posting, so a retry claims the key afresh
+        response, replayed = await run_with_retry(db, post_once, key, endpoint, request_hash, response_model, fn, kwargs, operation=fn.__name__)
+        future.set_result((endpoint, request_hash, response))
+    except Exception as e:
+        future.set_exception(e)
+        future.exception()  # Mark retrieved - there may be no duplicate waiting on it
+        raise
+    finally:
+        _in_flight.pop(key, None)
+        if not future.done():
+            future.cancel()
+
+    _recent_responses.set(key, (endpoint, request_hash, response))
+    idempotency_requests.inc(outcome="replayed_database" if replayed else "posted")
+
+    return response_model.model_validate_json(response), replayed
+
+def purge_expired_idempotency_keys(db: Session) -> int:
+    """Delete keys past their TTL; returns how many were removed"""
+    removed = db.query(IdempotencyKey).filter(IdempotencyKey.expires_at <= datetime.now()).delete(synchronize_session=False)
+    db.commit()
+    return removed
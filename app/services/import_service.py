@@ -0,0 +1,292 @@
+from sqlalchemy.orm import Session, aliased
+from sqlalchemy.sql import func
+from sqlalchemy import select, insert, update, case, and_
+from app.models import User, Account, Transaction, TransactionType, AccountBalanceSnapshot
+from app.services import generate_account_number, rebuild_daily_stats
+from app.services.archive_service import archived_until
+from app.utils import hash_password
+from concurrent.futures import ProcessPoolExecutor
+from decimal import Decimal as d, InvalidOperation
+from datetime import datetime
+import csv
+import io
+import json
+import time
+
+# Bulk loading of users (each with its account) and transaction history from CSV or NDJSON.
+# Rows are streamed and written in large batches - COPY on PostgreSQL/psycopg2, multi-row
+# INSERT elsewhere. User batches are committed on their own; the transaction history and the
+# balances recomputed from it are committed together, so a rejected file leaves no rows behind.
+# Passwords are hashed once per distinct value (in parallel), and balance_after chains plus
+# account balances are recomputed set-based in the database after the load, so input order
+# does not matter.
+#
+# users:        name, email, password | hashed_password, [account_number]
+# transactions: account_number, transaction_type (CREDIT/DEBIT), amount, [created_at], [description]
+
+
+class ImportStats:
+    def __init__(self):
+        self.users = 0
+        self.transactions = 0
+        self.started = time.perf_counter()
+
+    def report(self, what: str, count: int):
+        elapsed = time.perf_counter() - self.started
+        print(f"  {what}: {count} rows ({count / elapsed if elapsed else 0:.0f} rows/s)", flush=True)
+
+
+def read_records(path: str):
+    """Yield (line number, dict) from a .csv file with a header row or an .ndjson/.jsonl file"""
+    with open(path, newline="", encoding="utf-8") as source:
+        if path.endswith(".csv"):
+            for line_no, row in enumerate(csv.DictReader(source), start=2):
+                yield line_no, {key: value for key, value in row.items() if value != ""}
+        elif path.endswith((".ndjson", ".jsonl")):
+            for line_no, line in enumerate(source, start=1):
+                if line.strip():
+                    yield line_no, json.loads(line)
+        else:
+            raise ValueError(f"Unsupported file type for {path} - use .csv or .ndjson")
+
+def batched(records, size: int):
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def _uses_copy(db: Session) -> bool:
+    return db.get_bind().dialect.driver == "psycopg2"
+
+def _copy_value(value):
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.isoformat(sep=" ")
+    if isinstance(value, TransactionType):
+        return value.value
+    return value
+
+def write_rows(db: Session, table, rows: list[dict]):
+    """COPY the rows in (PostgreSQL with psycopg2), else one executemany INSERT (multi-row VALUES where the driver batches it)"""
+    if not rows:
+        return
+
+    if not _uses_copy(db):
+        db.execute(insert(table), rows)
+        return
+
+    columns = list(rows[0])
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        # NULL is the unquoted empty field in COPY's CSV format
+        writer.writerow(["" if row[col] is None else _copy_value(row[col]) for col in columns])
+    buffer.seek(0)
+
+    cursor = db.connection().connection.cursor()
+    try:
+        cursor.copy_expert(f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+    finally:
+        cursor.close()
+
+class PasswordHashes:
+    """Hashes each distinct password once, in parallel worker processes"""
+
+    def __init__(self, workers: int):
+        self.known = {}
+        self.pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+
+    def resolve(self, passwords: set[str]):
+        missing = [password for password in passwords if password not in self.known]
+        hashes = self.pool.map(hash_password, missing) if self.pool else map(hash_password, missing)
+        self.known.update(zip(missing, hashes))
+
+    def close(self):
+        if self.pool:
+            self.pool.shutdown()
+
+def import_users(db: Session, path: str, batch_size: int = 5000, hash_workers: int = 1, stats: ImportStats | None = None) -> dict[str, int]:
+    """Create a user and an (empty) account per row. Returns account_number -> account id"""
+    stats = stats or ImportStats()
+    hashes = PasswordHashes(hash_workers)
+    account_ids = {}
+
+    try:
+        for batch in batched(read_records(path), batch_size):
+            hashes.resolve({row["password"] for _, row in batch if "hashed_password" not in row and "password" in row})
+
+            users = []
+            numbers = {}
+            for line_no, row in batch:
+                if "email" not in row or "name" not in row:
+                    raise ValueError(f"{path}:{line_no}: name and email are required")
+                hashed = row.get("hashed_password") or hashes.known.get(row.get("password"))
+                if not hashed:
+                    raise ValueError(f"{path}:{line_no}: password or hashed_password is required")
+
+                users.append({"name": row["name"], "email": row["email"], "hashed_password": hashed})
+                numbers[row["email"]] = row.get("account_number") or generate_account_number()
+
+            write_rows(db, User.__table__, users)
+            user_ids = dict(db.execute(select(User.email, User.id).where(User.email.in_(numbers))).all())
+
+            write_rows(db, Account.__table__, [
+                {"user_id": user_ids[email], "account_number": number, "balance": d("0.00"), "balance_shards": 0}
+                for email, number in numbers.items()
+            ])
+            account_ids.update(db.execute(
+                select(Account.account_number, Account.id).where(Account.account_number.in_(list(numbers.values())))
+            ).all())
+            db.commit()
+
+            stats.users += len(batch)
+            stats.report("users", stats.users)
+    finally:
+        hashes.close()
+
+    return account_ids
+
+def _transaction_row(path: str, line_no: int, row: dict, account_ids: dict[str, int]) -> dict:
+    try:
+        transaction_type = TransactionType(row["transaction_type"].upper())
+        amount = d(str(row["amount"])).quantize(d("0.01"))
+    except (KeyError, ValueError, InvalidOperation):
+        raise ValueError(f"{path}:{line_no}: transaction_type must be CREDIT or DEBIT and amount a number")
+    if amount <= 0:
+        raise ValueError(f"{path}:{line_no}: amount must be positive")
+
+    created_at = row.get("created_at")
+    return {
+        "account_id": account_ids[row["account_number"]],
+        "transaction_type": transaction_type,
+        "amount": amount,
+        "balance_after": d("0.00"),  # Recomputed once the load is done
+        "description": row.get("description"),
+        "created_at": datetime.fromisoformat(created_at) if created_at else datetime.now()
+    }
+
+def import_transactions(db: Session, path: str, account_ids: dict[str, int], batch_size: int = 20000, stats: ImportStats | None = None) -> set[int]:
+    """Load transaction history without committing it (see recompute_balances); returns the ids of the accounts it touched"""
+    stats = stats or ImportStats()
+    touched = set()
+    archived = archived_until(db)
+
+    for batch in batched(read_records(path), batch_size):
+        unknown = {row.get("account_number") for _, row in batch} - set(account_ids)
+        if unknown:
+            account_ids.update(db.execute(
+                select(Account.account_number, Account.id).where(Account.account_number.in_(unknown))
+            ).all())
+
+        rows = []
+        for line_no, row in batch:
+            if row.get("account_number") not in account_ids:
+                raise ValueError(f"{path}:{line_no}: unknown account_number {row.get('account_number')}")
+            rows.append(_transaction_row(path, line_no, row, account_ids))
+            if archived and rows[-1]["created_at"] < archived:
+                raise ValueError(f"{path}:{line_no}: transactions before {archived:%Y-%m-%d} are archived and can't be added to")
+
+        write_rows(db, Transaction.__table__, rows)
+
+        touched.update(row["account_id"] for row in rows)
+        stats.transactions += len(rows)
+        stats.report("transactions", stats.transactions)
+
+    return touched
+
+def recompute_balances(db: Session, account_ids: set[int], chunk_size: int = 1000) -> int:
+    """
+    Rewrite balance_after as the running sum of each account's history (ordered like the
+    history page), then set accounts.balance to the final sum - one UPDATE of each kind per chunk
+    of accounts. Sums start from the checkpoint taken at the archive cutoff, which holds the
+    archived months. Returns how many transactions ended up with a negative running balance.
+    Nothing is committed: the caller commits the loaded rows and their balances together.
+    """
+    hot = db.query(func.count(Account.id)).filter(Account.id.in_(account_ids), Account.balance_shards > 0).scalar() if account_ids else 0
+    if hot:
+        raise ValueError("Switch hot accounts back to a single balance (balance_shards = 0) before importing into them")
+
+    signed = case((Transaction.transaction_type == TransactionType.CREDIT, Transaction.amount), else_=-Transaction.amount)
+
+    # Archived months are no longer in the table: their total is the balance checkpointed when the newest one left
+    cutoff = None
+    archived = archived_until(db)
+    if archived:
+        cutoff = db.query(func.min(AccountBalanceSnapshot.as_of)).filter(AccountBalanceSnapshot.as_of >= archived).scalar()
+        if cutoff is None:
+            raise ValueError(f"No balance checkpoint at the archive cutoff ({archived:%Y-%m-%d}) to start the balances from")
+    opening = aliased(AccountBalanceSnapshot)
+    opening_balance = func.coalesce(opening.balance, 0)
+    opening_join = and_(opening.account_id == Transaction.account_id, opening.as_of == cutoff)
+    ordered = sorted(account_ids)
+    negative = 0
+
+    for start in range(0, len(ordered), chunk_size):
+        chunk = ordered[start:start + chunk_size]
+
+        running = select(
+            Transaction.id.label("id"),
+            (opening_balance + func.sum(signed).over(
+                partition_by=Transaction.account_id,
+                order_by=(Transaction.created_at, Transaction.id)
+            )).label("running")
+        ).outerjoin(opening, opening_join).where(Transaction.account_id.in_(chunk)).subquery()
+
+        db.execute(
+            update(Transaction.__table__)
+            .where(Transaction.__table__.c.id == running.c.id)
+            .values(balance_after=running.c.running)
+        )
+
+        overdrawn = db.query(Transaction.account_id).outerjoin(opening, opening_join).filter(Transaction.account_id.in_(chunk)).group_by(
+            Transaction.account_id
+        ).having(func.max(opening_balance) + func.sum(signed) < 0).limit(5).all()
+        if overdrawn:
+            raise ValueError(f"Imported history leaves accounts below zero, e.g. account ids {[row.account_id for row in overdrawn]}")
+
+        db.execute(
+            update(Account.__table__)
+            .where(Account.__table__.c.id.in_(chunk))
+            .values(balance=(
+                func.coalesce(select(opening.balance).where(opening.account_id == Account.__table__.c.id, opening.as_of == cutoff).scalar_subquery(), 0)
+                + select(func.coalesce(func.sum(signed), 0)).where(Transaction.account_id == Account.__table__.c.id).scalar_subquery()
+            ))
+        )
+        negative += db.query(func.count(Transaction.id)).filter(Transaction.account_id.in_(chunk), Transaction.balance_after < 0).scalar()
+
+    return negative
+
+def bulk_import(db: Session, users_path: str | None = None, transactions_path: str | None = None, user_batch_size: int = 5000, transaction_batch_size: int = 20000, hash_workers: int = 1):
+    stats = ImportStats()
+    account_ids = {}
+
+    if users_path:
+        print(f"Importing users and accounts from {users_path}..")
+        account_ids = import_users(db, users_path, user_batch_size, hash_workers, stats)
+
+    if transactions_path:
+        print(f"Importing transactions from {transactions_path}..")
+        try:
+            touched = import_transactions(db, transactions_path, account_ids, transaction_batch_size, stats)
+
+            print(f"Recomputing balance_after chains for {len(touched)} accounts..")
+            negative = recompute_balances(db, touched)
+            db.commit()
+        except Exception:
+            # One transaction: a rejected file leaves neither rows nor half-updated balances
+            db.rollback()
+            raise
+        if negative:
+            print(f"  warning: {negative} transactions have a negative running balance (debits before the credits that fund them)")
+
+        print("Rebuilding daily account stats..")
+        rebuild_daily_stats(db)
+
+    elapsed = time.perf_counter() - stats.started
+    print(f"Imported {stats.users} users and {stats.transactions} transactions in {elapsed:.1f}s")
+    return stats
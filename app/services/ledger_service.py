@@ -0,0 +1,53 @@
+from app.services import get_account_by_id, get_account_by_account_number, get_account_transactions, deposit_funds, withdraw_funds, transfer_funds, transfer_by_account_number, post_transaction_batch
+from app.config import get_settings
+import threading
+
+# Storage backend behind the posting and account-read routes (LEDGER_BACKEND). A backend exposes
+# the service functions below under the same names and signatures, so routes, run_idempotent and
+# run_with_retry call either one the same way:
+#   sql    - app.services over SQLAlchemy (the default)
+#   memory - app.services.memory_ledger_service, in-process state + write-ahead log for simulation runs
+# Reporting (stats, statements, balance-at) always reads the database.
+
+settings = get_settings()
+
+
+class SqlLedger:
+    get_account_by_id = staticmethod(get_account_by_id)
+    get_account_by_account_number = staticmethod(get_account_by_account_number)
+    get_account_transactions = staticmethod(get_account_transactions)
+    deposit_funds = staticmethod(deposit_funds)
+    withdraw_funds = staticmethod(withdraw_funds)
+    transfer_funds = staticmethod(transfer_funds)
+    transfer_by_account_number = staticmethod(transfer_by_account_number)
+    post_transaction_batch = staticmethod(post_transaction_batch)
+
+    def close(self):
+        pass
+
+
+_ledger = None
+_ledger_lock = threading.Lock()
+
+def get_ledger():
+    """The configured backend, opened (and for memory, replayed from its log) on first use"""
+    global _ledger
+    if _ledger is None:
+        with _ledger_lock:
+            if _ledger is None:
+                if settings.LEDGER_BACKEND == "memory":
+                    if settings.ASYNC_DATABASE:
+                        # Postings block on the log flush, which must happen in the threadpool, not on the event loop
+                        raise ValueError("LEDGER_BACKEND=memory needs ASYNC_DATABASE turned off")
+                    from app.services.memory_ledger_service import MemoryLedger
+                    _ledger = MemoryLedger.open(settings.LEDGER_WAL_PATH, settings.LEDGER_GROUP_COMMIT_MS, settings.LEDGER_FSYNC)
+                else:
+                    _ledger = SqlLedger()
+    return _ledger
+
+def close_ledger():
+    global _ledger
+    with _ledger_lock:
+        if _ledger is not None:
+            _ledger.close()
+            _ledger = None
@@ -0,0 +1,526 @@
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+from decimal import Decimal as d
+from sqlalchemy.orm import Session
+from app.schemas import TransactionSuccessResponse, TransferSuccessResponse, AccountTransactionDetail, BatchOperation, BatchOperationType
+from app.services import CENTS, get_account_by_id, get_account_by_account_number, encode_history_cursor
+from app.services.balance_service import insufficient_funds
+from app.utils.metrics import Histogram
+import os
+import struct
+import threading
+import time
+import zlib
+
+# In-process ledger for simulation runs (LEDGER_BACKEND=memory). Balances are integer cents on
+# __slots__ account objects and postings live in parallel arrays (~40 bytes each) instead of one
+# object per row. Every operation is appended to a binary write-ahead log before its caller gets
+# an answer: a background writer flushes whatever has queued up with one write + fsync (group
+# commit), so concurrent postings share the flush. On startup the state is rebuilt by replaying the log.
+#
+# Accounts are created through the normal (SQL) API; the first posting or read that touches one
+# carries its balance over into the ledger (an OPEN record), after which it lives here only.
+# Reads only see postings whose log record is on disk, so nothing a crash could undo is ever shown.
+#
+# Transaction ids start above anything the INTEGER transactions.id column can hold, so they never
+# collide with the ids of database transactions (history cursors, exports, reconciliation).
+#
+# Log frame: <payload length u32><crc32 u32><payload>, where the payload is
+#   OPEN:    kind u8, account_id, balance (cents), created_at f64, len(account_number) u8, len(owner_name) u16, both strings
+#   posting: kind u8, account_id, to_account_id (0 unless TRANSFER), amount (cents), created_at f64, len(description) u16, description
+# A torn frame at the end of the log (crash mid-write) was never acknowledged and is cut off on replay.
+
+_FRAME = struct.Struct("<II")
+_OPEN = struct.Struct("<BqqdBH")
+_POSTING = struct.Struct("<BqqqdH")
+
+OPEN, DEPOSIT, WITHDRAW, TRANSFER = 1, 2, 3, 4
+
+FIRST_TRANSACTION_ID = 2 ** 31
+
+wal_group_size = Histogram("ledger_wal_group_size", "Log records written per group commit", buckets=(1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 5000))
+wal_flush_seconds = Histogram("ledger_wal_flush_seconds", "Write + fsync time per group commit")
+
+
+def _cents(amount: d) -> int:
+    return int(amount * 100)
+
+def _money(cents: int) -> d:
+    return d(cents).scaleb(-2)
+
+
+class LedgerAccount:
+    __slots__ = ("id", "account_number", "owner_name", "opening_balance", "balance", "created_at", "postings")
+
+    def __init__(self, account_id: int, account_number: str, balance: int, created_at: float, owner_name: str | None = None):
+        self.id = account_id
+        self.account_number = account_number
+        self.owner_name = owner_name
+        self.opening_balance = balance  # Cents, before any posting in the ledger
+        self.balance = balance  # Cents, including postings still waiting for the log
+        self.created_at = created_at
+        self.postings = array("q")  # Transaction ids, oldest first
+
+class Postings:
+    """Columnar posting store: transaction id FIRST_TRANSACTION_ID + n is row n of every array"""
+    __slots__ = ("account_id", "credit", "amount", "balance_after", "related", "created_at", "log_seq", "descriptions")
+
+    def __init__(self):
+        self.account_id = array("q")
+        self.credit = array("b")
+        self.amount = array("q")
+        self.balance_after = array("q")
+        self.related = array("q")  # 0 = not a transfer leg
+        self.created_at = array("d")
+        self.log_seq = array("q")  # Log record of the posting (0 = replayed); never decreases
+        self.descriptions = {}  # Only descriptions given by the client; defaults are derived on read
+
+    @property
+    def next_id(self) -> int:
+        return FIRST_TRANSACTION_ID + len(self.amount)
+
+    def row(self, txn_id: int) -> int:
+        return txn_id - FIRST_TRANSACTION_ID
+
+    def visible_id(self, durable_seq: int) -> int:
+        """Last transaction id whose log record is durable (below FIRST_TRANSACTION_ID if none)"""
+        return FIRST_TRANSACTION_ID + bisect_right(self.log_seq, durable_seq) - 1
+
+    def append(self, account: LedgerAccount, credit: bool, amount: int, created_at: float, log_seq: int, related: int = 0, description: str | None = None) -> int:
+        txn_id = self.next_id
+        self.account_id.append(account.id)
+        self.credit.append(credit)
+        self.amount.append(amount)
+        self.balance_after.append(account.balance)
+        self.related.append(related)
+        self.created_at.append(created_at)
+        # Last, so readers never count the row as durable before its other columns are in
+        self.log_seq.append(log_seq)
+
+        account.postings.append(txn_id)
+        if description:
+            self.descriptions[txn_id] = description
+        return txn_id
+
+
+class WriteAheadLog:
+    """Append-only log file; records queued by append() are made durable together by one writer thread"""
+
+    def __init__(self, path: str, group_commit_ms: float = 2, fsync: bool = True):
+        self.file = open(path, "ab")
+        self.group_commit_seconds = group_commit_ms / 1000
+        self.fsync = fsync
+        self.pending = bytearray()
+        self.appended = 0  # Records queued so far
+        self.durable = 0  # Records written (and fsynced) so far
+        self.error = None
+        self.closed = False
+        self.cond = threading.Condition()
+        self.writer = threading.Thread(target=self._write_loop, name="ledger-wal", daemon=True)
+        self.writer.start()
+
+    def append(self, payload: bytes) -> int:
+        """Queue one record; returns its sequence number for wait()"""
+        with self.cond:
+            if self.closed:
+                raise RuntimeError("Ledger log is closed")
+            self.pending += _FRAME.pack(len(payload), zlib.crc32(payload))
+            self.pending += payload
+            self.appended += 1
+            self.cond.notify_all()
+            return self.appended
+
+    def wait(self, seq: int):
+        """Block until record seq is on disk"""
+        with self.cond:
+            while self.durable < seq:
+                if self.error:
+                    raise RuntimeError(f"Ledger log write failed: {self.error}")
+                self.cond.wait()
+
+    def sync(self):
+        with self.cond:
+            seq = self.appended
+        self.wait(seq)
+
+    def _write_loop(self):
+        while True:
+            with self.cond:
+                while not self.pending and not self.closed:
+                    self.cond.wait()
+                if not self.pending:
+                    return
+                closing = self.closed
+
+            if self.group_commit_seconds and not closing:
+                # Let postings arriving right behind this one join the same flush
+                time.sleep(self.group_commit_seconds)
+
+            with self.cond:
+                data, self.pending = self.pending, bytearray()
+                seq = self.appended
+                records = seq - self.durable
+
+            started = time.perf_counter()
+            try:
+                self.file.write(data)
+                self.file.flush()
+                if self.fsync:
+                    os.fsync(self.file.fileno())
+            except OSError as e:
+                with self.cond:
+                    self.error = e
+                    self.cond.notify_all()
+                return
+
+            wal_flush_seconds.observe(time.perf_counter() - started)
+            wal_group_size.observe(records)
+            with self.cond:
+                self.durable = seq
+                self.cond.notify_all()
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+        self.writer.join()
+        self.file.close()
+
+
+class MemoryLedger:
+    """Ledger backend holding accounts and postings in memory, durable through a write-ahead log"""
+
+    def __init__(self):
+        self.accounts: dict[int, LedgerAccount] = {}
+        self.by_number: dict[str, LedgerAccount] = {}
+        self.postings = Postings()
+        self.lock = threading.Lock()
+        self.wal: WriteAheadLog | None = None
+
+    @classmethod
+    def open(cls, path: str, group_commit_ms: float = 2, fsync: bool = True) -> "MemoryLedger":
+        """Rebuild the ledger from the log at path (if any) and append to it from then on"""
+        ledger = cls()
+        ledger._replay(path)
+        ledger.wal = WriteAheadLog(path, group_commit_ms, fsync)
+        return ledger
+
+    def close(self):
+        if self.wal:
+            self.wal.close()
+
+    def _replay(self, path: str):
+        if not os.path.exists(path):
+            return
+
+        with open(path, "rb") as log:
+            data = log.read()
+
+        offset = 0
+        while offset + _FRAME.size <= len(data):
+            length, crc = _FRAME.unpack_from(data, offset)
+            payload = data[offset + _FRAME.size:offset + _FRAME.size + length]
+            if len(payload) < length or zlib.crc32(payload) != crc:
+                break
+            try:
+                self._apply_record(payload)
+            except ValueError as e:
+                raise RuntimeError(f"Ledger log {path} does not replay at byte {offset}: {e}")
+            offset += _FRAME.size + length
+
+        if offset < len(data):
+            # Torn tail from a crash mid-write: those operations were never acknowledged
+            with open(path, "r+b") as log:
+                log.truncate(offset)
+
+    def _apply_record(self, payload: bytes):
+        if payload[0] == OPEN:
+            _, account_id, balance, created_at, number_length, name_length = _OPEN.unpack_from(payload)
+            strings = payload[_OPEN.size:]
+            owner_name = strings[number_length:number_length + name_length].decode() or None
+            self._open(account_id, strings[:number_length].decode(), balance, created_at, owner_name)
+        else:
+            kind, account_id, to_account_id, amount, created_at, description_length = _POSTING.unpack_from(payload)
+            description = payload[_POSTING.size:_POSTING.size + description_length].decode() or None
+            self._apply(kind, account_id, to_account_id, amount, created_at, description, log_seq=0)
+
+    def _open(self, account_id: int, account_number: str, balance: int, created_at: float, owner_name: str | None) -> LedgerAccount:
+        if account_number in self.by_number:
+            raise ValueError(f"Account number {account_number} is already in the ledger")
+        account = LedgerAccount(account_id, account_number, balance, created_at, owner_name)
+        self.accounts[account_id] = account
+        self.by_number[account_number] = account
+        return account
+
+    def _apply(self, kind: int, account_id: int, to_account_id: int, amount: int, created_at: float, description: str | None, log_seq: int) -> int:
+        """Validate and apply one posting (log_seq: its log record); returns its (first) transaction id. Callers hold the lock"""
+        account = self.accounts.get(account_id)
+
+        if kind == DEPOSIT:
+            if account is None:
+                raise ValueError(f"Account with id {account_id} not found")
+            account.balance += amount
+            return self.postings.append(account, True, amount, created_at, log_seq, description=description)
+
+        if kind == WITHDRAW:
+            if account is None:
+                raise ValueError(f"Account with account_id {account_id} not found")
+            if account.balance < amount:
+                if self.wal:  # Not while replaying
+                    insufficient_funds.inc(operation="withdraw")
+                raise ValueError(f"Insuficient funds! Current balance: {_money(account.balance)}")
+            account.balance -= amount
+            return self.postings.append(account, False, amount, created_at, log_seq, description=description)
+
+        to_account = self.accounts.get(to_account_id)
+        if account is None:
+            raise ValueError(f"Source account with ID: {account_id} not found")
+        if to_account is None:
+            raise ValueError(f"Destination account with ID: {to_account_id} not found")
+        if account.balance < amount:
+            if self.wal:
+                insufficient_funds.inc(operation="transfer")
+            raise ValueError("Insufficeient funds")
+
+        # The two legs get consecutive ids and point at each other
+        first = self.postings.next_id
+        account.balance -= amount
+        to_account.balance += amount
+        self.postings.append(account, False, amount, created_at, log_seq, related=first + 1, description=description)
+        self.postings.append(to_account, True, amount, created_at, log_seq, related=first, description=description)
+        return first
+
+    def _post(self, kind: int, account_id: int, to_account_id: int, amount: int, description: str | None) -> tuple[int, int]:
+        """Apply a posting and queue its log record; returns (transaction id, log sequence number)"""
+        created_at = time.time()
+        encoded = description.encode() if description else b""
+        payload = _POSTING.pack(kind, account_id, to_account_id, amount, created_at, len(encoded)) + encoded
+
+        # Applied and logged under one lock, so the log order is the order the state saw
+        # (and the record appended next gets the sequence number the rows are tagged with)
+        with self.lock:
+            txn_id = self._apply(kind, account_id, to_account_id, amount, created_at, description, log_seq=self.wal.appended + 1)
+            seq = self.wal.append(payload)
+        return txn_id, seq
+
+    def open_account(self, account_id: int, account_number: str, balance: int = 0, owner_name: str | None = None, created_at: float | None = None) -> LedgerAccount:
+        """Add an account (balance in cents), or return it if the ledger already has it"""
+        created_at = created_at or time.time()
+        number, name = account_number.encode(), (owner_name or "").encode()
+        payload = _OPEN.pack(OPEN, account_id, balance, created_at, len(number), len(name)) + number + name
+
+        # No wait for the log here: any posting acknowledged against the account is logged after this record
+        with self.lock:
+            account = self.accounts.get(account_id)
+            if account is None:
+                account = self._open(account_id, account_number, balance, created_at, owner_name)
+                self.wal.append(payload)
+        return account
+
+    def post(self, operation: int, account_id: int, amount: int, to_account_id: int = 0, description: str | None = None) -> int:
+        """
+        Apply one DEPOSIT / WITHDRAW / TRANSFER (amount in cents) without waiting for the log;
+        returns its (first) transaction id. Call sync() before treating the postings as durable.
+        """
+        return self._post(operation, account_id, to_account_id, amount, description)[0]
+
+    def sync(self):
+        self.wal.sync()
+
+    def _visible_postings(self, account: LedgerAccount) -> int:
+        """How many of the account's postings are on disk (the oldest ones)"""
+        return bisect_right(account.postings, self.postings.visible_id(self.wal.durable if self.wal else 0))
+
+    def _balance_after(self, account: LedgerAccount, count: int) -> int:
+        # Balance after the account's first `count` postings
+        return self.postings.balance_after[self.postings.row(account.postings[count - 1])] if count else account.opening_balance
+
+    # -- Same names and signatures as the SQL service functions (see app.services.ledger_service) --
+
+    def _adopt(self, row) -> LedgerAccount | None:
+        # First touch of a database account: its current balance becomes the ledger's opening balance
+        if row is None:
+            return None
+        return self.open_account(row.id, row.account_number, _cents(row.total_balance), row.user.name if row.user else None, row.created_at.timestamp())
+
+    def _account(self, db: Session | None, account_id: int) -> LedgerAccount | None:
+        account = self.accounts.get(account_id)
+        if account is None and db is not None:
+            account = self._adopt(get_account_by_id(db, account_id))
+        return account
+
+    def _account_by_number(self, db: Session | None, account_number: str) -> LedgerAccount | None:
+        account = self.by_number.get(account_number)
+        if account is None and db is not None:
+            account = self._adopt(get_account_by_account_number(db, account_number))
+        return account
+
+    def _account_dict(self, account: LedgerAccount | None) -> dict | None:
+        if account is None:
+            return None
+        return {
+            "id": account.id,
+            "account_number": account.account_number,
+            "balance": _money(self._balance_after(account, self._visible_postings(account))),
+            "balance_shards": 0,
+            "created_at": datetime.fromtimestamp(account.created_at)
+        }
+
+    def _transaction(self, txn_id: int) -> dict:
+        p = self.postings
+        row = p.row(txn_id)
+        credit = p.credit[row] == 1
+        related = p.related[row] or None
+        counterparty = self.accounts[p.account_id[p.row(related)]] if related else None
+
+        description = p.descriptions.get(txn_id)
+        if description is None:
+            if counterparty:
+                description = f"Transfer {'from' if credit else 'to'} account {counterparty.account_number}"
+            else:
+                description = "Deposit" if credit else "Withdrawal"
+
+        return {
+            "id": txn_id,
+            "account_id": p.account_id[row],
+            "transaction_type": "CREDIT" if credit else "DEBIT",
+            "amount": _money(p.amount[row]),
+            "balance_after": _money(p.balance_after[row]),
+            "related_trasaction_id": related,
+            "description": description,
+            "created_at": datetime.fromtimestamp(p.created_at[row]),
+            "counterparty_name": counterparty.owner_name if counterparty else None,
+            "counterparty_account": counterparty.account_number if counterparty else None
+        }
+
+    def get_account_by_id(self, db: Session | None, account_id: int) -> dict | None:
+        return self._account_dict(self._account(db, account_id))
+
+    def get_account_by_account_number(self, db: Session | None, account_number: str) -> dict | None:
+        return self._account_dict(self._account_by_number(db, account_number))
+
+    def get_account_transactions(self, db: Session | None, account_id: int, limit: int = 10, offset: int = 0, after: int | None = None, include_total: bool = True) -> dict:
+        account = self._account(db, account_id)
+        if not account:
+            raise ValueError(f"Account with account id: {account_id} not found!!")
+
+        # Newest first, from the last posting on disk; a cursor seeks straight to its position in the account's id list
+        ids = account.postings
+        visible = self._visible_postings(account)
+        end = min(bisect_left(ids, after), visible) if after is not None else max(visible - offset, 0)
+        start = max(end - limit, 0)
+
+        return {
+            "account_id": account.id,
+            "account_number": account.account_number,
+            "current_balance": _money(self._balance_after(account, visible)),
+            "transactions": [self._transaction(txn_id) for txn_id in reversed(ids[start:end])],
+            "total_transactions": visible if include_total else None,
+            "next_cursor": encode_history_cursor(ids[start]) if start > 0 else None
+        }
+
+    def deposit_funds(self, db: Session | None, account_id: int, amount: d, description: str = None) -> TransactionSuccessResponse:
+        amount = d(amount).quantize(CENTS)
+        if amount <= 0:
+            raise ValueError("Deposit amount must be positive")
+
+        self._account(db, account_id)
+        txn_id, seq = self._post(DEPOSIT, account_id, 0, _cents(amount), description)
+        self.wal.wait(seq)
+
+        return TransactionSuccessResponse(
+            message="Deposit successful",
+            transaction=self._transaction(txn_id),
+            new_balance=_money(self.postings.balance_after[self.postings.row(txn_id)])
+        )
+
+    def withdraw_funds(self, db: Session | None, account_id: int, amount: d, description: str = None) -> TransactionSuccessResponse:
+        amount = d(amount).quantize(CENTS)
+        if amount <= 0:
+            raise ValueError("Withdrawal amount must be positive!")
+
+        self._account(db, account_id)
+        txn_id, seq = self._post(WITHDRAW, account_id, 0, _cents(amount), description)
+        self.wal.wait(seq)
+
+        return TransactionSuccessResponse(
+            message="Withdrawal successful!",
+            transaction=self._transaction(txn_id),
+            new_balance=_money(self.postings.balance_after[self.postings.row(txn_id)])
+        )
+
+    def transfer_funds(self, db: Session | None, from_account_id: int, to_account_id: int, amount: d, description: str = None) -> TransferSuccessResponse:
+        amount = d(amount).quantize(CENTS)
+        if amount <= 0:
+            raise ValueError("Amount has to be greater than zero")
+        if from_account_id == to_account_id:
+            raise ValueError("Cannot transfer to same account!")
+
+        self._account(db, from_account_id)
+        self._account(db, to_account_id)
+        txn_id, seq = self._post(TRANSFER, from_account_id, to_account_id, _cents(amount), description)
+        self.wal.wait(seq)
+
+        return TransferSuccessResponse(
+            message="Transfer successful",
+            from_account=AccountTransactionDetail(
+                account_id=from_account_id,
+                transaction=self._transaction(txn_id),
+                new_balance=_money(self.postings.balance_after[self.postings.row(txn_id)])
+            ),
+            to_account=AccountTransactionDetail(
+                account_id=to_account_id,
+                transaction=self._transaction(txn_id + 1),
+                new_balance=_money(self.postings.balance_after[self.postings.row(txn_id + 1)])
+            )
+        )
+
+    def transfer_by_account_number(self, db: Session | None, from_account_id: int, to_account_number: str, amount: d, description: str = None) -> TransferSuccessResponse:
+        to_account = self._account_by_number(db, to_account_number)
+        if not to_account:
+            raise ValueError(f"Account with account number {to_account_number} not found")
+        return self.transfer_funds(db, from_account_id, to_account.id, amount, description)
+
+    def post_transaction_batch(self, db: Session | None, operations: list[BatchOperation], chunk_size: int = 1000) -> dict:
+        """Apply the operations in order; one log wait covers the whole batch (chunk_size is not needed here)"""
+        for op in operations:
+            for account_id in (op.account_id, op.from_account_id, op.to_account_id):
+                if account_id is not None:
+                    self._account(db, account_id)
+
+        results = []
+        seq = 0
+        for index, op in enumerate(operations):
+            result = {"index": index, "status": "ok", "error": None, "transaction_ids": []}
+            try:
+                amount = _cents(d(op.amount).quantize(CENTS))
+                if amount <= 0:
+                    raise ValueError("Amount has to be greater than zero")
+                if op.operation == BatchOperationType.DEPOSIT:
+                    txn_id, seq = self._post(DEPOSIT, op.account_id, 0, amount, op.description)
+                    result["transaction_ids"] = [txn_id]
+                elif op.operation == BatchOperationType.WITHDRAW:
+                    txn_id, seq = self._post(WITHDRAW, op.account_id, 0, amount, op.description)
+                    result["transaction_ids"] = [txn_id]
+                else:
+                    if op.from_account_id == op.to_account_id:
+                        raise ValueError("Cannot transfer to same account!")
+                    txn_id, seq = self._post(TRANSFER, op.from_account_id, op.to_account_id, amount, op.description)
+                    result["transaction_ids"] = [txn_id, txn_id + 1]
+            except ValueError as e:
+                result["status"] = "failed"
+                result["error"] = str(e)
+            results.append(result)
+
+        if seq:
+            self.wal.wait(seq)
+
+        succeeded = sum(1 for result in results if result["status"] == "ok")
+
+        return {
+            "message": "Batch processed",
+            "succeeded": succeeded,
+            "failed": len(results) - succeeded,
+            "results": results
+        }
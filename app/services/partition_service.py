@@ -0,0 +1,144 @@
+from datetime import date, datetime
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+from app.database import engine as default_engine
+from app.models import Transaction
+from app.config import get_settings
+
+# Monthly range partitioning of transactions by created_at (PostgreSQL only).
+#
+# Each month lives in its own table, transactions_pYYYY_MM. Queries bounded on created_at
+# (statements, stats windows, balance-at) only scan the months they ask for, newest-first
+# history pages stop in the newest partitions, and archiving a month is DETACH + DROP of
+# one table instead of a DELETE over the whole history (see archive_service).
+#
+# What PostgreSQL asks of a partitioned table:
+#   - the primary key has to contain the partition key, so it becomes (id, created_at);
+#     ids still come from the one sequence
+#   - no foreign key can point at it, so related_transaction_id loses its self-reference
+# A row for a month without a partition lands in transactions_default; ensure_partitions()
+# moves such rows into the month's own table when it creates it.
+
+settings = get_settings()
+
+DEFAULT_PARTITION = "transactions_default"
+
+
+def month_start(value: date | datetime) -> date:
+    return date(value.year, value.month, 1)
+
+def add_months(month: date, count: int) -> date:
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+def partition_name(month: date) -> str:
+    return f"transactions_p{month:%Y_%m}"
+
+def is_partitioned(connection: Connection) -> bool:
+    if connection.dialect.name != "postgresql":
+        return False
+    return connection.execute(text("SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass('transactions')")).first() is not None
+
+def partition_months(connection: Connection) -> dict[date, str]:
+    """Month -> table of every monthly partition attached to transactions"""
+    names = connection.execute(text(
+        "SELECT child.relname FROM pg_inherits JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+        "WHERE pg_inherits.inhparent = to_regclass('transactions')"
+    )).scalars()
+    return {
+        datetime.strptime(name, "transactions_p%Y_%m").date(): name
+        for name in names if name != DEFAULT_PARTITION
+    }
+
+def _create_partition(connection: Connection, month: date):
+    name, start, end = partition_name(month), month, add_months(month, 1)
+    bounds = f"FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+    in_default = connection.execute(
+        text(f"SELECT 1 FROM {DEFAULT_PARTITION} WHERE created_at >= :start AND created_at < :end LIMIT 1"),
+        {"start": start, "end": end}
+    ).first()
+
+    if not in_default:
+        connection.execute(text(f"CREATE TABLE {name} PARTITION OF transactions FOR VALUES {bounds}"))
+        return
+
+    # Attaching refuses while the default partition still holds rows of the new range, so they move first
+    connection.execute(text(f"CREATE TABLE {name} (LIKE transactions INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+    connection.execute(
+        text(f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} WHERE created_at >= :start AND created_at < :end RETURNING *) INSERT INTO {name} SELECT * FROM moved"),
+        {"start": start, "end": end}
+    )
+    connection.execute(text(f"ALTER TABLE transactions ATTACH PARTITION {name} FOR VALUES {bounds}"))
+
+def _ensure_partitions(connection: Connection, months_ahead: int) -> list[str]:
+    existing = partition_months(connection)
+    # Months ahead so postings never fall through to the default partition, plus any month it already caught
+    wanted = {add_months(month_start(datetime.now()), offset) for offset in range(months_ahead + 1)}
+    wanted.update(
+        month_start(value) for value in
+        connection.execute(text(f"SELECT DISTINCT date_trunc('month', created_at) FROM {DEFAULT_PARTITION}")).scalars()
+    )
+
+    created = []
+    for month in sorted(wanted - set(existing)):
+        _create_partition(connection, month)
+        created.append(partition_name(month))
+    return created
+
+def ensure_partitions(engine: Engine = default_engine, months_ahead: int | None = None) -> list[str]:
+    """Create the partitions of the coming months (and of months caught by the default partition); returns their names"""
+    months_ahead = settings.TRANSACTION_PARTITION_MONTHS_AHEAD if months_ahead is None else months_ahead
+    with engine.begin() as connection:
+        if not is_partitioned(connection):
+            raise ValueError("transactions is not partitioned - run partition_transactions.py --convert first")
+        return _ensure_partitions(connection, months_ahead)
+
+def partition_transactions(engine: Engine = default_engine, months_ahead: int | None = None) -> list[str]:
+    """
+    Rebuild a plain transactions table as a monthly partitioned one, rows and id sequence
+    included, in one transaction (writers wait on the table lock until it commits).
+    Returns the partitions created.
+    """
+    months_ahead = settings.TRANSACTION_PARTITION_MONTHS_AHEAD if months_ahead is None else months_ahead
+    with engine.begin() as connection:
+        if connection.dialect.name != "postgresql":
+            raise ValueError(f"Partitioning transactions needs PostgreSQL, not {connection.dialect.name}")
+        if is_partitioned(connection):
+            raise ValueError("transactions is already partitioned")
+
+        connection.execute(text("LOCK TABLE transactions IN ACCESS EXCLUSIVE MODE"))
+        sequence = connection.execute(text("SELECT pg_get_serial_sequence('transactions', 'id')")).scalar()
+        first = connection.execute(text("SELECT MIN(created_at) FROM transactions")).scalar()
+
+        connection.execute(text("ALTER TABLE transactions RENAME TO transactions_unpartitioned"))
+        connection.execute(text(
+            "CREATE TABLE transactions (LIKE transactions_unpartitioned INCLUDING DEFAULTS INCLUDING CONSTRAINTS) "
+            "PARTITION BY RANGE (created_at)"
+        ))
+        connection.execute(text(f"CREATE TABLE {DEFAULT_PARTITION} PARTITION OF transactions DEFAULT"))
+
+        # Every month from the first transaction on, so the copy never touches the default partition
+        month, created = month_start(first or datetime.now()), []
+        while month < month_start(datetime.now()):
+            _create_partition(connection, month)
+            created.append(partition_name(month))
+            month = add_months(month, 1)
+        created += _ensure_partitions(connection, months_ahead)
+
+        connection.execute(text("INSERT INTO transactions SELECT * FROM transactions_unpartitioned"))
+
+        # The sequence belongs to the old table's id column and would be dropped with it
+        connection.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY NONE"))
+        connection.execute(text("DROP TABLE transactions_unpartitioned"))
+        connection.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY transactions.id"))
+
+        # Keys and indexes are built after the copy: once per partition, over the loaded rows
+        connection.execute(text("ALTER TABLE transactions ADD CONSTRAINT transactions_pkey PRIMARY KEY (id, created_at)"))
+        connection.execute(text(
+            "ALTER TABLE transactions ADD CONSTRAINT transactions_account_id_fkey "
+            "FOREIGN KEY (account_id) REFERENCES accounts (id) ON DELETE CASCADE"
+        ))
+        for index in Transaction.__table__.indexes:
+            index.create(connection)
+
+    return created
@@ -0,0 +1,47 @@
+from app.database import DbSession, run_db
+from app.services.balance_service import BalanceLayoutChanged
+from app.utils.db_errors import transient_error_kind
+from app.utils.metrics import Counter
+from app.config import get_settings
+import asyncio
+import random
+
+# Under contention the database aborts some locked postings (deadlock victim, serialization
+# failure, lock wait timeout). Nothing was committed, so the posting is simply run again after
+# a short jittered backoff instead of surfacing a 500. Sleeps are awaited, never blocking a thread.
+
+settings = get_settings()
+
+posting_retries = Counter("posting_retries_total", "Posting attempts retried after a transient lock failure, by operation and kind")
+posting_retries_exhausted = Counter("posting_retries_exhausted_total", "Postings that still failed after POSTING_RETRY_ATTEMPTS, by operation and kind")
+
+
+def retryable_kind(error: BaseException) -> str | None:
+    if isinstance(error, BalanceLayoutChanged):
+        return "balance_layout"
+    return transient_error_kind(error)
+
+def backoff_seconds(attempt: int) -> float:
+    # "Full jitter": uniform in [0, min(cap, base * 2^attempt)] so retrying workers spread out
+    ceiling = min(settings.POSTING_RETRY_MAX_DELAY_MS, settings.POSTING_RETRY_BASE_DELAY_MS * 2 ** attempt)
+    return random.uniform(0, ceiling) / 1000
+
+async def run_with_retry(db: DbSession, fn, *args, operation: str | None = None, **kwargs):
+    """run_db for posting functions: retried on deadlocks, serialization failures and lock timeouts"""
+    operation = operation or getattr(fn, "__name__", "posting")
+    attempt = 0
+    while True:
+        try:
+            return await run_db(db, fn, *args, **kwargs)
+        except Exception as e:
+            kind = retryable_kind(e)
+            if kind is None:
+                raise
+
+            attempt += 1
+            if attempt >= settings.POSTING_RETRY_ATTEMPTS:
+                posting_retries_exhausted.inc(operation=operation, kind=kind)
+                raise
+
+            posting_retries.inc(operation=operation, kind=kind)
+            await asyncio.sleep(backoff_seconds(attempt))
@@ -0,0 +1,270 @@
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import func
+from sqlalchemy import select, update, bindparam, text
+from app.models import User, Account, Transaction, TransactionType
+from app.services import generate_account_number, rebuild_daily_stats
+from app.services.import_service import write_rows, batched
+from app.utils import hash_password
+from decimal import Decimal as d
+from datetime import datetime
+import time
+
+try:
+    import numpy as np
+except ImportError:  # Only the simulation needs it: pip install numpy
+    np = None
+
+# Synthetic traffic: a customer population plus days of deposits, withdrawals and transfers.
+# Each day is drawn as NumPy arrays, checked in vectorized form so that no balance goes negative
+# at any point of the day, and written as bulk INSERTs with precomputed balance_after values and
+# transfer links - one set of array operations per day instead of one request per posting.
+
+# Operation mix (deposit, withdraw, transfer) and lognormal amount parameters in dollars (mu, sigma)
+DEFAULT_MIX = (0.35, 0.25, 0.40)
+AMOUNTS = ((5.0, 0.8), (4.0, 0.9), (3.8, 1.0))
+OPENING_BALANCE = (6.5, 0.7)
+
+DEPOSIT, WITHDRAW, TRANSFER = 0, 1, 2
+
+
+class SimulationStats:
+    def __init__(self):
+        self.drawn = 0
+        self.posted = 0
+        self.rejected = 0
+        self.transactions = 0
+        self.validate_seconds = 0.0
+        self.started = time.perf_counter()
+
+    def report(self, day: datetime):
+        elapsed = time.perf_counter() - self.started
+        print(
+            f"  {day:%Y-%m-%d}: {self.posted} postings ({self.rejected} rejected for funds), "
+            f"{self.posted / elapsed if elapsed else 0:.0f} postings/s overall", flush=True
+        )
+
+
+def _require_numpy():
+    if np is None:
+        raise RuntimeError("The simulation needs NumPy - pip install numpy")
+
+def _money(cents: int) -> d:
+    return d(cents).scaleb(-2)
+
+def _next_transaction_id(db: Session) -> int:
+    # Rows are written with explicit ids so transfer legs can point at each other without a read back
+    return (db.query(func.max(Transaction.id)).scalar() or 0) + 1
+
+def _continue_id_sequence(db: Session):
+    # PostgreSQL's serial sequence doesn't see explicit ids; MySQL and SQLite continue after MAX(id) on their own
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(text("SELECT setval(pg_get_serial_sequence('transactions', 'id'), (SELECT MAX(id) FROM transactions))"))
+
+def create_population(db: Session, customers: int, rng, batch_size: int = 5000) -> tuple:
+    """Insert customers, each with one (empty) account. Returns (account ids, account numbers, opening balances in cents)"""
+    run = int(time.time())
+    hashed = hash_password("simulation")  # One bcrypt for the whole population
+    account_ids, numbers = [], []
+
+    for batch in batched(range(customers), batch_size):
+        emails = [f"sim{run}-{i}@example.com" for i in batch]
+        # Reserved before this batch's writes: the allocator commits in its own transaction
+        batch_numbers = [generate_account_number() for _ in batch]
+
+        write_rows(db, User.__table__, [
+            {"name": f"Customer {i}", "email": email, "hashed_password": hashed}
+            for i, email in zip(batch, emails)
+        ])
+        user_ids = dict(db.execute(select(User.email, User.id).where(User.email.in_(emails))).all())
+
+        write_rows(db, Account.__table__, [
+            {"user_id": user_ids[email], "account_number": number, "balance": d("0.00"), "balance_shards": 0}
+            for email, number in zip(emails, batch_numbers)
+        ])
+        ids = dict(db.execute(select(Account.account_number, Account.id).where(Account.account_number.in_(batch_numbers))).all())
+        account_ids.extend(ids[number] for number in batch_numbers)
+        numbers.extend(batch_numbers)
+        db.commit()
+
+    opening = (rng.lognormal(*OPENING_BALANCE, customers) * 100).astype(np.int64)
+    return np.array(account_ids, dtype=np.int64), numbers, opening
+
+def draw_day(rng, customers: int, postings: int, activity, day_start: float, mix=DEFAULT_MIX) -> dict:
+    """One day of operations as arrays, in time order. activity weights how often each customer acts"""
+    kinds = rng.choice(3, size=postings, p=mix)
+    src = rng.choice(customers, size=postings, p=activity)
+    dst = rng.choice(customers, size=postings, p=activity)
+    same = dst == src
+    dst[same] = (dst[same] + 1) % customers
+
+    mu = np.array([mu for mu, _ in AMOUNTS])[kinds]
+    sigma = np.array([sigma for _, sigma in AMOUNTS])[kinds]
+    amounts = np.maximum(rng.lognormal(mu, sigma) * 100, 1).astype(np.int64)
+
+    return {
+        "kind": kinds,
+        "src": src,
+        "dst": dst,
+        "amount": amounts,
+        "at": day_start + np.sort(rng.uniform(0, 86400, postings))
+    }
+
+def _legs(day: dict) -> dict:
+    """Expand operations into per-account legs (a transfer is a debit leg then a credit leg), in time order"""
+    kinds = day["kind"]
+    per_operation = np.where(kinds == TRANSFER, 2, 1)
+    operation = np.repeat(np.arange(len(kinds)), per_operation)
+    second = np.zeros(len(operation), dtype=bool)
+    second[1:] = operation[1:] == operation[:-1]
+
+    leg_kind = kinds[operation]
+    credit = (leg_kind == DEPOSIT) | second
+    amount = day["amount"][operation]
+
+    return {
+        "operation": operation,
+        "account": np.where(second, day["dst"][operation], day["src"][operation]),
+        "credit": credit,
+        "delta": np.where(credit, amount, -amount)
+    }
+
+def validate_day(balances, legs: dict) -> tuple:
+    """
+    Accept operations so that no account's running balance dips below zero during the day.
+    Each round rejects, for every account, the first operation that overdraws it, and re-runs
+    the grouped running sums without it (a rejected transfer also loses its credit leg). Returns
+    (accepted operation mask, running balance after each leg).
+    """
+    operation_count = legs["operation"].max() + 1 if len(legs["operation"]) else 0
+    accepted = np.ones(operation_count, dtype=bool)
+
+    # Legs grouped by account, time order kept within each account
+    order = np.argsort(legs["account"], kind="stable")
+    account = legs["account"][order]
+    operation = legs["operation"][order]
+    delta = legs["delta"][order]
+
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = account[1:] != account[:-1]
+    group_start = np.maximum.accumulate(np.where(first, np.arange(len(order)), 0))
+
+    while True:
+        live = np.where(accepted[operation], delta, 0)
+        totals = np.cumsum(live)
+        running = balances[account] + totals - totals[group_start] + live[group_start]
+
+        overdrawn = np.flatnonzero(running < 0)
+        if not len(overdrawn):
+            break
+        # The first overdraft of each account is always a debit; later ones may clear once it is gone
+        _, first_per_account = np.unique(account[overdrawn], return_index=True)
+        accepted[operation[overdrawn[first_per_account]]] = False
+
+    balance_after = np.empty(len(order), dtype=np.int64)
+    balance_after[order] = running
+    return accepted, balance_after
+
+def write_day(db: Session, day: dict, legs: dict, accepted, balance_after, account_ids, numbers: list[str], next_id: int, batch_size: int = 20000) -> int:
+    """Bulk insert the accepted legs as transactions with explicit ids; returns the next free id"""
+    keep = accepted[legs["operation"]]
+    operation = legs["operation"][keep]
+    ids = np.arange(next_id, next_id + len(operation))
+
+    # Transfer legs are adjacent: the debit leg links to the id after it, the credit leg to the one before
+    is_transfer = day["kind"][operation] == TRANSFER
+    credit = legs["credit"][keep]
+    related = np.where(is_transfer, np.where(credit, ids - 1, ids + 1), 0)
+
+    src_numbers = [numbers[i] for i in day["src"][operation].tolist()]
+    dst_numbers = [numbers[i] for i in day["dst"][operation].tolist()]
+
+    rows = []
+    for txn_id, account, is_credit, amount, after, linked, kind, at, src_number, dst_number in zip(
+        ids.tolist(), account_ids[legs["account"][keep]].tolist(), credit.tolist(), np.abs(legs["delta"][keep]).tolist(),
+        balance_after[keep].tolist(), related.tolist(), day["kind"][operation].tolist(), day["at"][operation].tolist(),
+        src_numbers, dst_numbers
+    ):
+        if kind == TRANSFER:
+            description = f"Transfer from account {src_number}" if is_credit else f"Transfer to account {dst_number}"
+        else:
+            description = "Deposit" if kind == DEPOSIT else "Withdrawal"
+
+        rows.append({
+            "id": txn_id,
+            "account_id": account,
+            "transaction_type": TransactionType.CREDIT if is_credit else TransactionType.DEBIT,
+            "amount": _money(amount),
+            "balance_after": _money(after),
+            "related_transaction_id": linked or None,
+            "description": description,
+            "created_at": datetime.fromtimestamp(at)
+        })
+
+    for batch in batched(rows, batch_size):
+        write_rows(db, Transaction.__table__, batch)
+
+    return next_id + len(rows)
+
+def _opening_day(customers: int, opening, day_start: float) -> dict:
+    # Opening balances are ordinary deposits at the start of the first day
+    funded = np.flatnonzero(opening > 0)
+    return {
+        "kind": np.full(len(funded), DEPOSIT),
+        "src": funded,
+        "dst": funded,
+        "amount": opening[funded],
+        "at": np.full(len(funded), day_start)
+    }
+
+def _store_balances(db: Session, account_ids, balances, touched):
+    statement = update(Account.__table__).where(Account.__table__.c.id == bindparam("account")).values(balance=bindparam("new_balance"))
+    db.execute(statement, [
+        {"account": account, "new_balance": _money(balance)}
+        for account, balance in zip(account_ids[touched].tolist(), balances[touched].tolist())
+    ])
+
+def simulate(db: Session, customers: int = 1000, days: int = 7, postings_per_day: int = 10000, start: datetime | None = None, seed: int | None = None, mix=DEFAULT_MIX) -> SimulationStats:
+    """Create a population and post `days` days of synthetic traffic, committing day by day"""
+    _require_numpy()
+    if customers < 2:
+        raise ValueError("The simulation needs at least 2 customers")
+
+    rng = np.random.default_rng(seed)
+    stats = SimulationStats()
+    start = start or datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+
+    print(f"Creating {customers} customers..")
+    account_ids, numbers, opening = create_population(db, customers, rng)
+    balances = np.zeros(customers, dtype=np.int64)
+    activity = rng.lognormal(0, 1, customers)
+    activity /= activity.sum()
+
+    next_id = _next_transaction_id(db)
+    for day_number in range(days + 1):
+        day_start = start.timestamp() + max(day_number - 1, 0) * 86400
+        day = _opening_day(customers, opening, day_start) if day_number == 0 else draw_day(rng, customers, postings_per_day, activity, day_start, mix)
+
+        started = time.perf_counter()
+        legs = _legs(day)
+        accepted, balance_after = validate_day(balances, legs)
+        stats.validate_seconds += time.perf_counter() - started
+
+        live = accepted[legs["operation"]]
+        np.add.at(balances, legs["account"][live], legs["delta"][live])
+
+        next_id = write_day(db, day, legs, accepted, balance_after, account_ids, numbers, next_id)
+        _store_balances(db, account_ids, balances, np.unique(legs["account"][live]))
+        _continue_id_sequence(db)
+        db.commit()
+
+        stats.transactions += int(live.sum())
+        if day_number:
+            stats.drawn += len(accepted)
+            stats.posted += int(accepted.sum())
+            stats.rejected += int((~accepted).sum())
+            stats.report(datetime.fromtimestamp(day_start))
+
+    print("Rebuilding daily account stats..")
+    rebuild_daily_stats(db)
+
+    return stats
@@ -1,8 +1,15 @@
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime, timedelta
 from typing import Optional
+from fastapi.concurrency import run_in_threadpool
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from app.config import get_settings
+from app.utils.metrics import Gauge, Histogram
+import asyncio
+import multiprocessing
+import time
 
 settings = get_settings()
 
@@ -33,6 +40,64 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
         plain_password = plain_password[:20]
         return pwd_context.verify(plain_password, hashed_password)
 
+class PasswordHasherBusy(Exception):
+    """Raised when the password hashing queue is full - surfaced as 429 by the auth routes"""
+
+
+# Dedicated pool so bcrypt bursts on login/register don't pin the request threadpool
+_hash_pool = None
+_hash_in_flight = 0
+
+password_hash_queue_depth = Gauge("password_hash_queue_depth", "Password hash jobs waiting for a free worker")
+password_hash_seconds = Histogram("password_hash_seconds", "Password hash/verify latency including queueing")
+
+def _get_hash_pool() -> ProcessPoolExecutor | None:
+    global _hash_pool
+    if _hash_pool is None and settings.PASSWORD_HASH_WORKERS > 0:
+        # spawn, not fork: the parent holds DB pools and threads that must not be copied
+        _hash_pool = ProcessPoolExecutor(
+            max_workers=settings.PASSWORD_HASH_WORKERS,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _hash_pool
+
+async def _run_password_job(operation: str, fn, *args):
+    global _hash_in_flight
+    workers = max(settings.PASSWORD_HASH_WORKERS, 1)
+
+    # Back-pressure: refuse new work instead of letting logins queue without bound
+    if _hash_in_flight >= workers + settings.PASSWORD_HASH_QUEUE_SIZE:
+        raise PasswordHasherBusy("Too many concurrent sign-in requests, please retry shortly")
+
+    _hash_in_flight += 1
+    password_hash_queue_depth.set(max(_hash_in_flight - workers, 0))
+    started = time.perf_counter()
+    try:
+        pool = _get_hash_pool()
+        if pool is None:
+            return await run_in_threadpool(fn, *args)
+        return await asyncio.get_running_loop().run_in_executor(pool, fn, *args)
+    except BrokenProcessPool:
+        # A worker died (OOM kill etc.) - drop the pool so the next request starts a fresh one
+        shutdown_password_hasher()
+        raise
+    finally:
+        _hash_in_flight -= 1
+        password_hash_queue_depth.set(max(_hash_in_flight - workers, 0))
+        password_hash_seconds.observe(time.perf_counter() - started, operation=operation)
+
+async def hash_password_async(password: str) -> str:
+    return await _run_password_job("hash", hash_password, password)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await _run_password_job("verify", verify_password, plain_password, hashed_password)
+
+def shutdown_password_hasher():
+    global _hash_pool
+    if _hash_pool is not None:
+        _hash_pool.shutdown(wait=False, cancel_futures=True)
+        _hash_pool = None
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
 
     to_encode = data.copy()
@@ -0,0 +1,34 @@
+# Classifies driver errors that mean "the transaction lost a lock race and can be retried"
+# across the supported backends, from the SQLSTATE / error number rather than the message.
+
+# PostgreSQL SQLSTATEs (psycopg2 pgcode, asyncpg sqlstate)
+_PG_CODES = {
+    "40P01": "deadlock",
+    "40001": "serialization",
+    "55P03": "lock_timeout",  # lock_not_available (lock_timeout / NOWAIT)
+}
+
+# MySQL / MariaDB error numbers (pymysql and aiomysql put them in args[0])
+_MYSQL_CODES = {
+    1213: "deadlock",  # ER_LOCK_DEADLOCK
+    1205: "lock_timeout",  # ER_LOCK_WAIT_TIMEOUT
+}
+
+
+def transient_error_kind(error: BaseException) -> str | None:
+    """'deadlock', 'serialization' or 'lock_timeout' for a retryable lock failure, else None"""
+    orig = getattr(error, "orig", None) or error
+
+    code = getattr(orig, "pgcode", None) or getattr(orig, "sqlstate", None)
+    if code in _PG_CODES:
+        return _PG_CODES[code]
+
+    args = getattr(orig, "args", ())
+    if args and isinstance(args[0], int) and args[0] in _MYSQL_CODES:
+        return _MYSQL_CODES[args[0]]
+
+    # SQLite reports its writer lock only through the message
+    if type(orig).__name__ == "OperationalError" and "database is locked" in str(orig):
+        return "lock_timeout"
+
+    return None
@@ -0,0 +1,154 @@
+import time
+from sqlalchemy import event, exc
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+from app.utils.metrics import Counter, Gauge, Histogram, register_collector, request_db_seconds
+from app.utils.db_errors import transient_error_kind
+from app.config import get_settings
+
+# Connection pool setup shared by every engine in app.database: sizing and timeouts from
+# Settings, the liveness strategy, and pool metrics labelled by engine name
+# (primary / replica / async / async_replica), so pools can be sized against the worker count.
+
+settings = get_settings()
+
+WAIT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+pool_size = Gauge("db_pool_size", "Configured persistent connections per pool")
+pool_checked_out = Gauge("db_pool_checked_out", "Connections currently checked out of the pool")
+pool_overflow = Gauge("db_pool_overflow", "Connections open beyond pool_size (negative = unused persistent slots)")
+pool_wait_seconds = Histogram("db_pool_wait_seconds", "Time spent waiting for a pooled connection", buckets=WAIT_BUCKETS)
+pool_timeouts = Counter("db_pool_timeouts_total", "Checkouts that gave up after DB_POOL_TIMEOUT")
+pool_connects = Counter("db_pool_connections_total", "New database connections opened")
+pool_invalidations = Counter("db_pool_invalidations_total", "Connections discarded as dead or broken")
+transient_errors = Counter("db_transient_errors_total", "Deadlocks, serialization failures and lock timeouts, by kind")
+
+
+class _TimedCheckout:
+    metrics_name = "primary"
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            pool_timeouts.inc(pool=self.metrics_name)
+            raise
+        finally:
+            pool_wait_seconds.observe(time.perf_counter() - started, pool=self.metrics_name)
+
+    def recreate(self):
+        # engine.dispose() swaps in a fresh pool; keep its label
+        pool = super().recreate()
+        pool.metrics_name = self.metrics_name
+        return pool
+
+class TimedQueuePool(_TimedCheckout, QueuePool):
+    pass
+
+class TimedAsyncQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    pass
+
+
+def engine_options(url: str, is_async: bool = False) -> dict:
+    """create_engine / create_async_engine keyword arguments for the configured pool"""
+    options = {
+        "echo": settings.DEBUG,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_LIVENESS == "pre_ping"
+    }
+
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "sqlite" and parsed.database in (None, "", ":memory:"):
+        # In-memory SQLite keeps its single-connection pool
+        return options
+
+    options.update(
+        poolclass=TimedAsyncQueuePool if is_async else TimedQueuePool,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT
+    )
+    return options
+
+def _set_statement_timeout(dialect_name: str, dbapi_connection):
+    milliseconds = settings.DB_STATEMENT_TIMEOUT_MS
+    if dialect_name == "postgresql":
+        statement = f"SET statement_timeout = {milliseconds}"
+    elif dialect_name == "mysql":
+        statement = f"SET SESSION max_execution_time = {milliseconds}"  # Applies to SELECTs only
+    else:
+        return
+
+    cursor = dbapi_connection.cursor()
+    cursor.execute(statement)
+    cursor.close()
+    # Committed so the pool's rollback-on-checkin does not undo it
+    dbapi_connection.commit()
+
+def instrument_engine(engine: Engine, name: str) -> Engine:
+    """Attach statement timeouts, the idle liveness check and pool/query metrics. Pass async_engine.sync_engine for async engines"""
+    if isinstance(engine.pool, _TimedCheckout):
+        engine.pool.metrics_name = name
+
+    @register_collector
+    def sample_pool():
+        pool = engine.pool
+        if isinstance(pool, QueuePool):
+            pool_size.set(pool.size(), pool=name)
+            pool_checked_out.set(pool.checkedout(), pool=name)
+            pool_overflow.set(pool.overflow(), pool=name)
+
+    @event.listens_for(engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        pool_connects.inc(pool=name)
+        if settings.DB_STATEMENT_TIMEOUT_MS:
+            _set_statement_timeout(engine.dialect.name, dbapi_connection)
+
+    @event.listens_for(engine, "checkout")
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        if settings.DB_POOL_LIVENESS == "idle":
+            # Ping only connections that sat idle long enough to have been dropped by the
+            # server or a proxy, instead of a round trip on every checkout
+            idle = time.monotonic() - connection_record.info.get("checked_in_at", time.monotonic())
+            if idle > settings.DB_POOL_IDLE_PING_SECONDS:
+                try:
+                    alive = engine.dialect.do_ping(dbapi_connection)
+                except Exception:
+                    alive = False
+                if not alive:
+                    # The pool discards this connection and retries the checkout with a fresh one
+                    raise exc.DisconnectionError()
+
+    @event.listens_for(engine, "checkin")
+    def on_checkin(dbapi_connection, connection_record):
+        connection_record.info["checked_in_at"] = time.monotonic()
+
+    @event.listens_for(engine, "invalidate")
+    def on_invalidate(dbapi_connection, connection_record, exception):
+        pool_invalidations.inc(pool=name)
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_execute(conn, cursor, statement, parameters, context, executemany):
+        if request_db_seconds.get() is not None:
+            conn.info.setdefault("statement_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_execute(conn, cursor, statement, parameters, context, executemany):
+        accumulated = request_db_seconds.get()
+        if accumulated is not None:
+            accumulated[0] += time.perf_counter() - conn.info["statement_started"].pop()
+
+    @event.listens_for(engine, "handle_error")
+    def on_error(context):
+        # A failed statement never reaches after_cursor_execute
+        accumulated = request_db_seconds.get()
+        started = context.connection.info.get("statement_started") if context.connection is not None else None
+        if accumulated is not None and started:
+            accumulated[0] += time.perf_counter() - started.pop()
+
+        kind = transient_error_kind(context.original_exception)
+        if kind:
+            transient_errors.inc(kind=kind)
+
+    return engine
@@ -0,0 +1,192 @@
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session
+from app.database import Base, engine as default_engine, SessionLocal
+import app.models  # noqa: F401 - registers every table on Base.metadata
+
+# Dialect-aware reset and fixture snapshots for PostgreSQL, MySQL and SQLite.
+#
+# A snapshot copies every app table into a snapshot__<table> table on the same server. Restoring
+# it is then one server-side transaction (clear every table, INSERT ... SELECT back from the
+# copies) instead of a re-seed through the API, and pooled connections stay usable - unlike
+# restoring a template database, which means dropping the database under every open connection.
+# On MySQL, where TRUNCATE and ALTER TABLE commit on their own, the rows are DELETEd in that
+# transaction and the auto-increment counters are rewound after it commits.
+#
+# As a pytest plugin (pytest_plugins = ["app.utils.db_reset"] in conftest.py) it provides:
+#   db_seed     - session-scoped, override it to return fn(session) that loads the fixture dataset
+#   db_snapshot - the seeded dataset, snapshotted once per test session
+#   db          - a Session; the dataset is restored after each test
+#   client      - a TestClient for the app; the dataset is restored after each test
+
+SNAPSHOT_PREFIX = "snapshot__"
+
+
+def app_tables(engine: Engine) -> list:
+    """The app's tables that exist in the database, parents before children"""
+    present = set(inspect(engine).get_table_names())
+    return [table for table in Base.metadata.sorted_tables if table.name in present]
+
+def _quote(connection: Connection, name: str) -> str:
+    return connection.dialect.identifier_preparer.quote(name)
+
+def _clear_tables(connection: Connection, tables: list, transactional: bool = False):
+    """
+    Delete every row and restart the id counters. With transactional=True MySQL only deletes,
+    so the caller's transaction stays open; rewind its counters with _rewind_auto_increments.
+    """
+    names = [_quote(connection, table.name) for table in tables]
+    dialect = connection.dialect.name
+
+    if dialect == "postgresql":
+        connection.execute(text(f"TRUNCATE TABLE {', '.join(names)} RESTART IDENTITY CASCADE"))
+    elif dialect == "mysql":
+        # TRUNCATE refuses tables referenced by foreign keys, and parents-first DELETEs trip them, unless the checks are off
+        connection.execute(text("SET FOREIGN_KEY_CHECKS = 0"))
+        try:
+            for name in names:
+                # TRUNCATE commits implicitly; DELETE keeps the counters but stays in the transaction
+                connection.execute(text(f"DELETE FROM {name}" if transactional else f"TRUNCATE TABLE {name}"))
+        finally:
+            connection.execute(text("SET FOREIGN_KEY_CHECKS = 1"))
+    else:
+        for name in reversed(names):
+            connection.execute(text(f"DELETE FROM {name}"))
+        if connection.execute(text("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_sequence'")).first():
+            connection.execute(text("DELETE FROM sqlite_sequence"))
+
+def _restart_sequences(connection: Connection, tables: list):
+    # Rows come back with their ids, so each serial sequence must continue after the largest one
+    for table in tables:
+        column = table.autoincrement_column
+        if column is None:
+            continue
+        name, column_name = _quote(connection, table.name), _quote(connection, column.name)
+        connection.execute(
+            text(f"SELECT setval(pg_get_serial_sequence(:table, :column), COALESCE(MAX({column_name}), 1), MAX({column_name}) IS NOT NULL) FROM {name}"),
+            {"table": table.name, "column": column.name}
+        )
+
+def _rewind_auto_increments(connection: Connection, tables: list):
+    # Each ALTER commits on its own; InnoDB raises a value below MAX(id) + 1 to exactly that
+    for table in tables:
+        if table.autoincrement_column is not None:
+            connection.execute(text(f"ALTER TABLE {_quote(connection, table.name)} AUTO_INCREMENT = 1"))
+
+def reset_tables(engine: Engine = default_engine):
+    """Delete all data and reset auto-increment counters, on any supported backend"""
+    with engine.begin() as connection:
+        _clear_tables(connection, app_tables(engine))
+
+def clear_cached_state():
+    """Forget per-process caches that would otherwise outlive the rows they describe"""
+    from app.services import _account_number_block
+    from app.services.account_cache_service import clear_account_cache
+    from app.services.auth_service import _principal_cache
+    from app.services.balance_service import _shard_counts
+    from app.services.idempotency_service import _recent_responses
+
+    _principal_cache.clear()
+    _shard_counts.clear()
+    _recent_responses.clear()
+    clear_account_cache()
+    # The restored allocator row may hand out this block's numbers again
+    _account_number_block.update(next=0, end=0)
+
+
+class DatabaseSnapshot:
+    """Copy of the app tables kept next to them on the same server, restorable in one transaction"""
+
+    def __init__(self, engine: Engine, tables: list):
+        self.engine = engine
+        self.tables = tables
+
+    @classmethod
+    def take(cls, engine: Engine = default_engine) -> "DatabaseSnapshot":
+        tables = app_tables(engine)
+        with engine.begin() as connection:
+            for table in tables:
+                name, copy = _quote(connection, table.name), _quote(connection, SNAPSHOT_PREFIX + table.name)
+                connection.execute(text(f"DROP TABLE IF EXISTS {copy}"))
+                connection.execute(text(f"CREATE TABLE {copy} AS SELECT * FROM {name}"))
+        return cls(engine, tables)
+
+    @classmethod
+    def existing(cls, engine: Engine = default_engine) -> "DatabaseSnapshot | None":
+        """The snapshot left by an earlier take(), if every table has its copy"""
+        present = set(inspect(engine).get_table_names())
+        tables = app_tables(engine)
+        if not tables or any(SNAPSHOT_PREFIX + table.name not in present for table in tables):
+            return None
+        return cls(engine, tables)
+
+    def restore(self):
+        with self.engine.begin() as connection:
+            dialect = connection.dialect.name
+            _clear_tables(connection, self.tables, transactional=True)
+            for table in self.tables:
+                name, copy = _quote(connection, table.name), _quote(connection, SNAPSHOT_PREFIX + table.name)
+                columns = ", ".join(_quote(connection, column.name) for column in table.columns)
+                connection.execute(text(f"INSERT INTO {name} ({columns}) SELECT {columns} FROM {copy}"))
+            if dialect == "postgresql":
+                _restart_sequences(connection, self.tables)
+
+        if dialect == "mysql":
+            # Outside the data transaction: only the counters are left to put back
+            with self.engine.connect() as connection:
+                _rewind_auto_increments(connection, self.tables)
+        clear_cached_state()
+
+    def drop(self):
+        with self.engine.begin() as connection:
+            for table in self.tables:
+                connection.execute(text(f"DROP TABLE IF EXISTS {_quote(connection, SNAPSHOT_PREFIX + table.name)}"))
+
+
+try:
+    import pytest
+except ImportError:  # Only test runs need the fixtures
+    pytest = None
+
+if pytest:
+    @pytest.fixture(scope="session")
+    def db_seed():
+        """Override to return fn(session) that loads the fixture dataset; committed by the caller"""
+        return None
+
+    @pytest.fixture(scope="session")
+    def db_snapshot(db_seed):
+        Base.metadata.create_all(bind=default_engine)
+        reset_tables(default_engine)
+        if db_seed:
+            session = SessionLocal()
+            try:
+                db_seed(session)
+                session.commit()
+            finally:
+                session.close()
+
+        snapshot = DatabaseSnapshot.take(default_engine)
+        clear_cached_state()
+        yield snapshot
+        snapshot.drop()
+
+    @pytest.fixture
+    def db(db_snapshot) -> Session:
+        session = SessionLocal()
+        try:
+            yield session
+        finally:
+            session.close()
+            db_snapshot.restore()
+
+    @pytest.fixture
+    def client(db_snapshot):
+        from fastapi.testclient import TestClient
+        from app.main import app
+
+        # Not entered as a context manager: the app's shutdown handlers would stop shared workers after every test
+        try:
+            yield TestClient(app)
+        finally:
+            db_snapshot.restore()
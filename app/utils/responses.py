@@ -0,0 +1,21 @@
+from typing import Any, Optional
+from fastapi.responses import JSONResponse, Response
+from pydantic import BaseModel
+from pydantic_core import to_json
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse encoded by pydantic-core (Rust) instead of json.dumps - the app's default response class"""
+
+    def render(self, content: Any) -> bytes:
+        return to_json(content)
+
+
+def model_response(model: BaseModel, status_code: int = 200, headers: Optional[dict] = None) -> Response:
+    """
+    An already-built response model, straight to JSON bytes in one pydantic-core pass.
+    FastAPI passes a Response through untouched, so the model isn't dumped to a dict,
+    re-validated against response_model and encoded a second time. The route's
+    response_model still documents the body in OpenAPI.
+    """
+    return Response(model.model_dump_json(), status_code=status_code, headers=headers, media_type="application/json")
@@ -0,0 +1,35 @@
+import argparse
+from datetime import datetime
+from app.database import SessionLocal
+from app.services.archive_service import archive_transactions, archive_cutoff
+from app.config import get_settings
+
+# Moves cold months of transactions into Parquet files in TRANSACTION_ARCHIVE_DIR (needs pyarrow: pip install pyarrow).
+# Run monthly, after snapshot_balances.py:
+#   python archive_transactions.py                 -> keep the last TRANSACTION_ARCHIVE_AFTER_MONTHS months in the database
+#   python archive_transactions.py --keep-months 3 -> keep the current month and the two before it
+#   python archive_transactions.py --before 2025-01 -> archive every month before 2025-01
+# Archived months stay readable by statement exports and balance-at; history pages only list the database
+
+def main():
+    settings = get_settings()
+    parser = argparse.ArgumentParser(description="Archive transactions older than a horizon into Parquet files")
+    parser.add_argument("--keep-months", type=int, default=settings.TRANSACTION_ARCHIVE_AFTER_MONTHS, help="Months kept in the database, the current one included")
+    parser.add_argument("--before", type=lambda value: datetime.strptime(value, "%Y-%m"), help="Archive every month before this one, YYYY-MM (overrides --keep-months)")
+    args = parser.parse_args()
+
+    cutoff = args.before or archive_cutoff(keep_months=args.keep_months)
+    print(f"Archiving transactions created before {cutoff:%Y-%m-%d} into {settings.TRANSACTION_ARCHIVE_DIR}/..")
+
+    db = SessionLocal()
+    try:
+        archived = archive_transactions(db, cutoff)
+    finally:
+        db.close()
+
+    for month, count in archived.items():
+        print(f"  {month:%Y-%m}: {count} transactions")
+    print(f"Archived {sum(archived.values())} transactions from {len(archived)} months")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,14 @@
+import os
+import tempfile
+
+
+def use_bench_database(name: str) -> str:
+    """
+    Point the app at BENCH_DATABASE_URL, else a throwaway SQLite file. Call before importing app:
+    benchmarks drop and recreate the schema, so an inherited DATABASE_URL is never used.
+    """
+    url = os.environ.get("BENCH_DATABASE_URL") or f"sqlite:///{tempfile.mkdtemp()}/{name}.db"
+    os.environ["DATABASE_URL"] = url
+    os.environ["READ_REPLICA_URL"] = ""
+    os.environ.setdefault("SECRET_KEY", "benchmark")
+    return url
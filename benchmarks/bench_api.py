@@ -0,0 +1,205 @@
+"""
+Load test for the banking API, run in-process through an ASGI client.
+
+    python -m benchmarks.bench_api --users 1000 --transactions 20000 --requests 5000 --concurrency 32
+
+Seeds users/accounts/transactions straight into the database, then replays a
+weighted mix of register/login/deposit/withdraw/transfer/history/stats calls
+against app.main:app and prints p50/p95/p99 latency and throughput per endpoint.
+Drops and recreates the schema of BENCH_DATABASE_URL, or of a throwaway SQLite file
+without it; DATABASE_URL is ignored, so a dev or staging database is never touched.
+"""
+import argparse
+import asyncio
+import random
+import time
+from collections import defaultdict
+from decimal import Decimal
+
+from benchmarks import use_bench_database
+
+use_bench_database("bench_api")
+
+BENCH_PASSWORD = "benchpass"
+
+# Relative weights of each call in the replayed traffic
+DEFAULT_MIX = {
+    "register": 2,
+    "login": 5,
+    "deposit": 20,
+    "withdraw": 15,
+    "transfer": 20,
+    "history": 25,
+    "stats": 13,
+}
+
+
+def seed(users: int, transactions: int, rng: random.Random) -> list[int]:
+    from sqlalchemy import insert
+    from app.database import engine, Base, SessionLocal
+    from app.models import User, Account, Transaction, TransactionType
+    from app.services import generate_account_number, rebuild_daily_stats
+    from app.utils import hash_password
+
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+
+    # One bcrypt hash shared by every seeded user keeps seeding fast
+    hashed = hash_password(BENCH_PASSWORD)
+    account_numbers = [generate_account_number() for _ in range(users)]
+
+    with engine.begin() as conn:
+        user_ids = conn.execute(
+            insert(User).returning(User.id, sort_by_parameter_order=True),
+            [{"name": f"Bench User {i}", "email": f"user{i}@example.com", "hashed_password": hashed} for i in range(users)]
+        ).scalars().all()
+
+        balances = [Decimal("0.00")] * users
+        rows = []
+        for _ in range(transactions):
+            index = rng.randrange(users)
+            amount = Decimal(rng.randint(100, 50000)) / 100
+            balances[index] += amount
+            rows.append({"index": index, "amount": amount, "balance_after": balances[index]})
+
+        account_ids = conn.execute(
+            insert(Account).returning(Account.id, sort_by_parameter_order=True),
+            [{"user_id": user_id, "account_number": account_numbers[i], "balance": balances[i]} for i, user_id in enumerate(user_ids)]
+        ).scalars().all()
+
+        if rows:
+            conn.execute(insert(Transaction), [
+                {
+                    "account_id": account_ids[row["index"]],
+                    "transaction_type": TransactionType.CREDIT,
+                    "amount": row["amount"],
+                    "balance_after": row["balance_after"],
+                    "description": "Seed deposit"
+                }
+                for row in rows
+            ])
+
+    db = SessionLocal()
+    try:
+        rebuild_daily_stats(db)
+    finally:
+        db.close()
+
+    return list(account_ids)
+
+
+def percentile(sorted_values: list[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+async def replay(account_ids: list[int], users: int, total_requests: int, concurrency: int, mix: dict, rng: random.Random):
+    import httpx
+    from app.main import app
+
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    plan = rng.choices(names, weights=weights, k=total_requests)
+    registered = [0]
+
+    def request_for(name: str):
+        account_id = rng.choice(account_ids)
+        if name == "register":
+            registered[0] += 1
+            return "POST", "/api/v1/auth/register", {
+                "name": "Load Test", "email": f"new{registered[0]}-{rng.random()}@example.com",
+                "password": BENCH_PASSWORD, "initial_deposit": 100
+            }
+        if name == "login":
+            return "POST", "/api/v1/auth/login", {"email": f"user{rng.randrange(users)}@example.com", "password": BENCH_PASSWORD}
+        if name == "deposit":
+            return "POST", "/api/v1/transactions/deposit", {"account_id": account_id, "amount": 25}
+        if name == "withdraw":
+            return "POST", "/api/v1/transactions/withdraw", {"account_id": account_id, "amount": 5}
+        if name == "transfer":
+            to_account_id = rng.choice(account_ids)
+            while to_account_id == account_id and len(account_ids) > 1:
+                to_account_id = rng.choice(account_ids)
+            return "POST", "/api/v1/transactions/transfer", {"from_account_id": account_id, "to_account_id": to_account_id, "amount": 1}
+        if name == "history":
+            return "GET", f"/api/v1/accounts/{account_id}/history?limit=20", None
+        return "GET", f"/api/v1/accounts/{account_id}/stats?days=30", None
+
+    queue = asyncio.Queue()
+    for name in plan:
+        queue.put_nowait(name)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+
+        async def worker():
+            while not queue.empty():
+                name = queue.get_nowait()
+                method, url, body = request_for(name)
+                started = time.perf_counter()
+                response = await client.request(method, url, json=body)
+                latencies[name].append(time.perf_counter() - started)
+                if response.status_code >= 400:
+                    errors[name] += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    return latencies, errors, elapsed
+
+
+def report(latencies: dict, errors: dict, elapsed: float):
+    header = f"{'endpoint':<10} {'count':>7} {'errors':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'req/s':>9}"
+    print(header)
+    print("-" * len(header))
+    total = 0
+    for name in sorted(latencies):
+        values = sorted(latencies[name])
+        total += len(values)
+        print(
+            f"{name:<10} {len(values):>7} {errors[name]:>7} "
+            f"{percentile(values, 50) * 1000:>9.2f} {percentile(values, 95) * 1000:>9.2f} "
+            f"{percentile(values, 99) * 1000:>9.2f} {len(values) / elapsed:>9.1f}"
+        )
+    print("-" * len(header))
+    print(f"{total} requests in {elapsed:.2f}s -> {total / elapsed:.1f} req/s overall")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--transactions", type=int, default=20000)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--seed", type=int, default=42, help="Random seed, for reproducible traffic")
+    parser.add_argument("--mix", default=None, help="Override weights, e.g. deposit=1,history=3")
+    args = parser.parse_args()
+
+    mix = dict(DEFAULT_MIX)
+    if args.mix:
+        mix = {name: int(weight) for name, weight in (item.split("=") for item in args.mix.split(","))}
+
+    rng = random.Random(args.seed)
+
+    started = time.perf_counter()
+    account_ids = seed(args.users, args.transactions, rng)
+    print(f"seeded {args.users} users, {args.transactions} transactions in {time.perf_counter() - started:.2f}s")
+
+    from app.utils import shutdown_password_hasher
+    try:
+        latencies, errors, elapsed = asyncio.run(
+            replay(account_ids, args.users, args.requests, args.concurrency, mix, rng)
+        )
+    finally:
+        shutdown_password_hasher()
+
+    report(latencies, errors, elapsed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Throughput of the bulk import tool on synthetic data.
+
+    python -m benchmarks.bench_import --users 100000 --transactions 1000000 [--format ndjson]
+
+Writes users and transaction files to a temp directory (a handful of distinct passwords,
+as in test fixtures), imports them into a fresh schema, and checks that every account's
+balance equals its last balance_after. Drops and recreates the schema of BENCH_DATABASE_URL,
+or of a throwaway SQLite file without it; DATABASE_URL is ignored.
+"""
+import argparse
+import csv
+import json
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from benchmarks import use_bench_database
+
+WORKDIR = tempfile.mkdtemp()
+use_bench_database("bench_import")
+
+
+def write_records(path: str, fmt: str, columns: list[str], records):
+    with open(path, "w", newline="", encoding="utf-8") as target:
+        if fmt == "csv":
+            writer = csv.writer(target)
+            writer.writerow(columns)
+            writer.writerows(records)
+        else:
+            for record in records:
+                target.write(json.dumps(dict(zip(columns, record))) + "\n")
+
+
+def generate(users: int, transactions: int, fmt: str, rng: random.Random) -> tuple[str, str]:
+    users_path = os.path.join(WORKDIR, f"users.{fmt}")
+    transactions_path = os.path.join(WORKDIR, f"transactions.{fmt}")
+    numbers = [f"IMP-{i:010d}" for i in range(users)]
+
+    write_records(users_path, fmt, ["name", "email", "password", "account_number"], (
+        (f"Imported User {i}", f"import{i}@example.com", f"password{i % 4}", numbers[i]) for i in range(users)
+    ))
+
+    # Chronological, and debits only when the account can cover them, so no balance goes negative
+    balances = [0] * users
+
+    def transactions_rows():
+        start = datetime(2025, 1, 1)
+        for i in range(transactions):
+            index = rng.randrange(users)
+            cents = rng.randint(100, 50000)
+            debit = rng.random() < 0.3 and balances[index] >= cents
+            balances[index] += -cents if debit else cents
+            yield numbers[index], "DEBIT" if debit else "CREDIT", f"{cents / 100:.2f}", (start + timedelta(seconds=i * 30)).isoformat(), "Imported"
+
+    write_records(transactions_path, fmt, ["account_number", "transaction_type", "amount", "created_at", "description"], transactions_rows())
+    return users_path, transactions_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=100000)
+    parser.add_argument("--transactions", type=int, default=1000000)
+    parser.add_argument("--format", choices=["csv", "ndjson"], default="csv")
+    parser.add_argument("--hash-workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    from sqlalchemy.sql import func
+    from app.database import engine, Base, SessionLocal
+    from app.models import Account, Transaction
+    from app.services.import_service import bulk_import
+
+    started = time.perf_counter()
+    users_path, transactions_path = generate(args.users, args.transactions, args.format, random.Random(42))
+    print(f"generated {args.users} users, {args.transactions} transactions in {time.perf_counter() - started:.1f}s")
+
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+
+    db = SessionLocal()
+    try:
+        stats = bulk_import(db, users_path, transactions_path, hash_workers=args.hash_workers)
+        elapsed = time.perf_counter() - stats.started
+
+        last_balance = (
+            db.query(Transaction.balance_after)
+            .filter(Transaction.account_id == Account.id)
+            .order_by(Transaction.created_at.desc(), Transaction.id.desc())
+            .limit(1)
+            .scalar_subquery()
+        )
+        mismatched = db.query(func.count(Account.id)).filter(func.coalesce(last_balance, 0) != Account.balance).scalar()
+    finally:
+        db.close()
+
+    rows = stats.users + stats.transactions
+    print(f"{rows} rows in {elapsed:.1f}s -> {rows / elapsed:.0f} rows/s; accounts with balance != last balance_after: {mismatched}")
+
+
+if __name__ == "__main__":
+    main()
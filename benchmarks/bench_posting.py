@@ -0,0 +1,72 @@
+"""
+Statements and latency per posting for deposit_funds / withdraw_funds / transfer_funds.
+
+    python -m benchmarks.bench_posting [N]
+
+Counts every SQL statement the engine sends (round trips) per call and times N
+calls of each posting function directly against the service layer.
+Drops and recreates the schema of BENCH_DATABASE_URL, or of a throwaway SQLite file
+without it; DATABASE_URL is ignored.
+"""
+import sys
+import time
+from decimal import Decimal
+
+from benchmarks import use_bench_database
+
+use_bench_database("bench_posting")
+
+from sqlalchemy import event, insert
+from app.database import engine, Base, SessionLocal
+from app.models import User, Account
+from app.services import generate_account_number, deposit_funds, withdraw_funds, transfer_funds
+
+statements = [0]
+
+
+def count_statement(*args):
+    statements[0] += 1
+
+
+def setup() -> tuple[int, int]:
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    numbers = [generate_account_number() for _ in range(2)]
+    with engine.begin() as conn:
+        user_ids = conn.execute(
+            insert(User).returning(User.id, sort_by_parameter_order=True),
+            [{"name": f"Bench {i}", "email": f"posting{i}@example.com", "hashed_password": "x"} for i in range(2)]
+        ).scalars().all()
+        account_ids = conn.execute(
+            insert(Account).returning(Account.id, sort_by_parameter_order=True),
+            [{"user_id": user_id, "account_number": number, "balance": Decimal("1000000.00")} for user_id, number in zip(user_ids, numbers)]
+        ).scalars().all()
+    return account_ids[0], account_ids[1]
+
+
+def run(name: str, fn, calls: int):
+    db = SessionLocal()
+    try:
+        fn(db)  # warm up caches (hot-account shard counts, statement cache)
+        statements[0] = 0
+        started = time.perf_counter()
+        for _ in range(calls):
+            fn(db)
+        elapsed = time.perf_counter() - started
+    finally:
+        db.close()
+    print(f"{name:<10} {statements[0] / calls:>12.1f} {elapsed / calls * 1000:>12.3f}")
+
+
+def main(calls: int):
+    first, second = setup()
+    event.listen(engine, "before_cursor_execute", count_statement)
+
+    print(f"{'posting':<10} {'stmts/call':>12} {'ms/call':>12}")
+    run("deposit", lambda db: deposit_funds(db, first, Decimal("5.00")), calls)
+    run("withdraw", lambda db: withdraw_funds(db, first, Decimal("1.00")), calls)
+    run("transfer", lambda db: transfer_funds(db, first, second, Decimal("1.00")), calls)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
@@ -0,0 +1,102 @@
+"""
+Serialization time of one 100-row transaction history page.
+
+    python -m benchmarks.bench_serialization [ROUNDS]
+
+No database: the page is built in memory the way get_account_transactions returns it,
+then turned into response bytes three ways:
+  fastapi default - response_model validation, dump to JSON-ready dicts, json.dumps (JSONResponse)
+  fast encoder    - the same, but encoded by pydantic-core (FastJSONResponse, the app default)
+  model_response  - validated once and written straight to JSON (the history route)
+All three must produce the same document.
+"""
+import asyncio
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+os.environ.setdefault("SECRET_KEY", "benchmark")
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+from app.schemas import TransactionHistoryResponse, TransactionTypeEnum
+from app.utils.responses import FastJSONResponse, model_response
+
+PAGE_SIZE = 100
+
+
+def history_page() -> dict:
+    started = datetime(2026, 1, 1, 9, 30)
+    balance = Decimal("2500.00")
+    transactions = []
+    for i in range(PAGE_SIZE, 0, -1):
+        transfer = i % 3 == 0
+        credit = i % 2 == 0
+        amount = Decimal(i * 37 % 5000 + 1).scaleb(-2)
+        transactions.append({
+            "id": i,
+            "account_id": 1,
+            "transaction_type": TransactionTypeEnum.CREDIT if credit else TransactionTypeEnum.DEBIT,
+            "amount": amount,
+            "balance_after": balance,
+            "related_trasaction_id": i + 1000 if transfer else None,
+            "description": ("Transfer from account ACC-0000000026" if credit else "Transfer to account ACC-0000000026") if transfer else ("Deposit" if credit else "Withdrawal"),
+            "created_at": started + timedelta(minutes=i),
+            "counterparty_name": "Bob" if transfer else None,
+            "counterparty_account": "ACC-0000000026" if transfer else None
+        })
+        balance -= amount if credit else -amount
+
+    return {
+        "account_id": 1,
+        "account_number": "ACC-0000000018",
+        "current_balance": Decimal("2500.00"),
+        "transactions": transactions,
+        "total_transactions": 4200,
+        "next_cursor": "dHhuOjE="
+    }
+
+
+async def timed(render, rounds: int) -> tuple:
+    body = await render()
+    started = time.perf_counter()
+    for _ in range(rounds):
+        await render()
+    return (time.perf_counter() - started) / rounds, body
+
+
+def main(rounds: int):
+    page = history_page()
+    field = create_response_field(name="response", type_=TransactionHistoryResponse)
+
+    async def fastapi_default():
+        content = await serialize_response(field=field, response_content=page, is_coroutine=True)
+        return JSONResponse(content).body
+
+    async def fast_encoder():
+        content = await serialize_response(field=field, response_content=page, is_coroutine=True)
+        return FastJSONResponse(content).body
+
+    async def direct():
+        return model_response(TransactionHistoryResponse.model_validate(page)).body
+
+    async def run():
+        return [(name, *await timed(render, rounds)) for name, render in (
+            ("fastapi default", fastapi_default), ("fast encoder", fast_encoder), ("model_response", direct)
+        )]
+
+    results = asyncio.run(run())
+    baseline, expected = results[0][1], json.loads(results[0][2])
+
+    print(f"{PAGE_SIZE}-row history page, {len(expected['transactions'])} rows, {len(results[0][2]):,} bytes, {rounds} rounds")
+    for name, seconds, body in results:
+        same = "same output" if json.loads(body) == expected else "OUTPUT DIFFERS"
+        print(f"  {name:16} {seconds * 1e6:8.0f} us/page  {baseline / seconds:5.2f}x  {same}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
@@ -0,0 +1,39 @@
+import argparse
+import os
+from app.database import SessionLocal
+from app.services.import_service import bulk_import
+
+# Bulk load users/accounts and transaction history from CSV or NDJSON files, e.g.
+#   python bulk_import.py --users users.csv --transactions transactions.ndjson --hash-workers 8
+# Users need name, email and password (or a precomputed hashed_password); account_number is
+# optional. Transactions need account_number, transaction_type, amount and optionally
+# created_at and description. User batches are committed as they go; the transaction history
+# is committed in one go with the balances it produces.
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import users, accounts and transactions")
+    parser.add_argument("--users", help="CSV/NDJSON of users, one account each")
+    parser.add_argument("--transactions", help="CSV/NDJSON of transactions for existing or imported accounts")
+    parser.add_argument("--user-batch-size", type=int, default=5000)
+    parser.add_argument("--transaction-batch-size", type=int, default=20000)
+    parser.add_argument("--hash-workers", type=int, default=os.cpu_count() or 1, help="Processes hashing distinct passwords")
+    args = parser.parse_args()
+
+    if not args.users and not args.transactions:
+        parser.error("nothing to import - pass --users and/or --transactions")
+
+    db = SessionLocal()
+    try:
+        bulk_import(
+            db,
+            users_path=args.users,
+            transactions_path=args.transactions,
+            user_batch_size=args.user_batch_size,
+            transaction_batch_size=args.transaction_batch_size,
+            hash_workers=args.hash_workers
+        )
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
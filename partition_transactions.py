@@ -0,0 +1,23 @@
+from app.database import engine
+from app.services.partition_service import partition_transactions, ensure_partitions
+import sys
+
+# Monthly partitions of transactions by created_at (PostgreSQL only):
+#   python partition_transactions.py --convert -> rebuild the existing table as a partitioned one (locks it while rows move)
+#   python partition_transactions.py           -> create the coming months' partitions; run it monthly (cron),
+#                                                 archive_transactions.py also does this before archiving
+
+def convert():
+    print("Partitioning transactions by month..")
+    created = partition_transactions(engine)
+    print(f"transactions partitioned into {len(created)} monthly partitions")
+
+def ensure():
+    created = ensure_partitions(engine)
+    print(f"Created partitions: {', '.join(created)}" if created else "All partitions already exist")
+
+if __name__ == "__main__":
+    if "--convert" in sys.argv:
+        convert()
+    else:
+        ensure()
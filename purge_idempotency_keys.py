@@ -0,0 +1,14 @@
+from app.database import SessionLocal
+from app.services.idempotency_service import purge_expired_idempotency_keys
+
+def purge():
+    print("Deleting expired idempotency keys..")
+    db = SessionLocal()
+    try:
+        removed = purge_expired_idempotency_keys(db)
+        print(f"Deleted {removed} expired idempotency keys")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    purge()
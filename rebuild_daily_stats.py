@@ -0,0 +1,14 @@
+from app.database import SessionLocal
+from app.services import rebuild_daily_stats
+
+def rebuild():
+    print("Rebuilding daily account stats from transactions..")
+    db = SessionLocal()
+    try:
+        rebuild_daily_stats(db)
+        print("Daily account stats rebuilt")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    rebuild()
@@ -1,45 +1,49 @@
-from app.database import engine, SessionLocal
-from app.models import Account, Transaction
-from sqlalchemy import text
+from app.database import engine
+from app.utils.db_reset import reset_tables, DatabaseSnapshot
+import sys
+
+# python reset_database.py             -> delete all data (asks first)
+# python reset_database.py --snapshot  -> save the current data as the fixture snapshot
+# python reset_database.py --restore   -> put the data back to the saved snapshot
 
 def reset_database():
     """
     Reset database by clearing all data and resetting auto-increment counters.
+    Works on PostgreSQL, MySQL and SQLite.
     WARNING: This deletes ALL data!
     """
-    db = SessionLocal()
-    
     try:
         print("Clearing database...")
-        
-        # Disable foreign key checks
-        db.execute(text("SET FOREIGN_KEY_CHECKS = 0"))
-        
-        # Truncate tables
-        db.execute(text("TRUNCATE TABLE transactions"))
-        db.execute(text("TRUNCATE TABLE accounts"))
-        db.execute(text("TRUNCATE TABLE users"))
-        
-        # Re-enable foreign key checks
-        db.execute(text("SET FOREIGN_KEY_CHECKS = 1"))
-        
-        db.commit()
-        
+        reset_tables(engine)
+
         print("✅ Database reset successfully!")
-        print("   - All accounts deleted")
-        print("   - All transactions deleted")
+        print("   - All users, accounts and transactions deleted")
         print("   - Auto-increment counters reset to 1")
-        
+
     except Exception as e:
         print(f"❌ Error resetting database: {e}")
-        db.rollback()
-    finally:
-        db.close()
+
+def save_snapshot():
+    snapshot = DatabaseSnapshot.take(engine)
+    print(f"✅ Snapshot of {len(snapshot.tables)} tables saved")
+
+def restore_snapshot():
+    snapshot = DatabaseSnapshot.existing(engine)
+    if snapshot is None:
+        print("❌ No snapshot found - run with --snapshot first")
+        return
+    snapshot.restore()
+    print("✅ Database restored from snapshot")
 
 
 if __name__ == "__main__":
-    response = input("This will DELETE ALL DATA. Continue? (yes/no): ")
-    if response.lower() == "yes":
-        reset_database()
+    if "--snapshot" in sys.argv:
+        save_snapshot()
+    elif "--restore" in sys.argv:
+        restore_snapshot()
     else:
-        print("Cancelled.")
\ No newline at end of file
+        response = input("This will DELETE ALL DATA. Continue? (yes/no): ")
+        if response.lower() == "yes":
+            reset_database()
+        else:
+            print("Cancelled.")
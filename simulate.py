@@ -0,0 +1,32 @@
+import argparse
+from datetime import datetime
+from app.database import SessionLocal
+from app.services.simulation_service import simulate
+
+# Synthetic traffic for the simulation (needs NumPy: pip install numpy), e.g.
+#   python simulate.py --customers 10000 --days 30 --postings-per-day 200000 --seed 1
+# Creates the customers, then posts each day's deposits/withdrawals/transfers in bulk,
+# committing day by day. Run it against a database that is not taking live postings:
+# transaction ids are assigned by the simulation.
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate customers and days of banking activity")
+    parser.add_argument("--customers", type=int, default=1000)
+    parser.add_argument("--days", type=int, default=7)
+    parser.add_argument("--postings-per-day", type=int, default=10000)
+    parser.add_argument("--start", type=lambda value: datetime.strptime(value, "%Y-%m-%d"), help="First simulated day, YYYY-MM-DD (default today)")
+    parser.add_argument("--seed", type=int, help="Random seed, for a reproducible run")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        stats = simulate(db, args.customers, args.days, args.postings_per_day, start=args.start, seed=args.seed)
+    finally:
+        db.close()
+
+    elapsed = stats.validate_seconds
+    print(f"Simulated {stats.posted} postings ({stats.rejected} rejected for insufficient funds) -> {stats.transactions} transactions")
+    print(f"Vectorized validation: {stats.posted / elapsed if elapsed else 0:.0f} postings/s")
+
+if __name__ == "__main__":
+    main()
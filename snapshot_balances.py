@@ -0,0 +1,50 @@
+import sys
+from datetime import datetime
+from sqlalchemy.sql import func
+from app.database import SessionLocal
+from app.models import Transaction
+from app.services import snapshot_balances
+
+# Month-end balance checkpoints. Run shortly after midnight on the 1st:
+#   python snapshot_balances.py            -> balances as of the start of this month
+#   python snapshot_balances.py 2026-03    -> balances as of 2026-03-01 00:00
+#   python snapshot_balances.py --backfill -> every month since the first transaction, oldest first
+
+def month_start(value: datetime) -> datetime:
+    return datetime(value.year, value.month, 1)
+
+def next_month(value: datetime) -> datetime:
+    return datetime(value.year + value.month // 12, value.month % 12 + 1, 1)
+
+def snapshot(as_of: datetime):
+    db = SessionLocal()
+    try:
+        count = snapshot_balances(db, as_of)
+        print(f"Snapshotted {count} account balances as of {as_of:%Y-%m-%d %H:%M}")
+    finally:
+        db.close()
+
+def backfill():
+    db = SessionLocal()
+    try:
+        first = db.query(func.min(Transaction.created_at)).scalar()
+    finally:
+        db.close()
+
+    if not first:
+        print("No transactions yet")
+        return
+
+    as_of = next_month(month_start(first))
+    while as_of <= datetime.now():
+        snapshot(as_of)
+        as_of = next_month(as_of)
+
+if __name__ == "__main__":
+    argument = sys.argv[1] if len(sys.argv) > 1 else None
+    if argument == "--backfill":
+        backfill()
+    elif argument:
+        snapshot(datetime.strptime(argument, "%Y-%m"))
+    else:
+        snapshot(month_start(datetime.now()))
@@ -0,0 +1,48 @@
+import os
+import tempfile
+
+# Tests never run against the configured database: TEST_DATABASE_URL, else a throwaway SQLite file.
+# Set before the plugin below imports app.database
+os.environ["DATABASE_URL"] = os.environ.get("TEST_DATABASE_URL") or f"sqlite:///{tempfile.mkdtemp()}/test.db"
+os.environ["READ_REPLICA_URL"] = ""
+os.environ.setdefault("SECRET_KEY", "test")
+os.environ.setdefault("PASSWORD_HASH_WORKERS", "0")
+
+import pytest
+from decimal import Decimal as d
+
+# db / client fixtures that restore the seeded dataset after every test
+pytest_plugins = ["app.utils.db_reset"]
+
+COUNTERPARTIES = ["Bob", "Carol", "Dave", "Erin"]
+HISTORY_TRANSFERS = 150
+
+
+@pytest.fixture(scope="session")
+def db_seed():
+    from app.models import User, Account
+    from app.services import generate_account_number, deposit_funds, transfer_funds
+
+    def seed(db):
+        names = ["Alice"] + COUNTERPARTIES
+        # Numbers first: the allocator commits on its own connection (SQLite allows one writer)
+        numbers = [generate_account_number() for _ in names]
+        users = [User(name=name, email=f"{name.lower()}@example.com", hashed_password="not-a-hash") for name in names]
+        db.add_all(users)
+        db.flush()
+
+        accounts = [Account(user_id=user.id, account_number=number, balance=d("0.00")) for user, number in zip(users, numbers)]
+        db.add_all(accounts)
+        db.commit()
+
+        # Alice's history mixes a deposit and transfers both ways with every counterparty
+        alice, others = accounts[0], accounts[1:]
+        deposit_funds(db, alice.id, d("1000.00"))
+        for i in range(HISTORY_TRANSFERS):
+            if i % 3 == 2:
+                # Sent back by whoever Alice paid last
+                transfer_funds(db, others[(i - 1) % len(others)].id, alice.id, d("1.00"))
+            else:
+                transfer_funds(db, alice.id, others[i % len(others)].id, d("2.50"))
+
+    return seed
@@ -0,0 +1,49 @@
+import pytest
+from decimal import Decimal as d
+from app.models import Account, Transaction
+from app.services import deposit_funds, withdraw_funds
+from app.services.balance_service import BalanceLayoutChanged, _shard_counts, set_balance_shards, with_shard_balance
+
+
+def total_balance(db, account_id: int) -> d:
+    db.expire_all()
+    return db.query(Account).options(with_shard_balance()).filter(Account.id == account_id).one().total_balance
+
+
+def test_debit_with_a_stale_shard_count_retries_instead_of_missing_shards(db):
+    account = db.query(Account).order_by(Account.id.desc()).first()
+    set_balance_shards(db, account.id, 4)
+    for _ in range(5):
+        deposit_funds(db, account.id, d("10.00"))
+    total = total_balance(db, account.id)
+
+    # Another worker switched hot mode on; this one still caches the account as a single row
+    _shard_counts.set(account.id, 0)
+    last_id = db.query(Transaction.id).order_by(Transaction.id.desc()).limit(1).scalar()
+
+    with pytest.raises(BalanceLayoutChanged):
+        withdraw_funds(db, account.id, d("5.00"))
+    assert db.query(Transaction.id).order_by(Transaction.id.desc()).limit(1).scalar() == last_id
+    assert _shard_counts.get(account.id) == 4
+
+    # The retry locks every shard and sees the whole balance
+    response = withdraw_funds(db, account.id, d("5.00"))
+    assert response.new_balance == response.transaction.balance_after == total - d("5.00")
+    withdraw_funds(db, account.id, total - d("5.00"))
+    assert total_balance(db, account.id) == d("0.00")
+
+
+def test_batch_refusals_count_as_insufficient_funds(db):
+    from app.schemas import BatchOperation
+    from app.services import post_transaction_batch
+    from app.services.balance_service import insufficient_funds
+
+    poor, other = db.query(Account).order_by(Account.balance, Account.id).limit(2).all()
+    before = insufficient_funds.value(operation="batch")
+    result = post_transaction_batch(db, [
+        BatchOperation(operation="WITHDRAW", account_id=poor.id, amount=poor.balance + 1),
+        BatchOperation(operation="TRANSFER", from_account_id=poor.id, to_account_id=other.id, amount=poor.balance + 1)
+    ])
+
+    assert [r["status"] for r in result["results"]] == ["failed", "failed"]
+    assert insufficient_funds.value(operation="batch") == before + 2
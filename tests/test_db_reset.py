@@ -0,0 +1,58 @@
+import pytest
+from decimal import Decimal as d
+from sqlalchemy import func
+from app.database import SessionLocal
+from app.models import User, Account, Transaction, DailyAccountStats, IdAllocator
+from app.services import deposit_funds, generate_account_number
+from tests.conftest import COUNTERPARTIES
+
+
+def database_state(db) -> dict:
+    return {
+        "users": db.query(func.count(User.id)).scalar(),
+        "accounts": sorted(db.query(Account.id, Account.account_number, Account.balance)),
+        "transactions": db.query(func.count(Transaction.id)).scalar(),
+        "last_transaction": db.query(func.max(Transaction.id)).scalar(),
+        "daily_stats": sorted(db.query(DailyAccountStats.account_id, DailyAccountStats.total_income, DailyAccountStats.total_expenses)),
+        "allocators": sorted(db.query(IdAllocator.name, IdAllocator.next_value))
+    }
+
+def write_rows(db):
+    account = db.query(Account).order_by(Account.id).first()
+    deposit_funds(db, account.id, d("42.00"))
+
+    number = generate_account_number()
+    zoe = User(name="Zoe", email="zoe@example.com", hashed_password="not-a-hash")
+    db.add(zoe)
+    db.flush()
+    db.add(Account(user_id=zoe.id, account_number=number, balance=d("0.00")))
+    db.commit()
+
+
+def test_restore_brings_back_the_snapshot(db, db_snapshot):
+    seeded = database_state(db)
+    write_rows(db)
+    first_new_id = db.query(func.max(Transaction.id)).scalar()
+    assert database_state(db) != seeded
+
+    db.close()
+    db_snapshot.restore()
+
+    session = SessionLocal()
+    try:
+        assert database_state(session) == seeded
+        # Id counters are restored too: the next row gets the id the discarded one had
+        deposit_funds(session, seeded["accounts"][0][0], d("1.00"))
+        assert session.query(func.max(Transaction.id)).scalar() == first_new_id
+    finally:
+        session.close()
+
+
+@pytest.mark.parametrize("run", [1, 2])
+def test_each_test_starts_from_the_snapshot(db, run):
+    # Whichever run goes second only passes if the db fixture put back what the first one wrote
+    users = 1 + len(COUNTERPARTIES)
+    assert database_state(db)["users"] == users
+    assert database_state(db)["accounts"][0][2] == d("1000.00") - d("2.50") * 100 + d("1.00") * 50
+    write_rows(db)
+    assert database_state(db)["users"] == users + 1
@@ -0,0 +1,55 @@
+import pytest
+from contextlib import contextmanager
+from sqlalchemy import event
+from app.models import User, Account
+from app.services import get_account_transactions, decode_history_cursor
+from app.services.account_cache_service import clear_account_cache
+from tests.conftest import COUNTERPARTIES
+
+
+@contextmanager
+def counted_statements(engine):
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", count)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+
+def history_statements(db, account_id: int, **page) -> tuple[list, dict]:
+    # Cold account cache, so every page pays for its counterparty lookup
+    clear_account_cache()
+    db.expunge_all()
+    with counted_statements(db.get_bind()) as statements:
+        result = get_account_transactions(db, account_id, **page)
+    return statements, result
+
+@pytest.fixture
+def alice_account(db) -> int:
+    return db.query(Account.id).join(User).filter(User.email == "alice@example.com").scalar()
+
+
+@pytest.mark.parametrize("include_total", [True, False])
+def test_statement_count_does_not_grow_with_page_size(db, alice_account, include_total):
+    small, small_page = history_statements(db, alice_account, limit=1, include_total=include_total)
+    large, large_page = history_statements(db, alice_account, limit=100, include_total=include_total)
+
+    assert len(small_page["transactions"]) == 1
+    assert len(large_page["transactions"]) == 100
+    assert {txn["counterparty_name"] for txn in large_page["transactions"]} == set(COUNTERPARTIES)
+    assert len(small) == len(large), "\n".join(large)
+
+
+def test_keyset_pages_cost_the_same_as_the_first(db, alice_account):
+    first, page = history_statements(db, alice_account, limit=100, include_total=False)
+    after = decode_history_cursor(page["next_cursor"])
+
+    small, _ = history_statements(db, alice_account, limit=1, after=after, include_total=False)
+    large, next_page = history_statements(db, alice_account, limit=100, after=after, include_total=False)
+
+    assert len(next_page["transactions"]) == 51
+    assert len(small) == len(large) == len(first)
@@ -0,0 +1,69 @@
+import pytest
+from decimal import Decimal as d
+from sqlalchemy import func
+from app.database import SessionLocal
+from app.models import Account, Transaction, IdempotencyKey
+from app.schemas import TransactionSuccessResponse
+from app.services import deposit_funds
+from app.services.idempotency_service import post_once
+
+
+class Crash(Exception):
+    pass
+
+
+def counts(db) -> tuple[int, int]:
+    return db.query(func.count(Transaction.id)).scalar(), db.query(func.count(IdempotencyKey.key)).scalar()
+
+
+def test_posting_and_response_commit_together(db):
+    account = db.query(Account).order_by(Account.id).first()
+    before = counts(db)
+    kwargs = {"account_id": account.id, "amount": d("10.00")}
+
+    def deposit_then_crash(session, **kwargs):
+        deposit_funds(session, **kwargs)
+        raise Crash("worker died before the response was stored")
+
+    with pytest.raises(Crash):
+        post_once(db, "key-1", "deposit", "hash", TransactionSuccessResponse, deposit_then_crash, kwargs)
+
+    # Neither the posting nor a response-less claim survived, so the retry posts exactly once
+    other = SessionLocal()
+    try:
+        assert counts(other) == before
+    finally:
+        other.close()
+
+    response, replayed = post_once(db, "key-1", "deposit", "hash", TransactionSuccessResponse, deposit_funds, kwargs)
+    assert not replayed
+    assert post_once(db, "key-1", "deposit", "hash", TransactionSuccessResponse, deposit_funds, kwargs) == (response, True)
+    assert counts(db) == (before[0] + 1, before[1] + 1)
+
+
+def test_batch_takes_an_idempotency_key(client):
+    db = SessionLocal()
+    try:
+        first, second = db.query(Account.id).order_by(Account.id).limit(2).all()
+        before = counts(db)[0]
+    finally:
+        db.close()
+
+    body = {"operations": [
+        {"operation": "DEPOSIT", "account_id": first.id, "amount": "5.00"},
+        {"operation": "TRANSFER", "from_account_id": first.id, "to_account_id": second.id, "amount": "2.00"}
+    ], "chunk_size": 1}
+    headers = {"Idempotency-Key": "batch-1"}
+
+    posted = client.post("/api/v1/transactions/batch", json=body, headers=headers)
+    replayed = client.post("/api/v1/transactions/batch", json=body, headers=headers)
+
+    assert posted.status_code == replayed.status_code == 200
+    assert posted.json()["succeeded"] == 2 and "Idempotent-Replayed" not in posted.headers
+    assert replayed.json() == posted.json() and replayed.headers["Idempotent-Replayed"] == "true"
+
+    db = SessionLocal()
+    try:
+        assert counts(db)[0] == before + 3
+    finally:
+        db.close()
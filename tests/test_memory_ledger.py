@@ -0,0 +1,78 @@
+from decimal import Decimal as d
+from app.services.memory_ledger_service import MemoryLedger, FIRST_TRANSACTION_ID, DEPOSIT, TRANSFER
+
+
+def open_ledger(tmp_path, group_commit_ms: float = 0) -> MemoryLedger:
+    return MemoryLedger.open(str(tmp_path / "ledger.wal"), group_commit_ms=group_commit_ms, fsync=False)
+
+
+def test_transaction_ids_stay_clear_of_database_ids(tmp_path):
+    ledger = open_ledger(tmp_path)
+    try:
+        ledger.open_account(1, "ACC-1", balance=10000)
+        ledger.open_account(2, "ACC-2")
+        deposit = ledger.deposit_funds(None, 1, d("5.00"))
+        transfer = ledger.transfer_funds(None, 1, 2, d("2.50"))
+    finally:
+        ledger.close()
+
+    assert deposit.transaction.id == FIRST_TRANSACTION_ID
+    assert (transfer.from_account.transaction.id, transfer.to_account.transaction.id) == (FIRST_TRANSACTION_ID + 1, FIRST_TRANSACTION_ID + 2)
+    assert transfer.to_account.transaction.related_trasaction_id == FIRST_TRANSACTION_ID + 1
+
+    # Replaying the log hands out the same ids
+    replayed = open_ledger(tmp_path)
+    try:
+        page = replayed.get_account_transactions(None, 2)
+        assert [txn["id"] for txn in page["transactions"]] == [FIRST_TRANSACTION_ID + 2]
+        assert page["transactions"][0]["counterparty_account"] == "ACC-1"
+        assert replayed.get_account_by_id(None, 1)["balance"] == d("102.50")
+    finally:
+        replayed.close()
+
+
+def test_postings_are_read_only_once_logged(tmp_path):
+    # A long group commit window keeps the postings queued while the reads run
+    ledger = open_ledger(tmp_path, group_commit_ms=500)
+    try:
+        ledger.open_account(1, "ACC-1", balance=10000)
+        ledger.open_account(2, "ACC-2")
+        ledger.sync()
+
+        ledger.post(DEPOSIT, 1, 500)
+        ledger.post(TRANSFER, 1, 250, to_account_id=2)
+
+        assert ledger.get_account_by_id(None, 1)["balance"] == d("100.00")
+        page = ledger.get_account_transactions(None, 1)
+        assert page["transactions"] == [] and page["total_transactions"] == 0
+        assert page["current_balance"] == d("100.00")
+
+        ledger.sync()
+
+        assert ledger.get_account_by_id(None, 1)["balance"] == d("102.50")
+        assert ledger.get_account_by_id(None, 2)["balance"] == d("2.50")
+        assert ledger.get_account_transactions(None, 1)["total_transactions"] == 2
+    finally:
+        ledger.close()
+
+
+def test_batch_refuses_amounts_that_round_to_zero(tmp_path):
+    from app.schemas import BatchOperation
+
+    ledger = open_ledger(tmp_path)
+    try:
+        ledger.open_account(1, "ACC-1", balance=10000)
+        ledger.open_account(2, "ACC-2")
+        result = ledger.post_transaction_batch(None, [
+            BatchOperation(operation="DEPOSIT", account_id=1, amount="0.001"),
+            BatchOperation(operation="WITHDRAW", account_id=1, amount="0.004"),
+            BatchOperation(operation="TRANSFER", from_account_id=1, to_account_id=2, amount="0.002"),
+            BatchOperation(operation="DEPOSIT", account_id=1, amount="0.006")
+        ])
+
+        assert [(r["status"], r["error"]) for r in result["results"][:3]] == [("failed", "Amount has to be greater than zero")] * 3
+        assert result["results"][3]["status"] == "ok"
+        assert ledger.get_account_transactions(None, 1)["total_transactions"] == 1
+        assert ledger.get_account_by_id(None, 1)["balance"] == d("100.01")
+    finally:
+        ledger.close()